@@ -1,79 +1,225 @@
-from typing import Dict, Any, List
-from langchain.agents import AgentExecutor
-from langchain.tools import Tool
-from langchain.prompts import PromptTemplate, ChatPromptTemplate
-from langchain.chains import LLMChain
+from typing import Dict, Any, List, AsyncIterator, NamedTuple, Optional, Tuple
+from langchain.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.utilities.sql_database import SQLDatabase
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain.agents.agent_types import AgentType
-from langchain.agents import create_sql_agent
+from langchain_core.callbacks import BaseCallbackHandler
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import sqlite3
 import os
-import random
+import re
+import asyncio
+from cache.query_cache import SemanticQueryCache
+from cache.answer_cache import AnswerCache
+from agents.query_planner import NO_DATA, Plan, QueryPlanner
+from analysis import result_summary
+from data import columnar, repository
+from services import tracing
+from services.sql_guard import SQLGuard
+
+# Used to estimate token counts when the provider does not report them
+CHARS_PER_TOKEN = 4
+
+# Tables the generated SQL may read, shared by the single and batch SQL prompts
+SCHEMA_DESCRIPTION = """    The analytics_data table has the following columns:
+    - ts (INTEGER): Timestamp of the record in seconds since 1970-01-01 (the primary key; filtering or ordering on it is fastest)
+    - date (TEXT): Date and time of the record as 'YYYY-MM-DD HH:MM:SS'
+    - page_views (INTEGER): Number of page views
+    - unique_visitors (INTEGER): Number of unique visitors
+    - session_duration (REAL): Average session duration in minutes
+    - bounce_rate (REAL): Bounce rate as a decimal (e.g., 0.35 for 35%)
+    - conversion_rate (REAL): Conversion rate as a decimal (e.g., 0.02 for 2%)
+    
+    Pre-aggregated tables analytics_daily, analytics_weekly (weeks start on Monday) and analytics_monthly
+    hold one row per period with these columns:
+    - bucket_ts (INTEGER): Start of the period in seconds since 1970-01-01
+    - date (TEXT): Start of the period as 'YYYY-MM-DD HH:MM:SS'
+    - row_count (INTEGER): Number of analytics_data rows in the period
+    - for each metric above: <metric>_sum, <metric>_min, <metric>_max and <metric>_sumsq (sum of squares)
+    Prefer these tables for daily, weekly or monthly figures and for long time ranges; the average of a
+    metric over several periods is SUM(<metric>_sum) / SUM(row_count). Use analytics_data for hourly detail.
+    
+"""
+
+SQL_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """You are a SQL expert. Generate a SQL query for {dialect} to answer this business intelligence question.
+""" + SCHEMA_DESCRIPTION + """    {dialect_notes}
+    
+    Question: {query}
+    Please provide only the SQL query without any explanation or markdown formatting.""")
+])
+
+BATCH_SQL_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """You are a SQL expert. Generate one SQL query for {dialect} for each of these business intelligence questions.
+""" + SCHEMA_DESCRIPTION + """    {dialect_notes}
+    
+    {questions}
+    
+    For each question, in the order given, write a line "-- Question <number>" followed by its SQL query.
+    Please provide only the SQL queries without any explanation or markdown formatting.""")
+])
+
+# Date handling differs between the SQL backends (see data.columnar)
+DIALECT_NOTES = {
+    "SQLite": """For date comparisons, use the date() function.
+    For today's data, use date('now').
+    For last month, use date('now', '-1 month').
+    For time ranges prefer ts, e.g. ts >= strftime('%s', 'now', '-7 days') for the last week.""",
+    "DuckDB": """For date comparisons, use CAST(date AS TIMESTAMP) or compare the 'YYYY-MM-DD HH:MM:SS' text.
+    For today's data, use current_date.
+    For last month, use current_date - INTERVAL 1 MONTH.
+    For time ranges prefer ts, e.g. ts >= epoch(now() - INTERVAL 7 DAY) for the last week.""",
+}
+
+# How to read and present results, shared by the single and batch narration prompts
+NARRATION_GUIDELINES = """    Format numbers appropriately (e.g., 1,234 instead of 1234).
+    For rates, show as percentages (e.g., 35% instead of 0.35).
+    For durations, show in minutes.
+    Results are JSON: "columns" maps each column to its type and values. For large results
+    ("summarized": true) it holds per-column statistics (count, min, max, mean, sum,
+    percentiles, trend slope) over all "row_count" rows, with "head" and "tail" sample rows.
+"""
+
+RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """You are a business intelligence expert. Provide a clear and concise answer based on these SQL results.
+""" + NARRATION_GUIDELINES + """    
+    Question: {query}
+    SQL Query: {sql_query}
+    Results: {result}
+    
+    Please provide a clear answer to the question based on this data.""")
+])
+
+BATCH_RESPONSE_PROMPT = ChatPromptTemplate.from_messages([
+    ("user", """You are a business intelligence expert. Provide a clear and concise answer to each question based on its SQL results.
+""" + NARRATION_GUIDELINES + """    
+    {questions}
+    
+    For each question, in the order given, write a line "## Answer <number>" followed by a clear answer
+    to the question based on its data.""")
+])
+
+# Lines opening the numbered sections of a batch reply, e.g. "-- Question 2" or "## Answer 2";
+# "-- Question two" and the like are matched too, to end the section before them
+_SECTION_MARKER = r'^[ \t]*(?:--|#+)?[ \t]*\**{label}[ \t]+(\w+)[ \t]*\**[ \t]*:?[ \t]*\**[ \t]*$'
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Records the token counts of LLM calls in the tracing metrics.
+
+    Counts reported by the provider are used when present; otherwise they
+    are estimated from the prompt and completion length. The counts are also
+    written into ``attributes``, typically those of the enclosing span.
+    """
+
+    run_inline = True
+
+    def __init__(self, call: str, attributes: Optional[Dict[str, Any]] = None):
+        self.call = call
+        self.attributes = attributes if attributes is not None else {}
+        self._prompt_chars = 0
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any):
+        self._prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+
+    def on_llm_end(self, response: Any, **kwargs: Any):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            source = "reported"
+        else:
+            completion_chars = sum(len(g.text) for generations in response.generations for g in generations)
+            prompt_tokens = -(-self._prompt_chars // CHARS_PER_TOKEN)
+            completion_tokens = -(-completion_chars // CHARS_PER_TOKEN)
+            source = "estimated"
+        tracing.record_tokens(self.call, prompt_tokens, completion_tokens, source)
+        self.attributes.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, token_source=source)
+
+class QueryError(Exception):
+    """A failed stage of answering a question; the message is the reply to the user."""
+
+
+class PreparedQuery(NamedTuple):
+    """A question after the stages that need no LLM call: the query planner and the query cache."""
+    query: str
+    # The planner's plan, and its (columns, rows, answer) when it answered the question
+    plan: Optional[Plan] = None
+    planned: Optional[Tuple[List[str], List[tuple], str]] = None
+    schema_version: Optional[Tuple[Optional[str], int]] = None
+    # SQL from the query cache; None when it has to be generated
+    cached_sql: Optional[str] = None
+
+
+class ExecutedQuery(NamedTuple):
+    """A question whose SQL has run, or whose answer was found in the answer cache."""
+    query: str
+    sql: str
+    data_version: Tuple[Optional[str], int]
+    # The final answer (cached, or the reply to an empty result); None when the result needs narrating
+    answer: Optional[str]
+    # None when the answer came from the answer cache
+    columns: Optional[List[str]] = None
+    rows: Optional[List[tuple]] = None
+    # The result rendered for the narration prompt
+    result: str = ""
+
 
 class BusinessIntelligenceAgent:
-    def __init__(self, llm: ChatGoogleGenerativeAI, db: SQLDatabase):
+    """
+    Answers questions about analytics_data in natural language.
+
+    Every entry point runs the same stages: _prepare (query planner, query
+    cache), SQL generation by the LLM when needed, _execute (answer cache,
+    guarded execution, result compaction), narration by the LLM and _finish
+    (answer cache). They differ only in how they call the LLM: process_query
+    blocks, aprocess_query awaits, astream_query streams the narration and
+    abatch_query makes one call for all of its questions.
+    """
+
+    def __init__(self, llm: ChatGoogleGenerativeAI, db: SQLDatabase,
+                 query_cache: Optional[SemanticQueryCache] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 query_backend: Optional[Any] = None,
+                 planner: Optional[QueryPlanner] = None,
+                 sql_guard: Optional[SQLGuard] = None):
         self.llm = llm
         self.db = db
+        self.query_cache = query_cache or SemanticQueryCache.from_env()
+        self.answer_cache = answer_cache or AnswerCache.from_env()
+        # Answers common question shapes from SQL templates, before the LLM
+        self.planner = planner or QueryPlanner.from_env()
+        # Refuses unsafe or unbounded generated SQL and limits its run time and rows
+        self.sql_guard = sql_guard or SQLGuard.from_env()
         self._initialize_database()  # Initialize database first
+        # repository (SQLite) or a columnar.ColumnarStore, per ANALYTICS_BACKEND
+        self.query_backend = query_backend or columnar.get_query_backend()
         
     def _initialize_database(self):
         """Initialize the SQLite database with required tables."""
         try:
-            # Connect to SQLite database
-            conn = sqlite3.connect('business_intelligence.db')
-            cursor = conn.cursor()
-
-            # Create analytics_data table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS analytics_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    date TEXT,
-                    page_views INTEGER,
-                    unique_visitors INTEGER,
-                    session_duration REAL,
-                    bounce_rate REAL,
-                    conversion_rate REAL
-                )
-            ''')
-
-            # Check if we need to insert sample data
-            cursor.execute("SELECT COUNT(*) FROM analytics_data")
-            count = cursor.fetchone()[0]
-            
-            if count == 0:
-                # Insert sample data for the last 30 days
-                today = datetime.now()
-                for i in range(30):
-                    date = (today - timedelta(days=i)).strftime('%Y-%m-%d')
-                    cursor.execute('''
-                        INSERT INTO analytics_data 
-                        (date, page_views, unique_visitors, session_duration, bounce_rate, conversion_rate)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        date,
-                        random.randint(800, 1200),  # page_views
-                        random.randint(400, 600),   # unique_visitors
-                        round(random.uniform(2.0, 5.0), 1),  # session_duration
-                        round(random.uniform(0.2, 0.4), 2),  # bounce_rate
-                        round(random.uniform(0.01, 0.03), 2)  # conversion_rate
-                    ))
-
-            conn.commit()
+            repository.initialize_database()
             print("Database initialized successfully with sample data")
         except Exception as e:
             print(f"Error initializing database: {str(e)}")
             raise
-        finally:
-            conn.close()
     
-    def analyze_trends(self, data: Dict[str, Any]) -> str:
-        """Analyze trends in business metrics over time."""
+    def analyze_trends(self, data: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Analyze trends in business metrics over time.
+
+        Without ``data``, answers from the persisted online regression slopes
+        of analytics_data, which are maintained on every write.
+        """
         try:
+            if data is None:
+                states = repository.fetch_metric_states()
+                trends = {
+                    metric: states[metric].trend_direction
+                    for metric in ['page_views', 'unique_visitors', 'conversion_rate']
+                    if metric in states
+                }
+                return f"Trend Analysis: {trends}"
+            
             df = pd.DataFrame(data)
             df['date'] = pd.to_datetime(df['date'])
             
@@ -88,9 +234,26 @@ class BusinessIntelligenceAgent:
         except Exception as e:
             return f"Error analyzing trends: {str(e)}"
     
-    def detect_anomalies(self, data: Dict[str, Any]) -> str:
-        """Detect anomalies in business metrics."""
+    def detect_anomalies(self, data: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Detect anomalies in business metrics.
+
+        Without ``data``, reports the most recent anomalies recorded in the
+        persisted online statistics as rows were written to analytics_data.
+        """
         try:
+            if data is None:
+                states = repository.fetch_metric_states()
+                anomalies = {
+                    metric: [
+                        {'date': repository.format_timestamp(ts), metric: value}
+                        for ts, value, _ in states[metric].anomalies
+                    ]
+                    for metric in ['page_views', 'unique_visitors', 'conversion_rate']
+                    if metric in states
+                }
+                return f"Anomalies Detected: {anomalies}"
+            
             df = pd.DataFrame(data)
             
             # Calculate z-scores
@@ -129,69 +292,382 @@ class BusinessIntelligenceAgent:
         except Exception as e:
             return f"Error generating insights: {str(e)}"
     
-    def process_query(self, query: str) -> str:
-        """Process a business intelligence query and return a natural language response."""
+    def _schema_version(self) -> Tuple[Optional[str], int]:
+        """
+        Return the database id and SQLite's schema cookie, which changes
+        whenever any table or index is altered.
+
+        The cookie restarts when the database is recreated, and the caches
+        keyed on it may be shared between workers, hence the database id.
+        """
+        return repository.database_id(), repository.schema_version()
+
+    def _data_version(self) -> Tuple[Optional[str], int]:
+        """Return the database id and the analytics_data version token, bumped by every writer."""
+        return repository.database_id(), repository.data_version()
+
+    def _execute_sql(self, sql_query: str, trusted: bool = False) -> Tuple[List[str], List[tuple], bool]:
+        """
+        Execute a query on the active backend through the SQL guard.
+
+        Returns the column names, the rows and whether rows beyond the
+        guard's limit were dropped. Only ``trusted`` SQL (the query planner's)
+        skips the guard's statement check.
+        """
+        backend = self.query_backend.SQL_DIALECT.lower()
+        with tracing.span("sql_execution", backend=backend) as span:
+            columns, rows, truncated = self.sql_guard.execute(self.query_backend, sql_query, trusted)
+            span["rows"] = len(rows)
+            span["truncated"] = truncated
+        tracing.SQL_ROWS.observe(len(rows), backend=backend)
+        return columns, rows, truncated
+
+    def _sql_prompt_inputs(self, query: str) -> Dict[str, str]:
+        dialect = self.query_backend.SQL_DIALECT
+        return {"query": query, "dialect": dialect, "dialect_notes": DIALECT_NOTES[dialect]}
+
+    @staticmethod
+    def _format_result(columns: List[str], rows: List[tuple], truncated: bool = False) -> str:
+        """
+        Render a result for the narration prompt as typed columns, or as a
+        summary with statistics and samples when it has more than
+        NARRATION_MAX_ROWS rows (see analysis.result_summary).
+        """
+        if not rows:
+            return ""
+        with tracing.span("result_compaction", rows=len(rows)) as span:
+            result = result_summary.compact_result(columns, rows, truncated)
+            span["summarized"] = len(rows) > result_summary.SUMMARY_THRESHOLD or truncated
+            span["estimated_tokens"] = -(-len(result) // CHARS_PER_TOKEN)
+        return result
+
+    def _plan(self, query: str) -> Optional[Plan]:
+        """Return the query planner's plan for the question, or None to ask the LLM."""
+        if not self.planner.enabled:
+            return None
+        with tracing.span("query_planner") as span:
+            plan = self.planner.plan(query)
+            span["intent"] = plan.intent if plan is not None else "fallback"
+        tracing.PLANNED_QUERIES.inc(intent=span["intent"])
+        return plan
+
+    def _run_plan(self, plan: Plan) -> Optional[Tuple[List[str], List[tuple], str]]:
+        """
+        Execute a planned query and format its answer.
+
+        Returns (columns, rows, answer), or None when the query fails, in which
+        case the question falls back to the LLM.
+        """
         try:
-            # Generate SQL query using the language model
-            sql_prompt = ChatPromptTemplate.from_messages([
-                ("user", """You are a SQL expert. Generate a SQL query for SQLite to answer this business intelligence question.
-                The analytics_data table has the following columns:
-                - date (TEXT): Date and time of the record
-                - page_views (INTEGER): Number of page views
-                - unique_visitors (INTEGER): Number of unique visitors
-                - session_duration (REAL): Average session duration in minutes
-                - bounce_rate (REAL): Bounce rate as a decimal (e.g., 0.35 for 35%)
-                - conversion_rate (REAL): Conversion rate as a decimal (e.g., 0.02 for 2%)
-                
-                For date comparisons, use the date() function.
-                For today's data, use date('now').
-                For last month, use date('now', '-1 month').
-                
-                Question: {query}
-                Please provide only the SQL query without any explanation or markdown formatting.""")
-            ])
-            sql_chain = sql_prompt | self.llm
-            sql_response = sql_chain.invoke({"query": query})
-            
-            # Extract and clean the SQL query
-            sql_query = sql_response.content.strip()
-            sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-            print(f"Generated SQL query: {sql_query}")
-            
+            columns, rows, _ = self._execute_sql(plan.sql, trusted=True)
+        except Exception as e:
+            print(f"Planned query failed, falling back to the LLM: {str(e)}")
+            return None
+        print(f"Planned query ({plan.intent}): {plan.sql}")
+        return columns, rows, plan.format(rows)
+
+    @staticmethod
+    def _clean_sql(content: str) -> str:
+        """Extract the SQL query from the LLM output, stripping markdown fences."""
+        sql_query = content.strip()
+        return sql_query.replace('```sql', '').replace('```', '').strip()
+
+    @staticmethod
+    def _split_sections(content: str, label: str, count: int) -> Dict[int, str]:
+        """
+        Split a batch reply into its numbered sections, each opened by a line
+        such as "-- Question 2" or "## Answer 2". Numbers outside 1..count,
+        repeated numbers and empty sections are dropped, as are sections under
+        a malformed marker such as "-- Question two", so they never run into
+        the section before. A reply for a single question without any marker
+        is taken whole.
+        """
+        markers = list(re.finditer(_SECTION_MARKER.format(label=label), content, re.M | re.I))
+        if not markers:
+            return {1: content.strip()} if count == 1 and content.strip() else {}
+        sections = {}
+        for marker, following in zip(markers, markers[1:] + [None]):
+            if not marker.group(1).isdigit():
+                continue
+            number = int(marker.group(1))
+            body = content[marker.end():following.start() if following else len(content)].strip()
+            if 1 <= number <= count and body and number not in sections:
+                sections[number] = body
+        return sections
+
+    @staticmethod
+    def _llm_config(call: str, span: Dict[str, Any]) -> Dict[str, Any]:
+        """Run config for an LLM call, recording its token usage in the metrics and ``span``."""
+        return {"callbacks": [TokenUsageHandler(call, span)]}
+
+    def _prepare(self, query: str) -> PreparedQuery:
+        """Answer the question with the query planner, or look up SQL cached for it."""
+        plan = self._plan(query)
+        if plan is not None:
+            planned = self._run_plan(plan)
+            if planned is not None:
+                return PreparedQuery(query, plan, planned)
+        schema_version = self._schema_version()
+        sql_query = self.query_cache.get(query, schema_version)
+        if sql_query is not None:
+            print(f"Query cache hit: {sql_query}")
+        return PreparedQuery(query, plan, None, schema_version, sql_query)
+
+    def _generated_sql(self, content: str) -> str:
+        sql_query = self._clean_sql(content)
+        print(f"Generated SQL query: {sql_query}")
+        return sql_query
+
+    def _execute(self, prepared: PreparedQuery, sql_query: str) -> ExecutedQuery:
+        """
+        Take the answer from the answer cache, or run the SQL and render its
+        result for narration. Generated SQL is added to the query cache once
+        it has run. Raises QueryError when the SQL fails.
+        """
+        # Unchanged SQL over unchanged data gives the same answer
+        data_version = self._data_version()
+        answer = self.answer_cache.get(sql_query, data_version)
+        if answer is not None:
+            print("Answer cache hit")
+        else:
             try:
-                # Execute the SQL query
-                result = self.db.run(sql_query)
-                print(f"Query result: {result}")
-                
-                if not result:
-                    return "No data found for the specified query."
-                
-                # Generate natural language response
-                response_prompt = ChatPromptTemplate.from_messages([
-                    ("user", """You are a business intelligence expert. Provide a clear and concise answer based on these SQL results.
-                    Format numbers appropriately (e.g., 1,234 instead of 1234).
-                    For rates, show as percentages (e.g., 35% instead of 0.35).
-                    For durations, show in minutes.
-                    
-                    Question: {query}
-                    SQL Query: {sql_query}
-                    Results: {result}
-                    
-                    Please provide a clear answer to the question based on this data.""")
-                ])
-                response_chain = response_prompt | self.llm
-                response = response_chain.invoke({
-                    "query": query,
-                    "sql_query": sql_query,
-                    "result": result
-                })
-                
-                return response.content
-                
+                columns, rows, truncated = self._execute_sql(sql_query)
             except Exception as db_error:
                 print(f"Database error: {str(db_error)}")
-                return f"Error executing query: {str(db_error)}"
-            
+                raise QueryError(f"Error executing query: {str(db_error)}") from db_error
+
+        # Only SQL that executed successfully is worth reusing
+        if prepared.cached_sql is None:
+            self.query_cache.set(prepared.query, sql_query, prepared.schema_version)
+
+        if answer is not None:
+            return ExecutedQuery(prepared.query, sql_query, data_version, answer)
+        result = self._format_result(columns, rows, truncated)
+        print(f"Query result: {result}")
+        return ExecutedQuery(prepared.query, sql_query, data_version, None if rows else NO_DATA,
+                             columns, rows, result)
+
+    @staticmethod
+    def _narration_inputs(executed: ExecutedQuery) -> Dict[str, str]:
+        return {"query": executed.query, "sql_query": executed.sql, "result": executed.result}
+
+    def _finish(self, executed: ExecutedQuery, answer: str) -> str:
+        """Cache a narrated answer for its SQL and data version, and return it."""
+        self.answer_cache.set(executed.sql, executed.data_version, answer)
+        return answer
+
+    def process_query(self, query: str) -> str:
+        """Process a business intelligence query and return a natural language response."""
+        try:
+            prepared = self._prepare(query)
+            if prepared.planned is not None:
+                return prepared.planned[2]
+
+            sql_query = prepared.cached_sql
+            if sql_query is None:
+                with tracing.span("sql_generation") as span:
+                    response = (SQL_PROMPT | self.llm).invoke(
+                        self._sql_prompt_inputs(query), config=self._llm_config("sql_generation", span)
+                    )
+                sql_query = self._generated_sql(response.content)
+
+            executed = self._execute(prepared, sql_query)
+            if executed.answer is not None:
+                return executed.answer
+
+            with tracing.span("narration") as span:
+                response = (RESPONSE_PROMPT | self.llm).invoke(
+                    self._narration_inputs(executed), config=self._llm_config("narration", span)
+                )
+            return self._finish(executed, response.content)
+
+        except QueryError as e:
+            return str(e)
+        except Exception as e:
+            print(f"General error: {str(e)}")
+            return f"Error processing query: {str(e)}"
+
+    async def aprocess_query(self, query: str) -> str:
+        """
+        Async variant of process_query.
+
+        LLM calls are awaited and database work runs in worker threads, so a
+        slow question never blocks the event loop serving other requests.
+        """
+        try:
+            prepared = await asyncio.to_thread(self._prepare, query)
+            if prepared.planned is not None:
+                return prepared.planned[2]
+
+            sql_query = prepared.cached_sql
+            if sql_query is None:
+                with tracing.span("sql_generation") as span:
+                    response = await (SQL_PROMPT | self.llm).ainvoke(
+                        self._sql_prompt_inputs(query), config=self._llm_config("sql_generation", span)
+                    )
+                sql_query = self._generated_sql(response.content)
+
+            executed = await asyncio.to_thread(self._execute, prepared, sql_query)
+            if executed.answer is not None:
+                return executed.answer
+
+            with tracing.span("narration") as span:
+                response = await (RESPONSE_PROMPT | self.llm).ainvoke(
+                    self._narration_inputs(executed), config=self._llm_config("narration", span)
+                )
+            return await asyncio.to_thread(self._finish, executed, response.content)
+
+        except QueryError as e:
+            return str(e)
         except Exception as e:
             print(f"General error: {str(e)}")
-            return f"Error processing query: {str(e)}" 
\ No newline at end of file
+            return f"Error processing query: {str(e)}"
+
+    async def astream_query(self, query: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a query and yield progress events as each stage completes.
+
+        Yields, in order, a ``sql`` event with the generated query, a ``rows``
+        event with the raw result, ``token`` events with narration text as the
+        LLM produces it and a final ``done`` event carrying the full answer.
+        Failures are reported as a single ``error`` event. Questions answered
+        by the query planner yield the whole answer as one ``token`` event.
+        """
+        try:
+            prepared = await asyncio.to_thread(self._prepare, query)
+            if prepared.planned is not None:
+                columns, rows, answer = prepared.planned
+                yield {"event": "sql", "data": {"sql": prepared.plan.sql, "cached": False, "planned": True}}
+                yield {"event": "rows", "data": {"columns": columns, "rows": [list(row) for row in rows]}}
+                yield {"event": "token", "data": {"text": answer}}
+                yield {"event": "done", "data": {"response": answer}}
+                return
+
+            sql_query = prepared.cached_sql
+            if sql_query is None:
+                with tracing.span("sql_generation") as span:
+                    response = await (SQL_PROMPT | self.llm).ainvoke(
+                        self._sql_prompt_inputs(query), config=self._llm_config("sql_generation", span)
+                    )
+                sql_query = self._generated_sql(response.content)
+            yield {"event": "sql", "data": {"sql": sql_query, "cached": prepared.cached_sql is not None, "planned": False}}
+
+            executed = await asyncio.to_thread(self._execute, prepared, sql_query)
+            if executed.columns is not None:
+                yield {"event": "rows", "data": {"columns": executed.columns, "rows": [list(row) for row in executed.rows]}}
+            if executed.answer is not None:
+                yield {"event": "token", "data": {"text": executed.answer}}
+                yield {"event": "done", "data": {"response": executed.answer}}
+                return
+
+            chunks = []
+            # Includes the time the client takes to receive each token
+            with tracing.span("narration", streamed=True) as span:
+                async for chunk in (RESPONSE_PROMPT | self.llm).astream(
+                        self._narration_inputs(executed), config=self._llm_config("narration", span)):
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield {"event": "token", "data": {"text": chunk.content}}
+
+            answer = await asyncio.to_thread(self._finish, executed, "".join(chunks))
+            yield {"event": "done", "data": {"response": answer}}
+
+        except QueryError as e:
+            yield {"event": "error", "data": {"error": str(e)}}
+        except Exception as e:
+            print(f"General error: {str(e)}")
+            yield {"event": "error", "data": {"error": f"Error processing query: {str(e)}"}}
+
+    async def _agenerate_batch_sql(self, queries: List[str]) -> Dict[int, str]:
+        """Generate SQL for several questions in one LLM call; returns {question number: SQL}."""
+        dialect = self.query_backend.SQL_DIALECT
+        questions = "\n    ".join(f"Question {n}: {query}" for n, query in enumerate(queries, 1))
+        with tracing.span("sql_generation", questions=len(queries)) as span:
+            sql_response = await (BATCH_SQL_PROMPT | self.llm).ainvoke(
+                {"dialect": dialect, "dialect_notes": DIALECT_NOTES[dialect], "questions": questions},
+                config=self._llm_config("sql_generation", span)
+            )
+        statements = self._split_sections(self._clean_sql(sql_response.content), "Question", len(queries))
+        print(f"Generated SQL for {len(statements)} of {len(queries)} questions")
+        return {n: self._clean_sql(sql) for n, sql in statements.items()}
+
+    async def _anarrate_batch(self, items: List[ExecutedQuery]) -> Dict[int, str]:
+        """Narrate several executed questions in one LLM call; returns {item number: answer}."""
+        questions = "\n    \n    ".join(
+            f"Question {n}: {item.query}\n    SQL Query: {item.sql}\n    Results: {item.result}"
+            for n, item in enumerate(items, 1)
+        )
+        with tracing.span("narration", questions=len(items)) as span:
+            response = await (BATCH_RESPONSE_PROMPT | self.llm).ainvoke(
+                {"questions": questions}, config=self._llm_config("narration", span)
+            )
+        return self._split_sections(response.content, "Answer", len(items))
+
+    async def abatch_query(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer several questions with at most two LLM calls in total.
+
+        Questions answered by the query planner skip the LLM, and those with
+        cached SQL skip SQL generation; SQL for the rest is generated in one
+        call. All statements then run concurrently, and the results that need
+        narrating are narrated together in one more call. Returns one dict per
+        question, in order, with its ``question``, ``sql``, ``response`` and
+        ``error`` (None unless that question failed).
+        """
+        results = [{"question": query, "sql": None, "response": None, "error": None} for query in queries]
+
+        prepared = await asyncio.gather(*(asyncio.to_thread(self._prepare, query) for query in queries))
+        generate = []
+        for i, question in enumerate(prepared):
+            if question.planned is not None:
+                results[i].update(sql=question.plan.sql, response=question.planned[2])
+            elif question.cached_sql is not None:
+                results[i]["sql"] = question.cached_sql
+            else:
+                generate.append(i)
+        if generate:
+            try:
+                statements = await self._agenerate_batch_sql([queries[i] for i in generate])
+            except Exception as e:
+                print(f"Error generating batch SQL: {str(e)}")
+                for i in generate:
+                    results[i]["error"] = f"Error processing query: {str(e)}"
+            else:
+                for n, i in enumerate(generate, 1):
+                    if n in statements:
+                        results[i]["sql"] = statements[n]
+                    else:
+                        results[i]["error"] = "Error processing query: no SQL was generated for this question"
+
+        execute = [i for i, result in enumerate(results) if result["response"] is None and result["error"] is None]
+        outcomes = await asyncio.gather(
+            *(asyncio.to_thread(self._execute, prepared[i], results[i]["sql"]) for i in execute),
+            return_exceptions=True
+        )
+        narrate = []
+        for i, outcome in zip(execute, outcomes):
+            if isinstance(outcome, QueryError):
+                results[i]["error"] = str(outcome)
+            elif isinstance(outcome, Exception):
+                print(f"General error: {str(outcome)}")
+                results[i]["error"] = f"Error processing query: {str(outcome)}"
+            elif outcome.answer is not None:
+                results[i]["response"] = outcome.answer
+            else:
+                narrate.append((i, outcome))
+
+        if narrate:
+            try:
+                answers = await self._anarrate_batch([executed for _, executed in narrate])
+            except Exception as e:
+                print(f"Error narrating batch: {str(e)}")
+                answers = {}
+                error = f"Error processing query: {str(e)}"
+            else:
+                error = "Error processing query: no answer was generated for this question"
+            for n, (i, executed) in enumerate(narrate, 1):
+                if n in answers:
+                    results[i]["response"] = await asyncio.to_thread(self._finish, executed, answers[n])
+                else:
+                    results[i]["error"] = error
+        return results
@@ -0,0 +1,522 @@
+"""
+Deterministic answers for common question shapes, without the LLM.
+
+Most questions are one of a few shapes over one analytics_data metric:
+
+- an aggregate over a relative window: "What was the average bounce rate
+  in the last 7 days?", "Total page views this month", "Highest unique
+  visitors yesterday"
+- a comparison of two periods: "Compare page views this week vs last
+  week", "How did conversion rate change over the last 30 days?"
+- the top or bottom days: "Top 5 days by page views last month", "Which
+  day had the lowest bounce rate?"; counts are summed per day and the
+  other metrics averaged
+
+QueryPlanner.plan recognizes these shapes, fills a SQL template and returns
+a Plan whose ``format`` turns the result rows into an answer, following
+the narration prompt's rules (1,234; rates as percentages; durations in
+minutes). Every word of the question has to be accounted for; anything
+else, such as a filter or grouping the templates do not know, returns None
+so that the question goes to the LLM.
+
+Relative windows end at the current time, like the SQL the LLM is told to
+write. Months are 30 days and years 365 days, except "this month" and
+"this year", which start at the calendar boundary. A current calendar period
+is only partly over, so it is compared with the same elapsed span of the
+previous one ("this week" on a Wednesday against last Monday to Wednesday).
+
+Aggregates and comparisons read each window's whole months from
+analytics_monthly, its remaining whole days from analytics_daily and only
+the partial days at either end from analytics_data, so their cost does not
+grow with the window. As in /analytics, averages are sums over row counts.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from data import repository, rollups
+
+HOUR = 3600
+DAY = 86400
+
+UNIT_SECONDS = {
+    'hour': HOUR,
+    'day': DAY,
+    'week': 7 * DAY,
+    'month': 30 * DAY,
+    'year': 365 * DAY,
+}
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12,
+    'fourteen': 14, 'fifteen': 15, 'twenty': 20, 'thirty': 30,
+}
+_NUMBER = r'(\d+|' + '|'.join(NUMBER_WORDS) + r')'
+
+# Phrases naming each metric, matched longest first
+METRIC_PHRASES = {
+    'page_views': ('page views', 'pageviews', 'page view', 'views'),
+    'unique_visitors': ('unique visitors', 'unique users', 'visitors', 'users'),
+    'session_duration': ('session duration', 'session length',
+                         'session time', 'time on site'),
+    'bounce_rate': ('bounce rate', 'bounces'),
+    'conversion_rate': ('conversion rate', 'conversions'),
+}
+
+# Summed by default; the other metrics are averaged
+COUNT_METRICS = ('page_views', 'unique_visitors')
+
+AGGREGATE_WORDS = {
+    'avg': ('average', 'avg', 'mean', 'typical'),
+    'sum': ('how many', 'total', 'sum'),
+    'min': ('minimum', 'min', 'lowest', 'fewest', 'least', 'smallest'),
+    'max': ('maximum', 'max', 'highest', 'peak', 'most', 'largest', 'biggest'),
+}
+
+AGGREGATE_NAMES = {'avg': 'average', 'sum': 'total', 'min': 'lowest', 'max': 'highest'}
+
+COMPARE_WORDS = ('compared to', 'compared with', 'compare', 'comparison', 'versus', 'vs', 'against',
+                 'changed', 'change', 'difference', 'differ')
+
+# Words that carry no meaning for the templates
+STOP_WORDS = frozenset('''
+    what is was were are be been the our my of for in over during on show me tell give get
+    a an did do does we have had has how to from with and between by at us please i see
+    data so far
+'''.split())
+
+NO_DATA = "No data found for the specified query."
+
+
+class Window(NamedTuple):
+    """[start, end) in ts; None leaves that side open."""
+    start: Optional[int]
+    end: Optional[int]
+    label: str
+    # 'rolling' (last N units), 'calendar' (this unit, today, yesterday) or
+    # 'previous' (previous N units, relative to the other window of a comparison)
+    kind: str = 'rolling'
+    unit: Optional[str] = None
+    count: int = 1
+
+
+class Plan(NamedTuple):
+    """SQL answering a recognized question and the formatter of its rows."""
+    intent: str
+    sql: str
+    format: Callable[[List[tuple]], str]
+
+
+def _number(value: float, decimals: int) -> str:
+    text = f"{value:,.{decimals}f}"
+    return text.rstrip('0').rstrip('.') if '.' in text else text
+
+
+def format_metric(metric: str, value: Optional[float], aggregate: str = 'sum') -> str:
+    """Format a metric value the way the narration prompt asks for."""
+    if value is None:
+        return "n/a"
+    if metric.endswith('_rate'):
+        return _number(value * 100, 2) + '%'
+    if metric == 'session_duration':
+        return _number(value, 2) + ' minutes'
+    return _number(value, 1 if aggregate == 'avg' else 0)
+
+
+def metric_name(metric: str) -> str:
+    return metric.replace('_', ' ')
+
+
+def _verb(metric: str) -> str:
+    return 'were' if metric in COUNT_METRICS else 'was'
+
+
+def _parse_count(text: Optional[str]) -> int:
+    if not text:
+        return 1
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def _calendar_start(unit: str, ts: int) -> int:
+    """Start of the calendar day, week (Monday), month or year containing ts."""
+    if unit in ('day', 'week', 'month'):
+        return rollups.bucket_start(unit, ts)
+    if unit == 'year':
+        year = (repository.EPOCH + timedelta(seconds=ts)).year
+        return repository.to_timestamp(datetime(year, 1, 1))
+    return ts - ts % HOUR
+
+
+def _bucket_ceil(granularity: str, ts: int) -> int:
+    """Start of the first rollup bucket starting at or after ts."""
+    start, end = rollups.bucket_bounds(granularity, ts)
+    return ts if start == ts else end
+
+
+def _segments(start: Optional[int], end: Optional[int],
+              granularities: Tuple[str, ...] = ('month', 'day')) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """
+    Split [start, end) into (table, start, end) pieces, each read from the
+    coarsest table covering it exactly: whole months from the monthly rollup,
+    whole days from the daily one and the rest from analytics_data. None
+    leaves a side open.
+    """
+    if not granularities:
+        return [('analytics_data', start, end)]
+    granularity, finer = granularities[0], granularities[1:]
+    inner_start = _bucket_ceil(granularity, start) if start is not None else None
+    inner_end = rollups.bucket_start(granularity, end) if end is not None else None
+    if inner_start is not None and inner_end is not None and inner_start >= inner_end:
+        return _segments(start, end, finer)
+    segments = []
+    if start is not None and start < inner_start:
+        segments += _segments(start, inner_start, finer)
+    segments.append((rollups.ROLLUP_TABLES[granularity], inner_start, inner_end))
+    if end is not None and inner_end < end:
+        segments += _segments(inner_end, end, finer)
+    return segments
+
+
+def _range(column: str, start: Optional[int], end: Optional[int]) -> str:
+    conditions = []
+    if start is not None:
+        conditions.append(f"{column} >= {start}")
+    if end is not None:
+        conditions.append(f"{column} < {end}")
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+
+def _unit_label(count: int, unit: str) -> str:
+    return unit if count == 1 else f"{count} {unit}s"
+
+
+class QueryPlanner:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+
+    @classmethod
+    def from_env(cls) -> "QueryPlanner":
+        """Build a planner configured through the QUERY_PLANNER environment variable."""
+        return cls(enabled=os.getenv("QUERY_PLANNER", "true").lower() in ("1", "true", "yes"))
+
+    def plan(self, question: str, now_ts: Optional[int] = None) -> Optional[Plan]:
+        """Return a Plan for ``question``, or None when it does not fit a template."""
+        if not self.enabled:
+            return None
+        if now_ts is None:
+            now_ts = repository.to_timestamp(datetime.now())
+
+        text = question.lower().replace("'s", '').replace("'", '')
+        text = ' '.join(re.sub(r'[^a-z0-9_]+', ' ', text).split())
+        text, windows = self._take_windows(text, now_ts)
+        text, top = self._take_top_days(text)
+        text, comparing = self._take_any(text, COMPARE_WORDS)
+        text, aggregate = self._take_aggregate(text)
+        text, metrics = self._take_metrics(text)
+
+        if len(metrics) != 1 or any(word not in STOP_WORDS for word in text.split()):
+            return None
+        metric = metrics[0]
+
+        if windows and windows[0].start is None and not comparing:
+            return None  # "the previous period" with nothing to precede
+        if top is not None:
+            if comparing or aggregate or len(windows) > 1:
+                return None
+            return self._top_days(metric, top, windows[0] if windows else None)
+        if comparing:
+            periods = self._comparison_windows(windows, now_ts)
+            if periods is None:
+                return None
+            return self._compare(metric, aggregate, *periods)
+        if len(windows) > 1 or (not windows and aggregate is None):
+            return None
+        return self._aggregate(metric, aggregate, windows[0] if windows else None)
+
+    # Recognizers: each removes what it matched from the text
+
+    @staticmethod
+    def _take_any(text: str, phrases) -> Tuple[str, bool]:
+        pattern = r'\b(?:' + '|'.join(re.escape(p) for p in phrases) + r')\b'
+        text, found = re.subn(pattern, ' ', text)
+        return text, found > 0
+
+    def _take_windows(self, text: str, now_ts: int) -> Tuple[str, List[Window]]:
+        found: List[Tuple[int, Window]] = []
+
+        def rolling(match):
+            word, count, unit = match.group(1), _parse_count(match.group(2)), match.group(3)
+            start = now_ts - count * UNIT_SECONDS[unit]
+            if word in ('last', 'past'):
+                window = Window(start, None, f"in the last {_unit_label(count, unit)}", 'rolling', unit, count)
+            else:
+                window = Window(start, None, f"in the previous {_unit_label(count, unit)}", 'previous', unit, count)
+            found.append((match.start(), window))
+            return ' '
+
+        def calendar(match):
+            unit = match.group(1)
+            start = _calendar_start(unit, now_ts)
+            found.append((match.start(), Window(start, None, f"this {unit}", 'calendar', unit)))
+            return ' '
+
+        def day(match):
+            today = _calendar_start('day', now_ts)
+            if match.group(1) == 'today':
+                window = Window(today, None, "today", 'calendar', 'day')
+            else:
+                window = Window(today - DAY, today, "yesterday", 'calendar', 'day')
+            found.append((match.start(), window))
+            return ' '
+
+        def over(match):
+            unit = match.group(1)
+            start = now_ts - UNIT_SECONDS[unit]
+            found.append((match.start(), Window(start, None, f"in the last {unit}", 'rolling', unit)))
+            found.append((match.end(), Window(None, None, f"in the previous {unit}", 'previous', unit)))
+            return ' compare '
+
+        text = re.sub(r'\b(hour|day|week|month|year) over \1\b', over, text)
+        text = re.sub(r'\b(?:the )?(last|past|previous|prior|preceding) (?:' + _NUMBER + r' )?'
+                      r'(hour|day|week|month|year)s?\b', rolling, text)
+        text = re.sub(r'\b(?:the )?(?:previous|prior|preceding|same) period\b',
+                      lambda m: found.append((m.start(), Window(None, None, '', 'previous'))) or ' ', text)
+        text = re.sub(r'\bthis (day|week|month|year)\b', calendar, text)
+        text = re.sub(r'\b(today|yesterday)\b', day, text)
+        return text, [window for _, window in sorted(found, key=lambda item: item[0])]
+
+    @staticmethod
+    def _take_top_days(text: str) -> Tuple[str, Optional[Tuple[int, bool]]]:
+        """Find "top N days" style phrases; returns (days, descending)."""
+        top = None
+
+        def ranked(match):
+            nonlocal top
+            count = _parse_count(match.group(2)) if match.group(2) else (5 if match.group(3) == 'days' else 1)
+            top = (count, match.group(1) in ('top', 'highest', 'busiest', 'most'))
+            return ' '
+
+        def which(match):
+            nonlocal top
+            top = (5 if match.group(1) == 'days' else 1, match.group(2) in ('most', 'highest'))
+            return ' '
+
+        text = re.sub(r'\b(top|bottom|highest|lowest|busiest|quietest) (?:' + _NUMBER + r' )?(days|day)\b', ranked, text)
+        text = re.sub(r'\b(?:which|what) (days|day) (?:had|has|have|saw|got) the (most|highest|fewest|lowest|least)\b',
+                      which, text)
+        return text, top
+
+    @staticmethod
+    def _take_aggregate(text: str) -> Tuple[str, Optional[str]]:
+        found = set()
+        for aggregate, words in AGGREGATE_WORDS.items():
+            text, matched = QueryPlanner._take_any(text, words)
+            if matched:
+                found.add(aggregate)
+        return text, found.pop() if len(found) == 1 else ('ambiguous' if found else None)
+
+    @staticmethod
+    def _take_metrics(text: str) -> Tuple[str, List[str]]:
+        phrases = sorted(
+            ((phrase, metric) for metric, names in METRIC_PHRASES.items() for name in names
+             for phrase in (name, name.replace(' ', '_'))),
+            key=lambda item: -len(item[0])
+        )
+        metrics = []
+        for phrase, metric in phrases:
+            text, matched = QueryPlanner._take_any(text, (phrase,))
+            if matched and metric not in metrics:
+                metrics.append(metric)
+        return text, metrics
+
+    @staticmethod
+    def _comparison_windows(windows: List[Window], now_ts: int) -> Optional[Tuple[Window, Window]]:
+        """Return (current, previous) periods, or None when they cannot be told apart."""
+        if len(windows) == 1 and windows[0].kind != 'previous':
+            windows = windows + [Window(None, None, '', 'previous')]
+        if len(windows) != 2:
+            return None
+        current, other = windows
+        if current.kind == 'previous' or (current.kind == 'rolling' and other.kind == 'calendar'):
+            current, other = other, current
+        if current.kind == 'previous':
+            return None
+
+        if other.kind == 'previous' or (
+                current.kind == 'calendar' and other.kind == 'rolling' and other.unit == current.unit
+                and other.count == 1):
+            # "previous 7 days", "the previous period" or "last week" after
+            # "this week": the period just before the current one
+            end = current.start
+            if current.kind == 'calendar':
+                start = _calendar_start(current.unit, end - 1)
+                label = {"today": "yesterday", "yesterday": "the day before"}.get(
+                    current.label, f"last {current.unit}")
+                if current.end is None:
+                    # The current period is still running: compare the same elapsed span
+                    end = min(start + now_ts - current.start, end)
+                    label += " up to the same point"
+            else:
+                unit, count = (other.unit, other.count) if other.unit else (current.unit, current.count)
+                start = end - UNIT_SECONDS[unit] * count
+                label = f"in the previous {_unit_label(count, unit)}"
+            return current, Window(start, end, label, 'previous')
+
+        # Two explicit periods: the one starting later is the current one
+        if current.start is None or other.start is None:
+            return None
+        if other.start > current.start:
+            current, other = other, current
+        if other.end is None or other.end > current.start:
+            return None
+        if (current.kind == 'calendar' and current.end is None and other.kind == 'calendar'
+                and other.unit == current.unit and other.end == current.start):
+            # "today vs yesterday": today is still running, compare the same elapsed span
+            other = other._replace(end=min(other.start + now_ts - current.start, other.end),
+                                   label=f"{other.label} up to the same point")
+        return current, other
+
+    # SQL templates
+
+    @staticmethod
+    def _default_aggregate(metric: str, aggregate: Optional[str]) -> Optional[str]:
+        if aggregate is None:
+            return 'sum' if metric in COUNT_METRICS else 'avg'
+        if aggregate == 'sum' and metric not in COUNT_METRICS:
+            return None  # a total of rates or durations means nothing
+        return aggregate if aggregate in AGGREGATE_NAMES else None
+
+    @staticmethod
+    def _window_parts(metric: str, aggregate: str, window: Optional[Window]) -> str:
+        """
+        UNION ALL of one row per segment of the window: ``total`` and row count
+        ``n`` for sum and avg; for min and max the extreme ``value`` and the ts
+        range (``first_ts``, ``last_ts``) of the rows it was taken from.
+        """
+        start, end = (window.start, window.end) if window is not None else (None, None)
+        function = aggregate.upper()
+        parts = []
+        for table, first, last in _segments(start, end):
+            if table == 'analytics_data':
+                where = _range('ts', first, last)
+                if aggregate in ('min', 'max'):
+                    parts.append(f"SELECT {function}({metric}) AS value, MIN(ts) AS first_ts, MAX(ts) AS last_ts "
+                                 f"FROM analytics_data{where}")
+                else:
+                    parts.append(f"SELECT SUM({metric}) AS total, COUNT(*) AS n FROM analytics_data{where}")
+            else:
+                where = _range('bucket_ts', first, last)
+                if aggregate in ('min', 'max'):
+                    parts.append(f"SELECT {metric}_{aggregate} AS value, bucket_ts AS first_ts, last_ts FROM {table}{where}")
+                else:
+                    parts.append(f"SELECT SUM({metric}_sum) AS total, SUM(row_count) AS n FROM {table}{where}")
+        return ' UNION ALL '.join(parts)
+
+    @staticmethod
+    def _combined(aggregate: str) -> str:
+        """Expression combining the rows of _window_parts into the aggregate over the whole window."""
+        if aggregate in ('min', 'max'):
+            return f"{aggregate.upper()}(value)"
+        return "SUM(total)" if aggregate == 'sum' else "SUM(total) * 1.0 / NULLIF(SUM(n), 0)"
+
+    def _aggregate(self, metric: str, aggregate: Optional[str], window: Optional[Window]) -> Optional[Plan]:
+        aggregate = self._default_aggregate(metric, aggregate)
+        if aggregate is None:
+            return None
+        suffix = f" {window.label}" if window is not None else ""
+        name = metric_name(metric)
+
+        if aggregate in ('min', 'max'):
+            # Pick the segment holding the extreme (the latest one on ties), then the row within it
+            order = 'DESC' if aggregate == 'max' else 'ASC'
+            sql = (
+                f"WITH best AS (SELECT first_ts, last_ts FROM ({self._window_parts(metric, aggregate, window)}) AS segments "
+                f"WHERE value IS NOT NULL ORDER BY value {order}, last_ts DESC LIMIT 1) "
+                f"SELECT date, {metric} FROM analytics_data, best "
+                f"WHERE ts >= best.first_ts AND ts <= best.last_ts AND {metric} IS NOT NULL "
+                f"ORDER BY {metric} {order}, ts DESC LIMIT 1"
+            )
+
+            def format_extreme(rows: List[tuple]) -> str:
+                if not rows or rows[0][1] is None:
+                    return NO_DATA
+                date, value = rows[0]
+                return (f"The {AGGREGATE_NAMES[aggregate]} {name}{suffix} {_verb(metric)} "
+                        f"{format_metric(metric, value, aggregate)}, on {date}.")
+            return Plan('aggregate', sql, format_extreme)
+
+        sql = (f"SELECT {self._combined(aggregate)} AS {aggregate}_{metric}, SUM(n) AS row_count "
+               f"FROM ({self._window_parts(metric, aggregate, window)}) AS segments")
+
+        def format_aggregate(rows: List[tuple]) -> str:
+            if not rows or rows[0][0] is None:
+                return NO_DATA
+            return (f"The {AGGREGATE_NAMES[aggregate]} {name}{suffix} {_verb(metric)} "
+                    f"{format_metric(metric, rows[0][0], aggregate)}.")
+        return Plan('aggregate', sql, format_aggregate)
+
+    def _compare(self, metric: str, aggregate: Optional[str], current: Window, previous: Window) -> Optional[Plan]:
+        aggregate = self._default_aggregate(metric, aggregate)
+        if aggregate is None:
+            return None
+        current_value, previous_value = (
+            f"(SELECT {self._combined(aggregate)} FROM ({self._window_parts(metric, aggregate, window)}) AS segments)"
+            for window in (current, previous)
+        )
+        sql = f"SELECT {current_value} AS current_{metric}, {previous_value} AS previous_{metric}"
+        name = metric_name(metric)
+
+        def format_comparison(rows: List[tuple]) -> str:
+            if not rows or (rows[0][0] is None and rows[0][1] is None):
+                return NO_DATA
+            now_value, then_value = rows[0]
+            subject = f"The {AGGREGATE_NAMES[aggregate]} {name}"
+            if now_value is None:
+                return f"{subject} {_verb(metric)} {format_metric(metric, then_value, aggregate)} {previous.label}; there is no data {current.label}."
+            if then_value is None:
+                return f"{subject} {_verb(metric)} {format_metric(metric, now_value, aggregate)} {current.label}; there is no data {previous.label}."
+            if metric.endswith('_rate'):
+                # From the percentages as displayed, so the change adds up with them
+                delta = round(now_value * 100, 2) - round(then_value * 100, 2)
+                change = f"{_number(abs(delta), 2)} percentage points"
+            elif then_value:
+                delta = round((now_value - then_value) / abs(then_value) * 100, 1)
+                change = f"{_number(abs(delta), 1)}%"
+            else:
+                delta = now_value - then_value
+                change = format_metric(metric, abs(delta), aggregate)
+            # A change too small to show reads as unchanged rather than "down 0"
+            direction = 'up' if round(delta, 2) > 0 else 'down' if round(delta, 2) < 0 else None
+            movement = f"{direction} {change}" if direction else "unchanged"
+            return (f"{subject} {_verb(metric)} {format_metric(metric, now_value, aggregate)} {current.label}, "
+                    f"{movement} from {format_metric(metric, then_value, aggregate)} {previous.label}.")
+        return Plan('compare', sql, format_comparison)
+
+    def _top_days(self, metric: str, top: Tuple[int, bool], window: Optional[Window]) -> Plan:
+        # Read from the daily rollup, whose days are whole: a window starting
+        # mid-day includes all of its first day
+        count, descending = top
+        aggregate = 'sum' if metric in COUNT_METRICS else 'avg'
+        value = f"{metric}_sum" if aggregate == 'sum' else f"{metric}_sum * 1.0 / row_count"
+        start, end = (window.start, window.end) if window is not None else (None, None)
+        where = _range('bucket_ts', _calendar_start('day', start) if start is not None else None, end)
+        sql = (
+            f"SELECT substr(date, 1, 10) AS day, {value} AS {metric} "
+            f"FROM {rollups.ROLLUP_TABLES['day']}{where} "
+            f"ORDER BY 2 {'DESC' if descending else 'ASC'}, 1 LIMIT {count}"
+        )
+        name = metric_name(metric)
+        suffix = f" {window.label}" if window is not None else ""
+
+        def format_days(rows: List[tuple]) -> str:
+            if not rows:
+                return NO_DATA
+            rank = 'highest' if descending else 'lowest'
+            if count == 1:
+                return f"The day with the {rank} {name}{suffix} was {rows[0][0]}, with {format_metric(metric, rows[0][1], aggregate)}."
+            lines = [f"The {len(rows)} days with the {rank} {name}{suffix}:"]
+            lines += [f"{i}. {day}: {format_metric(metric, value, aggregate)}" for i, (day, value) in enumerate(rows, 1)]
+            return '\n'.join(lines)
+        return Plan('top_days', sql, format_days)
@@ -1,13 +1,16 @@
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
-from ..visualization.plotly_charts import (
+from analysis.report_engine import ReportEngine
+from visualization.plotly_charts import (
     create_time_series_chart,
     create_metric_comparison_chart,
     create_metric_distribution_chart,
     create_correlation_heatmap
 )
 
+REPORT_METRICS = ['revenue', 'users', 'conversion_rate', 'average_order_value']
+
 class BusinessIntelligenceAnalyzer:
     def __init__(self, df: pd.DataFrame):
         """
@@ -31,7 +34,7 @@ class BusinessIntelligenceAnalyzer:
             Dictionary containing analysis results and visualizations
         """
         # Calculate moving average
-        self.df[f'{metric}_ma'] = self.df[metric].rolling(window=window).mean()
+        moving_average = self.df[metric].rolling(window=window).mean()
         
         # Calculate trend direction
         latest_value = self.df[metric].iloc[-1]
@@ -50,6 +53,7 @@ class BusinessIntelligenceAnalyzer:
             "latest_value": latest_value,
             "previous_value": previous_value,
             "percentage_change": ((latest_value - previous_value) / previous_value) * 100,
+            "moving_average": moving_average.iloc[-1],
             "visualization": fig
         }
     
@@ -130,10 +134,10 @@ class BusinessIntelligenceAnalyzer:
         # Calculate z-scores
         mean = self.df[metric].mean()
         std = self.df[metric].std()
-        self.df[f'{metric}_zscore'] = (self.df[metric] - mean) / std
+        zscores = (self.df[metric] - mean) / std
         
         # Identify anomalies
-        anomalies = self.df[self.df[f'{metric}_zscore'].abs() > threshold]
+        anomalies = self.df[zscores.abs() > threshold]
         
         # Create visualization
         fig = create_time_series_chart(
@@ -149,26 +153,98 @@ class BusinessIntelligenceAnalyzer:
             "visualization": fig
         }
     
-    def generate_report(self) -> Dict[str, Any]:
+    def generate_report(
+        self,
+        metrics: Optional[List[str]] = None,
+        include_visualizations: bool = False,
+        window: int = 7,
+        threshold: float = 2.0
+    ) -> Dict[str, Any]:
         """
         Generate a comprehensive business intelligence report.
         
+        All statistics come from a single vectorized pass over the metric
+        matrix (see ReportEngine). Figures are the expensive part of a report,
+        so they are only built when ``include_visualizations`` is set.
+        
+        Args:
+            metrics: Metrics to include; defaults to REPORT_METRICS
+            include_visualizations: Whether to attach Plotly figures
+            window: Window size for moving average and trend calculation
+            threshold: Z-score threshold for anomaly detection
+            
         Returns:
             Dictionary containing the complete analysis report
         """
-        metrics = ['revenue', 'users', 'conversion_rate', 'average_order_value']
+        metrics = list(metrics or REPORT_METRICS)
+        engine = ReportEngine(self.df, metrics, window=window)
+        stats = engine.compute(threshold=threshold)
         
         report = {
             "trend_analysis": {},
-            "metric_comparison": self.compare_metrics(metrics),
+            "metric_comparison": {"correlations": stats["correlations"].to_dict()},
             "distributions": {},
             "anomalies": {}
         }
         
-        # Analyze trends for each metric
+        for i, metric in enumerate(metrics):
+            values = self.df[metric].to_numpy()
+            latest_value = values[-1]
+            previous_value = values[-window]
+            mask = stats["anomalies"][:, i]
+            
+            report["trend_analysis"][metric] = {
+                "trend_direction": "increasing" if latest_value > previous_value else "decreasing",
+                "latest_value": latest_value,
+                "previous_value": previous_value,
+                "percentage_change": ((latest_value - previous_value) / previous_value) * 100,
+                "moving_average": stats["moving_average"][i]
+            }
+            report["distributions"][metric] = {
+                "statistics": {
+                    "mean": stats["mean"][i],
+                    "median": stats["median"][i],
+                    "std": stats["std"][i],
+                    "min": stats["min"][i],
+                    "max": stats["max"][i]
+                }
+            }
+            report["anomalies"][metric] = {
+                "anomaly_count": int(mask.sum()),
+                "anomaly_dates": engine.format_dates(mask),
+                "anomaly_values": values[mask].tolist()
+            }
+        
+        if include_visualizations:
+            self._attach_visualizations(report, metrics)
+        
+        return report
+    
+    def _attach_visualizations(self, report: Dict[str, Any], metrics: List[str]) -> None:
+        """Build the Plotly figures for a report generated by generate_report."""
+        report["metric_comparison"]["comparison_chart"] = create_metric_comparison_chart(
+            self.df,
+            metrics,
+            "Metric Comparison"
+        )
+        report["metric_comparison"]["correlation_heatmap"] = create_correlation_heatmap(
+            self.df,
+            metrics,
+            "Metric Correlations"
+        )
         for metric in metrics:
-            report["trend_analysis"][metric] = self.analyze_trends(metric)
-            report["distributions"][metric] = self.analyze_distribution(metric)
-            report["anomalies"][metric] = self.detect_anomalies(metric)
-        
-        return report 
\ No newline at end of file
+            report["trend_analysis"][metric]["visualization"] = create_time_series_chart(
+                self.df,
+                metric,
+                f"{metric} Trend Analysis"
+            )
+            report["distributions"][metric]["visualization"] = create_metric_distribution_chart(
+                self.df,
+                metric,
+                f"{metric} Distribution"
+            )
+            report["anomalies"][metric]["visualization"] = create_time_series_chart(
+                self.df,
+                metric,
+                f"{metric} with Anomalies"
+            )
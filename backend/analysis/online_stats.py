@@ -0,0 +1,270 @@
+"""
+Incremental (online) statistics for metric streams.
+
+Each accumulator folds in a batch of new observations in one vectorized step
+and keeps only O(1) state (O(window) for RollingWindow), so answering "what
+is the mean / trend / z-score now" never rescans history. MetricState bundles
+them for one metric and round-trips through a JSON-friendly dict, which
+data.metric_state persists alongside analytics_data.
+"""
+import math
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EWMA_ALPHA = float(os.getenv("EWMA_ALPHA", "0.1"))
+ROLLING_WINDOW = int(os.getenv("ROLLING_WINDOW", "168"))
+ANOMALY_THRESHOLD = float(os.getenv("ANOMALY_THRESHOLD", "2.0"))
+# Most recent anomalies kept per metric
+RECENT_ANOMALIES = 100
+
+
+class Welford:
+    """Running count, mean and sample variance, merged batch-wise (Welford/Chan)."""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, values: np.ndarray):
+        k = len(values)
+        if not k:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        n = self.count + k
+        delta = batch_mean - self.mean
+        self.mean += delta * k / n
+        self.m2 += batch_m2 + delta * delta * self.count * k / n
+        self.count = n
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+
+class EWMA:
+    """Exponentially weighted mean and variance with smoothing factor ``alpha``."""
+
+    def __init__(self, alpha: float = EWMA_ALPHA, mean: Optional[float] = None, var: float = 0.0):
+        self.alpha = alpha
+        self.mean = mean
+        self.var = var
+
+    def update(self, values: np.ndarray):
+        if not len(values):
+            return
+        if self.mean is None:
+            self.mean = float(values[0])
+            values = values[1:]
+            if not len(values):
+                return
+        # Closed form of k sequential updates, centred on the current mean:
+        # the weighted first and second moments of (x - mean) decay by
+        # (1 - alpha) per step, and the new variance is m2 - m1 ** 2.
+        decay = 1.0 - self.alpha
+        weights = self.alpha * decay ** np.arange(len(values) - 1, -1, -1)
+        shifted = values - self.mean
+        m1 = float((weights * shifted).sum())
+        m2 = decay ** len(values) * self.var + float((weights * shifted * shifted).sum())
+        self.mean += m1
+        self.var = max(m2 - m1 * m1, 0.0)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.var)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "mean": self.mean, "var": self.var}
+
+
+class RollingWindow:
+    """The last ``size`` observations, for exact rolling mean and standard deviation."""
+
+    def __init__(self, size: int = ROLLING_WINDOW, values: Optional[List[float]] = None):
+        self.size = size
+        self.values = np.asarray(values if values is not None else [], dtype=np.float64)
+
+    def update(self, values: np.ndarray):
+        self.values = np.concatenate([self.values, values[-self.size:]])[-self.size:]
+
+    def zscores(self, values: np.ndarray) -> np.ndarray:
+        """
+        Z-score of each of ``values`` against the ``size`` observations preceding it.
+
+        Computed for the whole batch at once from prefix sums, without updating
+        the window. Values with fewer than two predecessors, or a constant
+        window, score 0.
+        """
+        combined = np.concatenate([self.values, values])
+        # Centre before summing so the prefix sums do not lose precision
+        centre = float(combined.mean()) if len(combined) else 0.0
+        shifted = combined - centre
+        sums = np.concatenate([[0.0], np.cumsum(shifted)])
+        squares = np.concatenate([[0.0], np.cumsum(shifted * shifted)])
+
+        ends = np.arange(len(self.values), len(combined))
+        starts = np.maximum(ends - self.size, 0)
+        counts = ends - starts
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = (sums[ends] - sums[starts]) / counts
+            variances = (squares[ends] - squares[starts] - counts * means * means) / (counts - 1)
+            zscores = (shifted[ends] - means) / np.sqrt(variances)
+        valid = (counts > 1) & (variances > 0)
+        return np.where(valid, zscores, 0.0)
+
+    @property
+    def mean(self) -> float:
+        return float(self.values.mean()) if len(self.values) else math.nan
+
+    @property
+    def std(self) -> float:
+        return float(self.values.std(ddof=1)) if len(self.values) > 1 else math.nan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "values": self.values.tolist()}
+
+
+class OnlineRegression:
+    """
+    Least-squares slope of value against observation index, updated batch-wise.
+
+    Equals ``np.polyfit(range(n), values, 1)[0]`` over everything seen so far.
+    """
+
+    def __init__(self, count: int = 0, mean_x: float = 0.0, mean_y: float = 0.0,
+                 c_xy: float = 0.0, m2_x: float = 0.0):
+        self.count = count
+        self.mean_x = mean_x
+        self.mean_y = mean_y
+        self.c_xy = c_xy
+        self.m2_x = m2_x
+
+    def update(self, values: np.ndarray):
+        k = len(values)
+        if not k:
+            return
+        x = np.arange(self.count, self.count + k, dtype=np.float64)
+        batch_x, batch_y = float(x.mean()), float(values.mean())
+        dx_batch, dy_batch = x - batch_x, values - batch_y
+        n = self.count + k
+        dx, dy = batch_x - self.mean_x, batch_y - self.mean_y
+        self.c_xy += float((dx_batch * dy_batch).sum()) + dx * dy * self.count * k / n
+        self.m2_x += float((dx_batch * dx_batch).sum()) + dx * dx * self.count * k / n
+        self.mean_x += dx * k / n
+        self.mean_y += dy * k / n
+        self.count = n
+
+    @property
+    def slope(self) -> float:
+        return self.c_xy / self.m2_x if self.m2_x > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean_x": self.mean_x, "mean_y": self.mean_y,
+                "c_xy": self.c_xy, "m2_x": self.m2_x}
+
+
+class MetricState:
+    """All online statistics for one metric, plus its most recent anomalies."""
+
+    def __init__(self, welford: Welford, ewma: EWMA, window: RollingWindow,
+                 regression: OnlineRegression, anomalies: Optional[List[Tuple[int, float, float]]] = None,
+                 last_ts: Optional[int] = None):
+        self.welford = welford
+        self.ewma = ewma
+        self.window = window
+        self.regression = regression
+        # (ts, value, z-score), oldest first
+        self.anomalies = anomalies or []
+        self.last_ts = last_ts
+
+    @classmethod
+    def new(cls) -> "MetricState":
+        return cls(Welford(), EWMA(), RollingWindow(), OnlineRegression())
+
+    def update(self, timestamps: np.ndarray, values: np.ndarray,
+               threshold: float = ANOMALY_THRESHOLD) -> List[Tuple[int, float, float]]:
+        """
+        Fold in new observations (in time order) and return those that are anomalies.
+
+        Missing values (NaN) are skipped. New rows are judged against the
+        global mean and standard deviation including themselves, which for the
+        first batch is exactly the classic whole-history z-score test.
+        """
+        if len(timestamps):
+            self.last_ts = int(timestamps[-1])
+        present = ~np.isnan(values)
+        timestamps, values = timestamps[present], values[present]
+        if not len(values):
+            return []
+        self.welford.update(values)
+        self.ewma.update(values)
+        self.window.update(values)
+        self.regression.update(values)
+
+        std = self.welford.std
+        if not std > 0:
+            return []
+        zscores = (values - self.welford.mean) / std
+        flagged = np.flatnonzero(np.abs(zscores) > threshold)
+        found = [(int(timestamps[i]), float(values[i]), float(zscores[i])) for i in flagged[-RECENT_ANOMALIES:]]
+        self.anomalies = (self.anomalies + found)[-RECENT_ANOMALIES:]
+        return found
+
+    def zscore(self, value: float) -> float:
+        """Z-score of ``value`` against the global mean and standard deviation."""
+        std = self.welford.std
+        return (value - self.welford.mean) / std if std > 0 else 0.0
+
+    def rolling_zscore(self, value: float) -> float:
+        """Z-score of ``value`` against the rolling window."""
+        std = self.window.std
+        return (value - self.window.mean) / std if std > 0 else 0.0
+
+    @property
+    def trend_direction(self) -> str:
+        return "increasing" if self.regression.slope > 0 else "decreasing"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.welford.count,
+            "mean": self.welford.mean,
+            "std": self.welford.std,
+            "ewma_mean": self.ewma.mean,
+            "ewma_std": self.ewma.std,
+            "rolling_mean": self.window.mean,
+            "rolling_std": self.window.std,
+            "slope": self.regression.slope,
+            "trend_direction": self.trend_direction,
+            "last_ts": self.last_ts,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "welford": self.welford.to_dict(),
+            "ewma": self.ewma.to_dict(),
+            "window": self.window.to_dict(),
+            "regression": self.regression.to_dict(),
+            "anomalies": [list(anomaly) for anomaly in self.anomalies],
+            "last_ts": self.last_ts,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricState":
+        return cls(
+            Welford(**data["welford"]),
+            EWMA(**data["ewma"]),
+            RollingWindow(**data["window"]),
+            OnlineRegression(**data["regression"]),
+            [tuple(anomaly) for anomaly in data["anomalies"]],
+            data["last_ts"],
+        )
@@ -0,0 +1,162 @@
+"""
+Compact forms of SQL results for the narration prompt.
+
+The narration LLM call used to receive ``str(rows)``, so its prompt (and
+with it token cost and latency) grew with the number of rows returned.
+compact_result instead renders a result as JSON in one of two forms:
+
+- up to ``threshold`` rows: typed columns, i.e. each column's name and
+  type once followed by its values, which is smaller than repeating tuples
+  and tells the LLM what each value is
+- above it: the row count, per-column statistics (non-null count, min,
+  max, mean, percentiles and, for numeric columns, the least-squares trend
+  slope per day when a date or ts column orders the rows, otherwise per
+  row) and the first and last rows as samples
+
+The summary's size depends on the number of columns only, so the prompt
+stays bounded however many rows a query returns.
+"""
+import json
+import math
+import os
+from collections import Counter
+from datetime import date
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Results with more rows than this are summarized rather than listed
+SUMMARY_THRESHOLD = int(os.getenv("NARRATION_MAX_ROWS", "50"))
+# Rows kept from each end of a summarized result
+SAMPLE_ROWS = 5
+PERCENTILES = (5, 25, 50, 75, 95)
+# Text columns with at most this many distinct values list them with counts
+TOP_VALUES = 5
+
+
+def _round(value: Any) -> Any:
+    """Round floats to 4 significant digits; other values pass through."""
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        return float(f"{value:.4g}")
+    if isinstance(value, np.generic):
+        return _round(value.item())
+    return value
+
+
+def column_type(values: Sequence[Any]) -> str:
+    """Return 'integer', 'real', 'date', 'text', 'null' or 'mixed' for the non-null values of a column."""
+    kinds = set()
+    for kind in set(map(type, values)):
+        if kind is type(None):
+            continue
+        if issubclass(kind, (bool, int, np.integer)):
+            kinds.add('integer')
+        elif issubclass(kind, (float, np.floating)):
+            kinds.add('real')
+        elif issubclass(kind, date):
+            kinds.add('date')
+        else:
+            kinds.add('text')
+    if not kinds:
+        return 'null'
+    if kinds == {'integer', 'real'}:
+        return 'real'
+    return kinds.pop() if len(kinds) == 1 else 'mixed'
+
+
+def _transpose(columns: Sequence[str], rows: List[tuple]) -> List[List[Any]]:
+    # Faster than zip(*rows), which unpacks every row as an argument
+    return [list(map(itemgetter(i), rows)) for i in range(len(columns))]
+
+
+def typed_columns(columns: Sequence[str], rows: List[tuple]) -> Dict[str, Dict[str, Any]]:
+    """Transpose rows into ``{column: {"type": ..., "values": [...]}}``."""
+    return {
+        column: {"type": column_type(values), "values": [_round(v) for v in values]}
+        for column, values in zip(columns, _transpose(columns, rows))
+    }
+
+
+def _time_axis(columns: Sequence[str], kinds: List[str], data: List[Sequence[Any]]) -> Optional[np.ndarray]:
+    """Days since the first row, from a ts column or a fully parseable date column."""
+    for column, kind, values in zip(columns, kinds, data):
+        if column.lower() in ('ts', 'bucket_ts') and kind == 'integer' and None not in values:
+            return (np.asarray(values, dtype=np.float64) - values[0]) / 86400
+        if kind not in ('date', 'text') or not values or None in values:
+            continue
+        # Date or datetime objects from DuckDB, ISO date strings from SQLite
+        if kind == 'date' or values[0][:1].isdigit():
+            try:
+                moments = np.array(values, dtype='datetime64[s]')
+            except ValueError:
+                continue
+            return (moments - moments[0]).astype(np.float64) / 86400
+    return None
+
+
+def _numeric_summary(values: Sequence[Any], kind: str, axis: Optional[np.ndarray]) -> Dict[str, Any]:
+    # None becomes NaN
+    array = np.array(values, dtype=np.float64)
+    present = ~np.isnan(array)
+    finite = array[present]
+    summary: Dict[str, Any] = {"count": int(present.sum()), "nulls": int((~present).sum())}
+    if not len(finite):
+        return summary
+    exact = int if kind == 'integer' else _round
+    summary.update(min=exact(finite.min()), max=exact(finite.max()), mean=_round(finite.mean()),
+                   sum=exact(finite.sum()))
+    summary.update({f"p{p}": _round(q) for p, q in zip(PERCENTILES, np.percentile(finite, PERCENTILES))})
+
+    x = axis[present] if axis is not None else np.flatnonzero(present).astype(np.float64)
+    if len(finite) >= 3 and np.ptp(x) > 0:
+        dx = x - x.mean()
+        slope = float((dx * (finite - finite.mean())).sum() / (dx * dx).sum())
+        summary["trend_slope_per_day" if axis is not None else "trend_slope_per_row"] = _round(slope)
+    return summary
+
+
+def _text_summary(values: Sequence[Any]) -> Dict[str, Any]:
+    counts = Counter(values)
+    nulls = counts.pop(None, 0)
+    summary: Dict[str, Any] = {"count": len(values) - nulls, "nulls": nulls}
+    if not counts:
+        return summary
+    if len(set(map(type, counts))) > 1:
+        counts = Counter({str(value): count for value, count in counts.items()})
+    summary.update(distinct=len(counts), min=_round(min(counts)), max=_round(max(counts)))
+    if len(counts) <= TOP_VALUES:
+        summary["values"] = {str(value): count for value, count in sorted(counts.items())}
+    return summary
+
+
+def summarize(columns: Sequence[str], rows: List[tuple], truncated: bool = False) -> Dict[str, Any]:
+    """Row count, per-column statistics and head/tail samples of a result."""
+    data = _transpose(columns, rows)
+    kinds = [column_type(values) for values in data]
+    axis = _time_axis(columns, kinds, data)
+    stats = {}
+    for column, kind, values in zip(columns, kinds, data):
+        if kind in ('integer', 'real'):
+            stats[column] = {"type": kind, **_numeric_summary(values, kind, axis)}
+        else:
+            stats[column] = {"type": kind, **_text_summary(values)}
+    return {
+        "row_count": len(rows),
+        "truncated": truncated,
+        "columns": stats,
+        "head": [[_round(v) for v in row] for row in rows[:SAMPLE_ROWS]],
+        "tail": [[_round(v) for v in row] for row in rows[-SAMPLE_ROWS:]] if len(rows) > SAMPLE_ROWS else [],
+    }
+
+
+def compact_result(columns: Sequence[str], rows: List[tuple], truncated: bool = False,
+                   threshold: int = SUMMARY_THRESHOLD) -> str:
+    """Render a result for the narration prompt: typed columns, or a summary above ``threshold`` rows."""
+    if len(rows) <= threshold and not truncated:
+        payload = {"row_count": len(rows), "columns": typed_columns(columns, rows)}
+    else:
+        payload = {"summarized": True, **summarize(columns, rows, truncated)}
+    return json.dumps(payload, separators=(',', ':'), default=str)
@@ -0,0 +1,97 @@
+"""
+Requests/sec of the /analytics data path, before and after connection pooling.
+
+"before" replays what the endpoint used to do on every request: open a
+fresh sqlite3 connection with default settings, query and close it.
+"after" uses the pooled, WAL-configured repository. Both run with the same
+number of concurrent threads against a freshly generated database.
+
+Pass --url to measure a running server end to end instead.
+
+Usage (from the backend directory):
+    python benchmarks/bench_analytics.py --requests 5000 --threads 8
+    python benchmarks/bench_analytics.py --url http://localhost:8000 --requests 2000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import repository
+from data.mock_analytics import generate_mock_analytics_data
+
+
+def fetch_unpooled(limit: int):
+    conn = sqlite3.connect(repository.database_path())
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT date, page_views, unique_visitors, session_duration, bounce_rate, conversion_rate
+            FROM analytics_data
+            ORDER BY date DESC
+            LIMIT ?
+        ''', (limit,))
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def fetch_pooled(limit: int):
+    with repository.connection() as conn:
+        cursor = conn.execute(f'''
+            SELECT {', '.join(repository.ANALYTICS_COLUMNS)}
+            FROM analytics_data
+            ORDER BY ts DESC
+            LIMIT ?
+        ''', (limit,))
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def fetch_url(url: str):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def measure(fn, requests: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(lambda _: fn(), range(requests)):
+            pass
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--days", type=int, default=30, help="rows requested per call")
+    parser.add_argument("--history-days", type=int, default=365, help="days of hourly mock data to generate")
+    parser.add_argument("--url", help="base URL of a running server")
+    args = parser.parse_args()
+
+    if args.url:
+        url = f"{args.url.rstrip('/')}/analytics?days={args.days}"
+        print(f"{url}: {measure(lambda: fetch_url(url), args.requests, args.threads):.0f} req/s")
+        return
+
+    os.chdir(tempfile.mkdtemp(prefix="bi-bench-"))
+    repository.initialize_database(seed_sample_data=False)
+    generate_mock_analytics_data(args.history_days)
+
+    before = measure(lambda: fetch_unpooled(args.days), args.requests, args.threads)
+    after = measure(lambda: fetch_pooled(args.days), args.requests, args.threads)
+    print(f"{'before (connect per request)':<32}{before:>10.0f} req/s")
+    print(f"{'after (pooled repository)':<32}{after:>10.0f} req/s")
+    print(f"{'speedup':<32}{after / before:>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
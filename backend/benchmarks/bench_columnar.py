@@ -0,0 +1,102 @@
+"""
+Aggregate query latency on SQLite versus the DuckDB/Parquet columnar backend.
+
+For each size, analytics_data is filled with one row per ``--interval``
+seconds (generated inside SQLite), the rollups are built, and the columnar
+mirror is exported. Each query, of the kind the SQL prompt produces, is then
+timed on both backends. The initial export time is reported separately;
+after that the mirror only re-exports months that change.
+
+Usage (from the backend directory):
+    python benchmarks/bench_columnar.py --sizes 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import repository, rollups
+from data.columnar import ColumnarStore
+from data.data_version import bump_data_version
+
+FILL_SQL = f'''
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq LIMIT ?)
+    INSERT INTO analytics_data ({', '.join(repository.STORAGE_COLUMNS)})
+    SELECT i * ?, datetime(i * ?, 'unixepoch'),
+           4000 + abs(random()) % 2000, 2500 + abs(random()) % 1000,
+           2 + (abs(random()) % 3000) / 1000.0, 0.3 + (abs(random()) % 100) / 1000.0,
+           0.01 + (abs(random()) % 200) / 10000.0
+    FROM seq
+'''
+
+# (name, SQL); valid in both dialects. {start}/{end} bound the last 30 days of data
+QUERIES = [
+    ("overall averages",
+     "SELECT AVG(page_views), AVG(session_duration), AVG(bounce_rate), AVG(conversion_rate) FROM analytics_data"),
+    ("30-day totals",
+     "SELECT SUM(page_views), SUM(unique_visitors) FROM analytics_data WHERE ts >= {start} AND ts < {end}"),
+    ("daily averages",
+     "SELECT substr(date, 1, 10) AS day, AVG(page_views), AVG(conversion_rate) "
+     "FROM analytics_data GROUP BY day ORDER BY day"),
+    ("monthly extremes",
+     "SELECT substr(date, 1, 7) AS month, MAX(page_views), MIN(bounce_rate) "
+     "FROM analytics_data GROUP BY month ORDER BY month"),
+    ("top 10 hours",
+     "SELECT date, page_views FROM analytics_data ORDER BY page_views DESC LIMIT 10"),
+    ("monthly rollup",
+     "SELECT date, page_views_sum * 1.0 / row_count FROM analytics_monthly ORDER BY bucket_ts"),
+]
+
+
+def build(rows: int, interval: int):
+    repository.initialize_database(seed_sample_data=False)
+    with repository.transaction() as cursor:
+        cursor.execute(FILL_SQL, (rows, interval, interval))
+        rollups.rebuild_all(cursor)
+        bump_data_version(cursor)
+
+
+def timed(backend, sql: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.execute_query(sql)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--interval", type=int, default=60, help="seconds between rows")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bi-columnar-")
+    print(f"{'rows':>12}  {'query':<20}{'sqlite ms':>12}{'duckdb ms':>12}{'speedup':>9}")
+    for rows in args.sizes:
+        # Each size gets its own database (DATABASE_URL is relative to the working directory)
+        sizedir = os.path.join(workdir, str(rows))
+        os.makedirs(sizedir)
+        os.chdir(sizedir)
+        repository.get_pool().close()
+        build(rows, args.interval)
+
+        store = ColumnarStore(os.path.join(os.getcwd(), 'parquet'))
+        start = time.perf_counter()
+        store.sync()
+        print(f"{rows:>12,}  {'initial export':<20}{'':>12}{(time.perf_counter() - start) * 1000:>12.0f}")
+
+        end = rows * args.interval
+        for name, sql in QUERIES:
+            sql = sql.format(start=end - 30 * 86400, end=end)
+            sqlite_ms = timed(repository, sql, args.repeat)
+            duckdb_ms = timed(store, sql, args.repeat)
+            print(f"{rows:>12,}  {name:<20}{sqlite_ms:>12.1f}{duckdb_ms:>12.1f}{sqlite_ms / duckdb_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+N questions answered one /query at a time, as N concurrent /query calls and
+as one /query/batch call.
+
+Uses a stub LLM that sleeps for ``--llm-latency`` seconds per call, with the
+query planner and caches disabled so every question needs the LLM. One
+/query costs two LLM round trips; a batch costs two in total, however many
+questions it holds. Concurrent /query calls overlap their round trips but
+still make 2N calls, each billed for the full schema prompt.
+
+Usage (from the backend directory):
+    python benchmarks/bench_query_batch.py --questions 1 5 10 20 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.utilities.sql_database import SQLDatabase
+from agents.business_intelligence_agent import BusinessIntelligenceAgent
+from agents.query_planner import QueryPlanner
+from cache.answer_cache import AnswerCache
+from cache.query_cache import SemanticQueryCache
+from services import tracing
+from benchmarks.stubs import StubChatModel
+
+
+def build_agent(llm_latency: float) -> BusinessIntelligenceAgent:
+    return BusinessIntelligenceAgent(
+        llm=StubChatModel(sql="SELECT date, page_views_sum, unique_visitors_sum FROM analytics_daily ORDER BY bucket_ts",
+                          latency=llm_latency),
+        db=SQLDatabase.from_uri("sqlite:///./business_intelligence.db"),
+        query_cache=SemanticQueryCache(max_size=0, embedding_model=None),
+        answer_cache=AnswerCache(max_size=0),
+        planner=QueryPlanner(enabled=False),
+    )
+
+
+def prompt_tokens() -> float:
+    """Prompt tokens counted so far across every LLM call."""
+    return sum(value for key, value in tracing.LLM_TOKENS._values.items() if key[1] == "prompt")
+
+
+async def sequential(agent, questions):
+    for question in questions:
+        await agent.aprocess_query(question)
+
+
+async def concurrent(agent, questions):
+    await asyncio.gather(*(agent.aprocess_query(question) for question in questions))
+
+
+async def batch(agent, questions):
+    await agent.abatch_query(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bi-batch-"))
+    agent = build_agent(args.llm_latency)
+
+    print(f"{'questions':>9} {'mode':>11} {'seconds':>8} {'LLM calls':>10} {'~prompt tokens':>15}")
+    for count in args.questions:
+        questions = [f"Daily page views and unique visitors, variant {i}" for i in range(count)]
+        for name, run in (("sequential", sequential), ("concurrent", concurrent), ("batch", batch)):
+            calls, tokens = agent.llm.calls, prompt_tokens()
+            start = time.perf_counter()
+            # The agent logs every query and result
+            with contextlib.redirect_stdout(io.StringIO()):
+                asyncio.run(run(agent, questions))
+            elapsed = time.perf_counter() - start
+            print(f"{count:>9} {name:>11} {elapsed:>8.2f} {agent.llm.calls - calls:>10} "
+                  f"{prompt_tokens() - tokens:>15,.0f}")
+
+
+if __name__ == "__main__":
+    main()
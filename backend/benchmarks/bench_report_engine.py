@@ -0,0 +1,102 @@
+"""
+Report statistics computed the legacy way (one pandas pass per statistic per
+metric, writing helper columns into the frame) versus ReportEngine's single
+vectorized pass over the metric matrix.
+
+Neither side builds figures, so the comparison isolates the statistics;
+BusinessIntelligenceAnalyzer.generate_report only builds figures when
+include_visualizations is set.
+
+Usage (from the backend directory):
+    python benchmarks/bench_report_engine.py --sizes 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from analysis.business_intelligence import REPORT_METRICS
+from analysis.report_engine import ReportEngine
+
+
+def make_frame(size: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=size, freq="min"),
+        "revenue": rng.normal(20000, 3000, size),
+        "users": rng.normal(3000, 400, size).round(),
+        "conversion_rate": rng.uniform(0.018, 0.022, size),
+        "average_order_value": rng.normal(55, 6, size),
+    })
+
+
+def legacy_report(df: pd.DataFrame, window: int = 7, threshold: float = 2.0) -> dict:
+    """The statistics of the original generate_report, without its figures."""
+    df = df.copy()
+    report = {"correlations": df[REPORT_METRICS].corr().to_dict()}
+    for metric in REPORT_METRICS:
+        df[f'{metric}_ma'] = df[metric].rolling(window=window).mean()
+        stats = {
+            "mean": df[metric].mean(),
+            "median": df[metric].median(),
+            "std": df[metric].std(),
+            "min": df[metric].min(),
+            "max": df[metric].max()
+        }
+        df[f'{metric}_zscore'] = (df[metric] - df[metric].mean()) / df[metric].std()
+        anomalies = df[df[f'{metric}_zscore'].abs() > threshold]
+        report[metric] = (stats, anomalies['date'].dt.strftime('%Y-%m-%d').tolist())
+    return report
+
+
+def engine_report(df: pd.DataFrame, window: int = 7, threshold: float = 2.0) -> dict:
+    engine = ReportEngine(df, REPORT_METRICS, window=window)
+    stats = engine.compute(threshold=threshold)
+    report = {"correlations": stats["correlations"].to_dict()}
+    for i, metric in enumerate(REPORT_METRICS):
+        mask = stats["anomalies"][:, i]
+        report[metric] = (
+            {key: stats[key][i] for key in ("mean", "median", "std", "min", "max")},
+            engine.format_dates(mask)
+        )
+    return report
+
+
+def best_of(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy ms':>12} {'engine ms':>12} {'speedup':>9}")
+    for size in args.sizes:
+        df = make_frame(size)
+        legacy, engine = legacy_report(df), engine_report(df)
+        for metric in REPORT_METRICS:
+            np.testing.assert_allclose(
+                list(engine[metric][0].values()), list(legacy[metric][0].values()), rtol=1e-9
+            )
+            assert engine[metric][1] == legacy[metric][1], metric
+
+        legacy_time = best_of(lambda: legacy_report(df), args.rounds)
+        engine_time = best_of(lambda: engine_report(df), args.rounds)
+        print(f"{size:>10} {legacy_time * 1000:>12.1f} {engine_time * 1000:>12.1f} "
+              f"{legacy_time / engine_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
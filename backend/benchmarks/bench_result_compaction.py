@@ -0,0 +1,79 @@
+"""
+Size of the narration prompt's result section: rows rendered with str(rows)
+(the original prompt), the first NARRATION_MAX_ROWS rows with a row count
+(the SQL guard's truncation) and result_summary.compact_result.
+
+Reports characters, estimated tokens (CHARS_PER_TOKEN characters each,
+as TokenUsageHandler estimates them) and the time to render each form.
+Narration latency grows with prompt tokens, so the token columns are the
+saving per narration call; the render time is what compaction costs.
+
+Usage (from the backend directory):
+    python benchmarks/bench_result_compaction.py --sizes 10 100 1000 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from agents.business_intelligence_agent import CHARS_PER_TOKEN
+from analysis import result_summary
+
+
+def make_rows(size: int) -> list:
+    """Daily rows shaped like analytics_daily: date, page views, visitors, bounce rate, duration."""
+    rng = np.random.default_rng(0)
+    start = date(2000, 1, 1)
+    views = rng.normal(5000, 800, size).round().astype(int) + np.arange(size) // 10
+    return [
+        ((start + timedelta(days=i)).isoformat(), int(views[i]), int(views[i] * 0.6),
+         float(rng.uniform(0.3, 0.5)), float(rng.normal(180, 30)))
+        for i in range(size)
+    ]
+
+
+def head_with_count(rows: list, limit: int) -> str:
+    """The SQL guard's truncated rendering: the first ``limit`` rows and a count."""
+    if len(rows) <= limit:
+        return str(rows)
+    return f"{rows[:limit]}\n(The first {limit:,} of {len(rows):,} rows; the rest were omitted.)"
+
+
+def best_of(fn, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1_000, 10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    columns = ["date", "page_views", "unique_visitors", "bounce_rate", "session_duration"]
+    limit = result_summary.SUMMARY_THRESHOLD
+    forms = [
+        ("str(rows)", lambda rows: str(rows)),
+        (f"head {limit}", lambda rows: head_with_count(rows, limit)),
+        ("compact", lambda rows: result_summary.compact_result(columns, rows)),
+    ]
+    print(f"{'rows':>8} {'form':>10} {'chars':>11} {'~tokens':>9} {'render ms':>10}")
+    for size in args.sizes:
+        rows = make_rows(size)
+        for name, render in forms:
+            text, seconds = best_of(lambda: render(rows), args.rounds)
+            print(f"{size:>8} {name:>10} {len(text):>11,} {-(-len(text) // CHARS_PER_TOKEN):>9,} "
+                  f"{seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
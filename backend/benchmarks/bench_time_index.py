@@ -0,0 +1,105 @@
+"""
+Range-query latency of the legacy analytics_data layout versus the
+time-clustered layout (``ts INTEGER PRIMARY KEY``) at growing data volumes.
+
+For each size both tables are filled with one row per ``--interval`` seconds
+using a recursive CTE (so generation stays inside SQLite), then each query
+is timed. The legacy layout grows linearly with row count; the clustered
+layout stays flat because every query is a B-tree seek plus the rows read.
+
+Usage (from the backend directory):
+    python benchmarks/bench_time_index.py --sizes 1000000 10000000 50000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data import repository
+
+LEGACY_TABLE_SQL = '''
+    CREATE TABLE analytics_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT,
+        page_views INTEGER,
+        unique_visitors INTEGER,
+        session_duration REAL,
+        bounce_rate REAL,
+        conversion_rate REAL
+    )
+'''
+
+FILL_SQL = '''
+    WITH RECURSIVE seq(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM seq LIMIT ?)
+    INSERT INTO analytics_data ({columns})
+    SELECT {ts}datetime(i * ?, 'unixepoch'), 4000 + abs(random()) % 2000, 2500 + abs(random()) % 1000,
+           3.5, 0.35, 0.02
+    FROM seq
+'''
+
+# (name, legacy SQL, clustered SQL); {start}/{end} bound the last 30 days of data
+QUERIES = [
+    ("latest 720 rows",
+     "SELECT * FROM analytics_data ORDER BY date DESC LIMIT 720",
+     "SELECT * FROM analytics_data ORDER BY ts DESC LIMIT 720"),
+    ("30-day range",
+     "SELECT * FROM analytics_data WHERE date >= datetime({start}, 'unixepoch') AND date < datetime({end}, 'unixepoch')",
+     "SELECT * FROM analytics_data WHERE ts >= {start} AND ts < {end}"),
+    ("30-day daily averages",
+     "SELECT substr(date, 1, 10), AVG(page_views) FROM analytics_data "
+     "WHERE date >= datetime({start}, 'unixepoch') AND date < datetime({end}, 'unixepoch') GROUP BY 1",
+     "SELECT ts / 86400, AVG(page_views) FROM analytics_data WHERE ts >= {start} AND ts < {end} GROUP BY 1"),
+]
+
+
+def build(path: str, legacy: bool, rows: int, interval: int):
+    conn = repository.connect(path)
+    if legacy:
+        conn.execute(LEGACY_TABLE_SQL)
+        columns, ts = ', '.join(repository.ANALYTICS_COLUMNS), ''
+    else:
+        conn.execute(repository.ANALYTICS_TABLE_SQL.format(name='analytics_data'))
+        columns, ts = ', '.join(repository.STORAGE_COLUMNS), 'i * ?, '
+    params = (rows, interval) if legacy else (rows, interval, interval)
+    conn.execute(FILL_SQL.format(columns=columns, ts=ts), params)
+    conn.commit()
+    return conn
+
+
+def timed(conn: sqlite3.Connection, sql: str, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--interval", type=int, default=60, help="seconds between rows")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bi-index-")
+    print(f"{'rows':>12}  {'query':<24}{'legacy ms':>12}{'clustered ms':>14}")
+    for rows in args.sizes:
+        end = rows * args.interval
+        start = end - 30 * 86400
+        legacy = build(os.path.join(workdir, f"legacy-{rows}.db"), True, rows, args.interval)
+        clustered = build(os.path.join(workdir, f"clustered-{rows}.db"), False, rows, args.interval)
+        for name, legacy_sql, clustered_sql in QUERIES:
+            legacy_ms = timed(legacy, legacy_sql.format(start=start, end=end), args.repeat)
+            clustered_ms = timed(clustered, clustered_sql.format(start=start, end=end), args.repeat)
+            print(f"{rows:>12,}  {name:<24}{legacy_ms:>12.2f}{clustered_ms:>14.2f}")
+        legacy.close()
+        clustered.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold-start test: time from launching a uvicorn worker to its first /analytics response.
+
+Each round starts ``uvicorn main:app`` in a fresh process on a free port
+against a database populated once up front, then polls /analytics until it
+answers successfully. The agent (LangChain and Gemini) is built in the
+background after startup unless ``--no-preload`` is given, so it should not
+delay the first /analytics response either way. Exits with status 1 when the
+median exceeds ``--target`` seconds.
+
+Usage (from the backend directory):
+    python benchmarks/cold_start.py --rounds 5 --target 1.0
+    python benchmarks/cold_start.py --no-preload
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response(env, timeout: float) -> float:
+    """Start a worker and return the seconds until /analytics first succeeds."""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/analytics?days=30"
+    start = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if json.load(response)["success"]:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise TimeoutError(f"/analytics did not answer within {timeout}s")
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--target", type=float, default=1.0, help="seconds allowed for the median")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--no-preload", action="store_true", help="set PRELOAD_AGENT=false")
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix="bi-cold-start-"), "cold_start.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    env.setdefault("GOOGLE_API_KEY", "cold-start")
+    if args.no_preload:
+        env["PRELOAD_AGENT"] = "false"
+
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    from data import mock_analytics, repository
+    repository.initialize_database()
+    mock_analytics.populate_mock_analytics(days=365, seed=0)
+
+    timings = [first_response(env, args.timeout) for _ in range(args.rounds)]
+    median = statistics.median(timings)
+    print(f"first /analytics response: median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms "
+          f"(target {args.target * 1000:.0f} ms)")
+    sys.exit(0 if median <= args.target else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare two benchmark reports written by benchmarks/run.py.
+
+Prints the median time of every (case, size) present in both reports and
+flags changes larger than --threshold. Exits with status 1 if any case got
+slower by more than the threshold, so it can gate CI.
+
+Usage (from the backend directory):
+    python benchmarks/compare.py before.json after.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str):
+    with open(path) as f:
+        report = json.load(f)
+    return report, {(r["case"], r["size"]): r for r in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change treated as significant")
+    args = parser.parse_args()
+
+    baseline_report, baseline = load(args.baseline)
+    candidate_report, candidate = load(args.candidate)
+    print(f"baseline:  {baseline_report.get('commit')}  {baseline_report.get('created')}")
+    print(f"candidate: {candidate_report.get('commit')}  {candidate_report.get('created')}")
+    print(f"{'case':<26}{'rows':>12}{'before ms':>12}{'after ms':>12}{'change':>10}")
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before = baseline[key]["median"]
+        after = candidate[key]["median"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{key[0]:<26}{key[1]:>12,}{before * 1000:>12.3f}{after * 1000:>12.3f}{change:>+10.1%}{flag}")
+
+    for key in sorted(baseline.keys() ^ candidate.keys()):
+        side = "baseline" if key in baseline else "candidate"
+        print(f"{key[0]:<26}{key[1]:>12,}  only in {side}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Fan-out test for the /ws/anomalies push channel.
+
+Registers ``--subscribers`` idle subscribers, each a task parked on its alert
+queue exactly like the WebSocket handler, then writes rows containing an
+outlier and measures the time from commit until every subscriber has the
+alert, plus the memory held per idle subscriber. With ``--url`` the same is
+done over real WebSocket connections to a running server (requires aiohttp);
+rows are still written to the local database, so point DATABASE_URL at the
+server's database.
+
+Usage (from the backend directory):
+    python benchmarks/load_test_anomalies.py --subscribers 1000 5000
+    python benchmarks/load_test_anomalies.py --subscribers 2000 --url ws://localhost:8000/ws/anomalies
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_outlier():
+    """Append one row whose page_views is far outside the rolling window."""
+    from data import repository
+    ts = repository.latest_timestamp() + 3600
+    repository.write_chunks([repository.RowChunk([(ts, 10**7, 500, 3.0, 0.3, 0.02)], ts, ts)])
+
+
+async def in_process(subscribers: int, rounds: int):
+    from services.anomaly_notifier import AnomalyNotifier
+    notifier = AnomalyNotifier(poll_interval=0.05)
+    notifier.start()
+    await asyncio.sleep(0.2)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    received = []
+
+    async def subscriber():
+        queue = notifier.subscribe(["page_views"])
+        while True:
+            await queue.get()
+            received.append(time.perf_counter())
+
+    tasks = [asyncio.create_task(subscriber()) for _ in range(subscribers)]
+    await asyncio.sleep(0.1)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    latencies = []
+    for _ in range(rounds):
+        received.clear()
+        start = time.perf_counter()
+        await asyncio.to_thread(write_outlier)
+        while len(received) < subscribers:
+            await asyncio.sleep(0.001)
+        latencies.append(max(received) - start)
+
+    for task in tasks:
+        task.cancel()
+    await notifier.stop()
+    return latencies, per_subscriber
+
+
+async def over_websockets(url: str, subscribers: int, rounds: int):
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        sockets = await asyncio.gather(*(
+            session.ws_connect(f"{url}?metrics=page_views") for _ in range(subscribers)
+        ))
+        await asyncio.sleep(0.5)
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await asyncio.to_thread(write_outlier)
+            await asyncio.gather(*(ws.receive() for ws in sockets))
+            latencies.append(time.perf_counter() - start)
+        await asyncio.gather(*(ws.close() for ws in sockets))
+    return latencies, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--url", help="WebSocket URL of a running server")
+    args = parser.parse_args()
+
+    from data import mock_analytics, repository
+    if args.url is None:
+        os.chdir(tempfile.mkdtemp(prefix="bi-anomalies-"))
+    repository.initialize_database()
+    if args.url is None:
+        mock_analytics.populate_mock_analytics(days=30, seed=0)
+
+    print(f"{'subscribers':>12}{'median ms':>12}{'max ms':>10}{'KiB/sub':>10}")
+    for subscribers in args.subscribers:
+        if args.url:
+            latencies, per_subscriber = asyncio.run(over_websockets(args.url, subscribers, args.rounds))
+        else:
+            latencies, per_subscriber = asyncio.run(in_process(subscribers, args.rounds))
+        memory = f"{per_subscriber / 1024:.1f}" if per_subscriber is not None else "-"
+        print(f"{subscribers:>12}{statistics.median(latencies) * 1000:>12.1f}"
+              f"{max(latencies) * 1000:>10.1f}{memory:>10}")
+
+
+if __name__ == "__main__":
+    main()
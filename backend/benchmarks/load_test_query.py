@@ -0,0 +1,84 @@
+"""
+Load test for the /query pipeline.
+
+Drives BusinessIntelligenceAgent.aprocess_query through the QueryLimiter with
+an increasing number of concurrent clients, using a stub LLM that sleeps for
+``--llm-latency`` seconds per call. Throughput should scale with the number
+of clients up to QUERY_MAX_CONCURRENCY; beyond the queue depth requests are
+rejected (429 in the API). The synchronous process_query is measured as a
+baseline, which is what /query effectively did before it became async.
+
+Usage (from the backend directory):
+    python benchmarks/load_test_query.py --requests 64 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.utilities.sql_database import SQLDatabase
+from agents.business_intelligence_agent import BusinessIntelligenceAgent
+from cache.answer_cache import AnswerCache
+from cache.query_cache import SemanticQueryCache
+from services.query_limiter import QueryLimiter, QueueFullError
+from benchmarks.stubs import StubChatModel
+
+
+def build_agent(llm_latency: float) -> BusinessIntelligenceAgent:
+    # Caches are disabled so every request pays for both LLM calls
+    return BusinessIntelligenceAgent(
+        llm=StubChatModel(latency=llm_latency),
+        db=SQLDatabase.from_uri("sqlite:///./business_intelligence.db"),
+        query_cache=SemanticQueryCache(max_size=0, embedding_model=None),
+        answer_cache=AnswerCache(max_size=0),
+    )
+
+
+async def run_clients(agent, limiter, clients: int, requests: int):
+    counter = iter(range(requests))
+    rejected = 0
+
+    async def client():
+        nonlocal rejected
+        for i in counter:
+            try:
+                await limiter.run(agent.aprocess_query(f"Average session duration #{i}"))
+            except QueueFullError:
+                rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - start, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=64)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bi-load-"))
+    agent = build_agent(args.llm_latency)
+
+    start = time.perf_counter()
+    for i in range(args.requests):
+        agent.process_query(f"Average session duration #{i}")
+    elapsed = time.perf_counter() - start
+    print(f"{'mode':<10}{'clients':>8}{'seconds':>10}{'req/s':>10}{'rejected':>10}")
+    print(f"{'sync':<10}{1:>8}{elapsed:>10.2f}{args.requests / elapsed:>10.1f}{0:>10}")
+
+    for clients in args.clients:
+        limiter = QueryLimiter(max_concurrency=args.max_concurrency, max_queue=args.max_queue, timeout=60)
+        elapsed, rejected = asyncio.run(run_clients(agent, limiter, clients, args.requests))
+        print(f"{'async':<10}{clients:>8}{elapsed:>10.2f}{args.requests / elapsed:>10.1f}{rejected:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Throughput of /analytics as the number of server worker processes grows.
+
+For each ``--workers`` count a fresh ``WORKERS=N python main.py`` is started
+against one populated database, with the caches shared through SQLite, then ``--clients`` client processes, each holding a keep-alive
+connection, request ``--path`` for ``--duration`` seconds. Reports requests
+per second and the scaling efficiency relative to one worker.
+
+Clients run on the same host and take CPU from the workers, so scaling is
+only meaningful when cores > workers; run the clients elsewhere (``--url``)
+for a clean measurement.
+
+Usage (from the backend directory):
+    python benchmarks/load_test_workers.py --workers 1 2 4 --clients 16
+    python benchmarks/load_test_workers.py --url http://server:8000 --clients 32
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def client(url: str, path: str, deadline: float, results):
+    """Request ``path`` until ``deadline``; report (successes, failures)."""
+    parts = urlsplit(url)
+    conn = HTTPConnection(parts.hostname, parts.port, timeout=10)
+    ok = failed = 0
+    while time.time() < deadline:
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                failed += 1
+        except (OSError, ConnectionError):
+            failed += 1
+            conn.close()
+            conn = HTTPConnection(parts.hostname, parts.port, timeout=10)
+    results.put((ok, failed))
+
+
+def measure(url: str, path: str, clients: int, duration: float) -> tuple:
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    deadline = time.time() + duration
+    procs = [ctx.Process(target=client, args=(url, path, deadline, results)) for _ in range(clients)]
+    for proc in procs:
+        proc.start()
+    counts = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    return sum(c[0] for c in counts) / duration, sum(c[1] for c in counts)
+
+
+def start_server(workers: int, env) -> tuple:
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=BACKEND, env=dict(env, WORKERS=str(workers), HOST="127.0.0.1", PORT=str(port)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/analytics?days=1", timeout=1):
+                return server, url
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.05)
+    server.terminate()
+    raise TimeoutError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--path", default="/analytics?days=30")
+    parser.add_argument("--url", help="load an already running server instead of starting one")
+    args = parser.parse_args()
+
+    print(f"cores: {os.cpu_count()}, clients: {args.clients}, path: {args.path}")
+    if args.url:
+        rate, failed = measure(args.url, args.path, args.clients, args.duration)
+        print(f"{rate:.0f} req/s, {failed} failed")
+        return
+
+    database = os.path.join(tempfile.mkdtemp(prefix="bi-workers-"), "workers.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", CACHE_BACKEND="sqlite",
+               SHARED_CACHE_PATH=f"{database}.cache", PRELOAD_AGENT="false")
+    env.setdefault("GOOGLE_API_KEY", "load-test")
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    from data import mock_analytics, repository
+    repository.initialize_database()
+    mock_analytics.populate_mock_analytics(days=365, seed=0)
+
+    print(f"{'workers':>8}{'req/s':>10}{'failed':>8}{'efficiency':>12}")
+    baseline = None
+    for workers in args.workers:
+        server, url = start_server(workers, env)
+        try:
+            measure(url, args.path, args.clients, 1.0)  # warm every worker
+            rate, failed = measure(url, args.path, args.clients, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+        baseline = baseline or rate / workers
+        print(f"{workers:>8}{rate:>10.0f}{failed:>8}{rate / (baseline * workers):>12.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Benchmark suite for the backend's hot paths.
+
+Every case runs against a stub LLM (benchmarks/stubs.py) that returns canned
+SQL and narration instantly, so timings reflect this codebase only. Data is
+generated with the seeded mock generator, so runs are reproducible. Results
+are printed as a table and, with --output, written as JSON that
+benchmarks/compare.py can diff between commits.
+
+Usage (from the backend directory):
+    python benchmarks/run.py --sizes 1000 100000 --output before.json
+    python benchmarks/run.py --sizes 1000 100000 --output after.json
+    python benchmarks/compare.py before.json after.json
+
+    python benchmarks/run.py --sizes 10000000 --filter analytics
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import numpy as np
+import pandas as pd
+
+# (name, setup, max_size); setup(context) returns the zero-argument callable to time
+CASES: List[tuple] = []
+
+
+def case(name: str, max_size: Optional[int] = None):
+    """Register a benchmark case. Sizes above ``max_size`` are skipped."""
+    def register(setup: Callable[["Context"], Callable[[], Any]]):
+        CASES.append((name, setup, max_size))
+        return setup
+    return register
+
+
+class Context:
+    """Data shared by the cases of one size, built lazily."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._frame = None
+        self._app = None
+
+    @property
+    def app(self):
+        """The FastAPI module with a stub LLM and analytics_data holding ``size`` rows."""
+        if self._app is None:
+            from data.mock_analytics import populate_mock_analytics
+            from benchmarks.stubs import StubChatModel
+            os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+            import main
+            main.get_bi_agent().llm = StubChatModel()
+            # One row per minute keeps even 10M rows well inside the supported date range
+            populate_mock_analytics(days=(self.size - 1) * 60 / 86400, seed=0, interval_seconds=60)
+            self._app = main
+        return self._app
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """An in-memory frame of ``size`` rows with the metrics used by the analyzers."""
+        if self._frame is None:
+            rng = np.random.default_rng(0)
+            n = self.size
+            dates = pd.date_range("2020-01-01", periods=n, freq="min")
+            page_views = rng.normal(5000, 800, n).round()
+            self._frame = pd.DataFrame({
+                "date": dates,
+                "page_views": page_views,
+                "unique_visitors": (page_views * rng.uniform(0.5, 0.7, n)).round(),
+                "session_duration": rng.uniform(2.8, 4.2, n),
+                "bounce_rate": rng.uniform(0.3, 0.4, n),
+                "conversion_rate": rng.uniform(0.018, 0.022, n),
+                "revenue": rng.normal(20000, 3000, n),
+                "users": rng.normal(3000, 400, n).round(),
+                "average_order_value": rng.normal(55, 6, n),
+            })
+        return self._frame
+
+
+@case("query_cold")
+def bench_query_cold(ctx: Context):
+    from agents.query_planner import QueryPlanner
+    from cache.answer_cache import AnswerCache
+    from cache.query_cache import SemanticQueryCache
+    app = ctx.app
+    agent = app.get_bi_agent()
+    agent.planner = QueryPlanner(enabled=False)
+    agent.query_cache = SemanticQueryCache(max_size=0, embedding_model=None)
+    agent.answer_cache = AnswerCache(max_size=0)
+    return lambda: asyncio.run(app.process_query(app.Query(text="What is the average session duration?")))
+
+
+@case("query_warm")
+def bench_query_warm(ctx: Context):
+    from agents.query_planner import QueryPlanner
+    from cache.answer_cache import AnswerCache
+    from cache.query_cache import SemanticQueryCache
+    app = ctx.app
+    agent = app.get_bi_agent()
+    agent.planner = QueryPlanner(enabled=False)
+    agent.query_cache = SemanticQueryCache(embedding_model=None)
+    agent.answer_cache = AnswerCache()
+    query = app.Query(text="What is the average session duration?")
+    asyncio.run(app.process_query(query))
+    return lambda: asyncio.run(app.process_query(query))
+
+
+@case("query_planned")
+def bench_query_planned(ctx: Context):
+    from agents.query_planner import QueryPlanner
+    app = ctx.app
+    app.get_bi_agent().planner = QueryPlanner()
+    query = app.Query(text="What was the average bounce rate in the last 7 days?")
+    return lambda: asyncio.run(app.process_query(query))
+
+
+@case("query_planned_top_days")
+def bench_query_planned_top_days(ctx: Context):
+    from agents.query_planner import QueryPlanner
+    app = ctx.app
+    app.get_bi_agent().planner = QueryPlanner()
+    query = app.Query(text="Top 5 days by page views in the last 30 days")
+    return lambda: asyncio.run(app.process_query(query))
+
+
+@case("planner_unwindowed_max")
+def bench_planner_unwindowed_max(ctx: Context):
+    # The planned SQL alone, bypassing the answer cache
+    from agents.query_planner import QueryPlanner
+    agent = ctx.app.get_bi_agent()
+    plan = QueryPlanner().plan("Highest page views")
+    return lambda: agent._run_plan(plan)
+
+
+@case("analytics_30d")
+def bench_analytics(ctx: Context):
+    app = ctx.app
+    return lambda: asyncio.run(app.get_analytics(app.AnalyticsQuery(days=30), accept_encoding=None))
+
+
+@case("analytics_365d")
+def bench_analytics_year(ctx: Context):
+    app = ctx.app
+    return lambda: asyncio.run(app.get_analytics(app.AnalyticsQuery(days=365), accept_encoding=None))
+
+
+@case("analytics_365d_hourly")
+def bench_analytics_year_hourly(ctx: Context):
+    app = ctx.app
+    query = app.AnalyticsQuery(days=365, granularity="hour", max_points=10_000)
+    return lambda: asyncio.run(app.get_analytics(query, accept_encoding="gzip"))
+
+
+@case("analytics_365d_columnar")
+def bench_analytics_year_columnar(ctx: Context):
+    app = ctx.app
+    query = app.AnalyticsQuery(days=365, granularity="hour", max_points=10_000, format="columnar")
+    return lambda: asyncio.run(app.get_analytics(query, accept_encoding="gzip"))
+
+
+@case("analytics_365d_arrow")
+def bench_analytics_year_arrow(ctx: Context):
+    app = ctx.app
+    query = app.AnalyticsQuery(days=365, granularity="hour", max_points=10_000, format="arrow")
+    return lambda: asyncio.run(app.get_analytics(query, accept_encoding="gzip"))
+
+
+@case("analytics_summary")
+def bench_analytics_summary(ctx: Context):
+    app = ctx.app
+    return lambda: asyncio.run(app.get_analytics_summary())
+
+
+@case("dashboard_build")
+def bench_dashboard_build(ctx: Context):
+    from services.dashboard import DashboardSnapshots
+    ctx.app  # populates analytics_data
+    # A new instance has no snapshot, so every call rebuilds it
+    return lambda: DashboardSnapshots().refresh()
+
+
+@case("dashboard_snapshot")
+def bench_dashboard_snapshot(ctx: Context):
+    app = ctx.app
+    return lambda: asyncio.run(app.get_dashboard(if_none_match=None, accept_encoding="gzip"))
+
+
+@case("dashboard_not_modified")
+def bench_dashboard_not_modified(ctx: Context):
+    app = ctx.app
+    etag = asyncio.run(app.dashboard_snapshots.current()).etag
+    return lambda: asyncio.run(app.get_dashboard(if_none_match=etag, accept_encoding="gzip"))
+
+
+@case("report_generate", max_size=1_000_000)
+def bench_generate_report(ctx: Context):
+    from analysis.business_intelligence import BusinessIntelligenceAnalyzer
+    frame = ctx.frame
+    return lambda: BusinessIntelligenceAnalyzer(frame).generate_report()
+
+
+@case("report_generate_figures", max_size=100_000)
+def bench_generate_report_figures(ctx: Context):
+    from analysis.business_intelligence import BusinessIntelligenceAnalyzer
+    frame = ctx.frame
+    return lambda: BusinessIntelligenceAnalyzer(frame).generate_report(include_visualizations=True)
+
+
+@case("agent_analyze_trends")
+def bench_agent_trends(ctx: Context):
+    agent = ctx.app.get_bi_agent()
+    data = ctx.frame[["date", "page_views", "unique_visitors", "conversion_rate"]].to_dict("list")
+    return lambda: agent.analyze_trends(data)
+
+
+@case("agent_detect_anomalies")
+def bench_agent_anomalies(ctx: Context):
+    agent = ctx.app.get_bi_agent()
+    data = ctx.frame[["date", "page_views", "unique_visitors", "conversion_rate"]].to_dict("list")
+    return lambda: agent.detect_anomalies(data)
+
+
+@case("agent_trends_online")
+def bench_agent_trends_online(ctx: Context):
+    agent = ctx.app.get_bi_agent()
+    return lambda: agent.analyze_trends()
+
+
+@case("agent_anomalies_online")
+def bench_agent_anomalies_online(ctx: Context):
+    agent = ctx.app.get_bi_agent()
+    return lambda: agent.detect_anomalies()
+
+
+@case("chart_time_series", max_size=1_000_000)
+def bench_chart_time_series(ctx: Context):
+    from visualization.plotly_charts import create_time_series_chart
+    frame = ctx.frame
+    return lambda: create_time_series_chart(frame, "page_views", "Page Views")
+
+
+@case("chart_comparison", max_size=1_000_000)
+def bench_chart_comparison(ctx: Context):
+    from visualization.plotly_charts import create_metric_comparison_chart
+    frame = ctx.frame
+    metrics = ["page_views", "unique_visitors", "bounce_rate"]
+    return lambda: create_metric_comparison_chart(frame, metrics, "Comparison")
+
+
+@case("chart_distribution", max_size=1_000_000)
+def bench_chart_distribution(ctx: Context):
+    from visualization.plotly_charts import create_metric_distribution_chart
+    frame = ctx.frame
+    return lambda: create_metric_distribution_chart(frame, "page_views", "Distribution")
+
+
+@case("chart_correlation")
+def bench_chart_correlation(ctx: Context):
+    from visualization.plotly_charts import create_correlation_heatmap
+    frame = ctx.frame
+    metrics = ["page_views", "unique_visitors", "session_duration", "bounce_rate", "conversion_rate"]
+    return lambda: create_correlation_heatmap(frame, metrics, "Correlation")
+
+
+@case("chart_time_series_json")
+def bench_chart_time_series_json(ctx: Context):
+    from visualization.plotly_charts import create_time_series_chart, figure_to_json
+    frame = ctx.frame
+    return lambda: figure_to_json(create_time_series_chart(frame, "page_views", "Page Views"))
+
+
+@case("charts_endpoint_cold")
+def bench_charts_endpoint_cold(ctx: Context):
+    app = ctx.app
+    query = app.AnalyticsQuery(days=365, granularity="hour", max_points=10_000)
+
+    def run():
+        app.figure_cache.clear()
+        return asyncio.run(app.get_chart("comparison", None, query, accept_encoding=None))
+    return run
+
+
+@case("charts_endpoint_cached")
+def bench_charts_endpoint_cached(ctx: Context):
+    app = ctx.app
+    query = app.AnalyticsQuery(days=365, granularity="hour", max_points=10_000)
+    return lambda: asyncio.run(app.get_chart("comparison", None, query, accept_encoding=None))
+
+
+def measure(fn: Callable[[], Any], min_time: float, max_rounds: int) -> Dict[str, Any]:
+    """Time ``fn`` after one warm-up call, for at least 3 rounds or ``min_time`` seconds."""
+    fn()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_rounds and (len(timings) < 3 or time.perf_counter() - started < min_time):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds spent timing each case")
+    parser.add_argument("--max-rounds", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    # All database work happens in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="bi-bench-"))
+    # Keep the pipeline's progress prints out of the report
+    quiet = open(os.devnull, "w")
+
+    results = []
+    print(f"{'case':<26}{'rows':>12}{'median ms':>12}{'min ms':>12}{'rounds':>8}")
+    for size in sorted(args.sizes):
+        ctx = Context(size)
+        for name, setup, max_size in CASES:
+            if args.filter and args.filter not in name:
+                continue
+            if max_size is not None and size > max_size:
+                continue
+            stdout = sys.stdout
+            sys.stdout = quiet
+            try:
+                stats = measure(setup(ctx), args.min_time, args.max_rounds)
+            finally:
+                sys.stdout = stdout
+            results.append({"case": name, "size": size, **stats})
+            print(f"{name:<26}{size:>12,}{stats['median'] * 1000:>12.3f}{stats['min'] * 1000:>12.3f}{stats['rounds']:>8}")
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model returning canned SQL/narration after a fixed delay.
+
+    Stands in for Gemini in benchmarks so results measure this codebase rather
+    than network latency or API quotas. ``latency`` simulates the round trip.
+    """
+
+    sql: str = "SELECT AVG(session_duration) FROM analytics_data"
+    narration: str = "The average session duration is 3.5 minutes."
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        self.calls += 1
+        prompt = messages[-1].content
+        reply = self.sql if "SQL expert" in prompt else self.narration
+        # Batch prompts number their questions and expect one section per question
+        numbers = re.findall(r'^\s*Question (\d+):', prompt, re.M)
+        if "for each question" in prompt.lower():
+            label = "-- Question" if "SQL expert" in prompt else "## Answer"
+            return "\n".join(f"{label} {n}\n{reply}" for n in numbers)
+        return reply
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        # Spread the latency over the reply, one word per chunk
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(words))
+            text = word if i == len(words) - 1 else word + " "
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
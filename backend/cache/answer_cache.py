@@ -0,0 +1,64 @@
+import os
+import re
+import time
+from typing import Any, Dict, Optional
+
+from cache.store import create_cache
+
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_WHITESPACE = re.compile(r"\s+")
+# Reads of the clock in SQLite ('now', CURRENT_DATE...) and DuckDB (now(), today(),
+# get_current_timestamp(), localtimestamp...), matched in normalized SQL
+_CLOCK = re.compile(r"'now'|\b(?:now|today|(?:transaction|statement)_timestamp)\s*\(|current_|\blocaltime(?:stamp)?\b")
+
+
+def normalize_sql(sql: str) -> str:
+    """Lowercase and collapse whitespace outside of string literals."""
+    parts = _QUOTED.split(sql.strip().rstrip(';').strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = _WHITESPACE.sub(' ', parts[i].lower())
+    return ''.join(parts).strip()
+
+
+class AnswerCache:
+    """
+    Cache of narrated answers keyed on (normalized SQL, data version).
+
+    An answer is only reused while analytics_data is unchanged. The agent's
+    data version includes the database id, since the version counter
+    restarts when the database is recreated and the cache may be shared
+    between workers (CACHE_BACKEND=sqlite) or outlive the file. SQL that
+    depends on the clock (``'now'``, ``CURRENT_DATE``, ``now()``, ``today()``...)
+    is additionally keyed on the current minute, so relative windows roll
+    over correctly on either backend.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self._cache = create_cache("answers", max_size=max_size, ttl=ttl)
+
+    @classmethod
+    def from_env(cls) -> "AnswerCache":
+        """Build a cache configured through ANSWER_CACHE_* environment variables."""
+        return cls(
+            max_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "3600")),
+        )
+
+    @staticmethod
+    def _key(sql: str, data_version: Any) -> tuple:
+        normalized = normalize_sql(sql)
+        if _CLOCK.search(normalized):
+            return normalized, data_version, time.strftime('%Y-%m-%d %H:%M')
+        return normalized, data_version
+
+    def get(self, sql: str, data_version: Any) -> Optional[str]:
+        return self._cache.get(self._key(sql, data_version))
+
+    def set(self, sql: str, data_version: Any, answer: str):
+        self._cache.set(self._key(sql, data_version), answer)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
@@ -0,0 +1,50 @@
+import os
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from cache.store import create_cache
+
+
+class FigureCache:
+    """
+    Cache of serialized Plotly figures keyed on (chart type, metrics, data version, range).
+
+    Values are the JSON bytes of the figure, so a hit costs neither building
+    nor serializing it. Entries stop matching as soon as analytics_data
+    changes, because the data version is part of the key.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 3600):
+        self._cache = create_cache("figures", max_size=max_size, ttl=ttl)
+
+    @classmethod
+    def from_env(cls) -> "FigureCache":
+        """Build a cache configured through FIGURE_CACHE_* environment variables."""
+        return cls(
+            max_size=int(os.getenv("FIGURE_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("FIGURE_CACHE_TTL", "3600")),
+        )
+
+    @staticmethod
+    def _key(chart_type: str, metrics: Sequence[str], data_version: Any, range_key: Any) -> tuple:
+        return chart_type, tuple(metrics), data_version, range_key
+
+    def get(self, chart_type: str, metrics: Sequence[str], data_version: Any, range_key: Any) -> Optional[bytes]:
+        return self._cache.get(self._key(chart_type, metrics, data_version, range_key))
+
+    def set(self, chart_type: str, metrics: Sequence[str], data_version: Any, range_key: Any, figure: bytes):
+        self._cache.set(self._key(chart_type, metrics, data_version, range_key), figure)
+
+    def get_or_build(self, chart_type: str, metrics: Sequence[str], data_version: Any, range_key: Any,
+                     build: Callable[[], bytes]) -> bytes:
+        """Return the cached figure, calling ``build`` to serialize it on a miss."""
+        figure = self.get(chart_type, metrics, data_version, range_key)
+        if figure is None:
+            figure = build()
+            self.set(chart_type, metrics, data_version, range_key, figure)
+        return figure
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
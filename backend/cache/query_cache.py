@@ -0,0 +1,148 @@
+import os
+import re
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from cache.store import create_cache
+
+# Words that change the meaning of an otherwise similar question. Two questions
+# are only treated as near-duplicates when they agree on all of these, so that
+# "page views last week" never reuses the SQL generated for "page views last month".
+_CRITICAL_TERMS = {
+    'today', 'yesterday', 'day', 'days', 'week', 'weeks', 'weekly', 'month', 'months',
+    'monthly', 'year', 'years', 'yearly', 'quarter', 'hour', 'hours', 'hourly', 'last',
+    'this', 'previous', 'next', 'average', 'avg', 'mean', 'sum', 'total', 'min',
+    'minimum', 'lowest', 'max', 'maximum', 'highest', 'count', 'top', 'bottom',
+    'trend', 'compare', 'page', 'views', 'visitors', 'unique', 'session', 'duration',
+    'bounce', 'conversion', 'rate', 'weekday', 'weekend',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s%.-]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache key."""
+    text = _PUNCTUATION.sub(' ', text.lower())
+    text = _WHITESPACE.sub(' ', text).strip()
+    return text.rstrip('.')
+
+
+def _critical_terms(normalized: str) -> frozenset:
+    tokens = normalized.split()
+    return frozenset(t for t in tokens if t in _CRITICAL_TERMS or any(c.isdigit() for c in t))
+
+
+class SemanticQueryCache:
+    """
+    Question -> SQL cache used to skip the SQL-generation LLM call.
+
+    Lookups first try the normalized question text and then, if an embedding
+    model is available, the most similar cached question above
+    ``similarity_threshold``. Entries are keyed on the schema version they were
+    generated against as well as the question, so workers sharing the cache
+    (CACHE_BACKEND=sqlite) never serve SQL written for another schema, and
+    entries for an old schema simply age out. Embeddings are kept per process;
+    those of other schema versions are dropped when the version changes.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600,
+        similarity_threshold: float = 0.92,
+        embedding_model: Optional[str] = "all-MiniLM-L6-v2",
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.embedding_model = embedding_model
+        self.schema_version: Optional[Any] = None
+        self.semantic_hits = 0
+        self._cache = create_cache("queries", max_size=max_size, ttl=ttl)
+        self._embeddings: Dict[Tuple[Any, str], np.ndarray] = {}
+        self._encoder = None
+        self._encoder_failed = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SemanticQueryCache":
+        """Build a cache configured through QUERY_CACHE_* environment variables."""
+        return cls(
+            max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+            similarity_threshold=float(os.getenv("QUERY_CACHE_SIMILARITY", "0.92")),
+            embedding_model=os.getenv("QUERY_CACHE_EMBEDDING_MODEL", "all-MiniLM-L6-v2") or None,
+        )
+
+    def _encode(self, text: str) -> Optional[np.ndarray]:
+        if self.embedding_model is None or self._encoder_failed:
+            return None
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._encoder = SentenceTransformer(self.embedding_model)
+            except Exception as e:
+                print(f"Semantic query cache disabled, could not load embeddings: {str(e)}")
+                self._encoder_failed = True
+                return None
+        return self._encoder.encode(text, normalize_embeddings=True)
+
+    def _check_schema(self, schema_version: Any):
+        if schema_version != self.schema_version:
+            self._embeddings = {k: v for k, v in self._embeddings.items() if k[0] == schema_version}
+            self.schema_version = schema_version
+
+    def get(self, question: str, schema_version: Any = None) -> Optional[str]:
+        """Return cached SQL for the question, or None on a miss."""
+        with self._lock:
+            self._check_schema(schema_version)
+            key = (schema_version, normalize_question(question))
+            sql = self._cache.get(key, record=False)
+            if sql is None and self._embeddings:
+                sql = self._nearest(key)
+                if sql is not None:
+                    self.semantic_hits += 1
+            self._cache.record(sql is not None)
+            return sql
+
+    def _nearest(self, key: Tuple[Any, str]) -> Optional[str]:
+        embedding = self._encode(key[1])
+        if embedding is None:
+            return None
+        keys = list(self._embeddings.keys())
+        scores = np.stack([self._embeddings[k] for k in keys]) @ embedding
+        terms = _critical_terms(key[1])
+        for idx in np.argsort(scores)[::-1]:
+            if scores[idx] < self.similarity_threshold:
+                break
+            if _critical_terms(keys[idx][1]) != terms:
+                continue
+            sql = self._cache.get(keys[idx], record=False)
+            if sql is not None:
+                return sql
+        return None
+
+    def set(self, question: str, sql: str, schema_version: Any = None):
+        with self._lock:
+            self._check_schema(schema_version)
+            key = (schema_version, normalize_question(question))
+            evicted = self._cache.set(key, sql)
+            if evicted is not None:
+                self._embeddings.pop(evicted, None)
+            embedding = self._encode(key[1])
+            if embedding is not None:
+                self._embeddings[key] = embedding
+            # Drop embeddings whose entries expired inside the LRU.
+            if len(self._embeddings) > len(self._cache):
+                live = set(self._cache.keys())
+                self._embeddings = {k: v for k, v in self._embeddings.items() if k in live}
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({
+            "semantic_hits": self.semantic_hits,
+            "schema_version": self.schema_version,
+            "semantic_lookup": self._encoder is not None,
+        })
+        return stats
@@ -0,0 +1,207 @@
+"""
+Key-value stores behind the query, answer and figure caches.
+
+``LRUCache`` lives in the memory of one process. ``SQLiteCache`` keeps the
+entries in a SQLite file instead, so every server worker on the host reads
+and fills the same cache; with CACHE_BACKEND=sqlite, create_cache returns one
+of those per cache namespace. Both expose the same interface.
+"""
+import ast
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "./shared_cache.db")
+
+
+class LRUCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss statistics."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, record: bool = True) -> Optional[Any]:
+        """Return the cached value or None; ``record=False`` leaves the stats untouched."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if record:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if record:
+                self.hits += 1
+            return entry[0]
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key: Hashable, value: Any) -> Optional[Hashable]:
+        """Store a value and return the key that was evicted to make room, if any."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                return evicted
+            return None
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class SQLiteCache:
+    """
+    LRUCache-compatible cache stored in a SQLite file shared between processes.
+
+    Keys are stored as their ``repr`` (they are strings, numbers and tuples of
+    those) and values are pickled. Lookups never write, so when the cache is
+    full the least recently *stored* entry is evicted rather than the least
+    recently used one. Hit and miss counts are kept per process; size and
+    entries are shared.
+    """
+
+    def __init__(self, namespace: str, max_size: int = 1024, ttl: float = 3600,
+                 path: str = SHARED_CACHE_PATH):
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        with self._connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires REAL NOT NULL,
+                    UNIQUE (namespace, key)
+                )
+            ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Losing the last writes of a cache on power failure is harmless
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Hashable, record: bool = True) -> Optional[Any]:
+        """Return the cached value or None; ``record=False`` leaves the stats untouched."""
+        row = self._connection().execute(
+            'SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires > ?',
+            (self.namespace, repr(key), time.time())
+        ).fetchone()
+        if record:
+            self.record(row is not None)
+        return pickle.loads(row[0]) if row is not None else None
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key: Hashable, value: Any) -> Optional[Hashable]:
+        """Store a value and return the key that was evicted to make room, if any."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires) VALUES (?, ?, ?, ?)',
+                (self.namespace, repr(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now + self.ttl)
+            )
+            conn.execute('DELETE FROM cache_entries WHERE namespace = ? AND expires <= ?', (self.namespace, now))
+            excess = len(self) - self.max_size
+            if excess <= 0:
+                return None
+            # INSERT OR REPLACE gives a replaced entry a new rowid, so the lowest rowids were stored longest ago
+            evicted = conn.execute(
+                'SELECT rowid, key FROM cache_entries WHERE namespace = ? ORDER BY rowid LIMIT ?',
+                (self.namespace, excess)
+            ).fetchall()
+            conn.executemany('DELETE FROM cache_entries WHERE rowid = ?', [(rowid,) for rowid, _ in evicted])
+        with self._lock:
+            self.evictions += len(evicted)
+        return ast.literal_eval(evicted[-1][1]) if evicted else None
+
+    def keys(self):
+        rows = self._connection().execute(
+            'SELECT key FROM cache_entries WHERE namespace = ? AND expires > ?', (self.namespace, time.time())
+        ).fetchall()
+        return [ast.literal_eval(row[0]) for row in rows]
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "shared": True,
+        }
+
+
+def create_cache(namespace: str, max_size: int = 1024, ttl: float = 3600):
+    """Return the store for one cache: an LRUCache, or a SQLiteCache with CACHE_BACKEND=sqlite."""
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache(namespace, max_size=max_size, ttl=ttl, path=SHARED_CACHE_PATH)
+    return LRUCache(max_size=max_size, ttl=ttl)
@@ -0,0 +1,215 @@
+"""
+Optional columnar mirror of analytics_data for aggregate-heavy queries.
+
+With ANALYTICS_BACKEND=duckdb, analytics_data (partitioned by month) and the
+rollup tables are mirrored into Parquet files under COLUMNAR_PATH, and
+generated SQL runs on an embedded DuckDB over them. SQLite remains the system
+of record: every write still goes there, and the mirror catches up lazily
+before a query whenever the data version has changed. Only months whose
+monthly rollup row (row count, sums, min/max) changed are re-exported.
+
+The DuckDB connection runs with enable_external_access=false, so generated
+SQL cannot read, write or attach files or load extensions. The Parquet files
+are read through pyarrow datasets registered as the table names instead.
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from data import repository, rollups
+from data.data_version import get_data_version
+from data.process_lock import ProcessLock
+
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "sqlite").lower()
+COLUMNAR_PATH = os.getenv("COLUMNAR_PATH", "./analytics_parquet")
+
+# Rows fetched from SQLite per Parquet row group when exporting a month
+EXPORT_BATCH_ROWS = 250_000
+
+INTEGER_COLUMNS = ('ts', 'page_views', 'unique_visitors', 'row_count', 'bucket_ts', 'last_ts')
+
+
+class ColumnarStore:
+    """Parquet mirror of the analytics tables, queried through DuckDB."""
+
+    SQL_DIALECT = "DuckDB"
+
+    def __init__(self, path: str = COLUMNAR_PATH):
+        try:
+            import duckdb
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("ANALYTICS_BACKEND=duckdb requires the duckdb and pyarrow packages")
+        self.path = os.path.abspath(path)
+        self._con = duckdb.connect(config={'enable_external_access': False})
+        # Table name -> pyarrow dataset over its Parquet files, replaced on every sync
+        self._tables: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        # Server workers share the mirror; whoever syncs second finds it up to date
+        self._sync_lock = ProcessLock(os.path.join(self.path, '.sync.lock'))
+        self._synced_version = None
+        self._fingerprints: Dict[int, Tuple] = self._load_fingerprints()
+        self.exports = 0
+
+    def _fingerprint_file(self) -> str:
+        return os.path.join(self.path, 'fingerprints.json')
+
+    def _load_fingerprints(self) -> Dict[int, Tuple]:
+        """Fingerprints of the exported months, so a restart does not re-export everything."""
+        try:
+            with open(self._fingerprint_file()) as f:
+                return {int(bucket): tuple(fp) for bucket, fp in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def _partition_dir(self, month_ts: int) -> str:
+        month = datetime(1970, 1, 1) + timedelta(seconds=month_ts)
+        return os.path.join(self.path, 'analytics_data', f'year={month.year}', f'month={month.month:02d}')
+
+    @staticmethod
+    def _schema(columns: List[str]):
+        import pyarrow as pa
+        return pa.schema([
+            (c, pa.int64() if c in INTEGER_COLUMNS else pa.string() if c == 'date' else pa.float64())
+            for c in columns
+        ])
+
+    def _write(self, cursor, sql: str, params: tuple, target: str):
+        """Write the result of ``sql`` to ``target`` atomically, one row group per batch."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        schema = self._schema(columns)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with pq.ParquetWriter(tmp, schema) as writer:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+                if not rows:
+                    break
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)],
+                    schema=schema,
+                ))
+        # Readers holding the old file keep it open; new queries see the new one
+        os.replace(tmp, target)
+
+    def sync(self) -> bool:
+        """Bring the mirror up to date with SQLite; returns whether anything was exported."""
+        if repository.data_version() == self._synced_version:
+            return False
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock, self._sync_lock, repository.connection() as conn:
+            self._fingerprints = self._load_fingerprints()
+            cursor = conn.cursor()
+            # One read transaction, so the export is a consistent snapshot
+            cursor.execute('BEGIN')
+            try:
+                version = get_data_version(cursor)
+                if version == self._synced_version:
+                    return False
+                cursor.execute(f"SELECT * FROM {rollups.ROLLUP_TABLES['month']}")
+                current = {row[0]: tuple(row) for row in cursor.fetchall()}
+
+                for bucket, fingerprint in current.items():
+                    if self._fingerprints.get(bucket) == fingerprint:
+                        continue
+                    start, end = rollups.bucket_bounds('month', bucket)
+                    self._write(
+                        cursor,
+                        f"SELECT {', '.join(repository.STORAGE_COLUMNS)} FROM analytics_data "
+                        "WHERE ts >= ? AND ts < ? ORDER BY ts",
+                        (start, end),
+                        os.path.join(self._partition_dir(bucket), 'data.parquet'),
+                    )
+                    self.exports += 1
+                for bucket in set(self._fingerprints) - set(current):
+                    shutil.rmtree(self._partition_dir(bucket), ignore_errors=True)
+                for table in rollups.ROLLUP_TABLES.values():
+                    self._write(cursor, f"SELECT * FROM {table} ORDER BY bucket_ts", (), os.path.join(self.path, f'{table}.parquet'))
+            finally:
+                cursor.execute('ROLLBACK')
+
+            self._fingerprints = current
+            with open(self._fingerprint_file(), 'w') as f:
+                json.dump({str(bucket): list(fp) for bucket, fp in current.items()}, f)
+            self._register_tables()
+            self._synced_version = version
+        return True
+
+    def _register_tables(self):
+        import pyarrow.dataset as ds
+        partitions = sorted(
+            os.path.join(directory, 'data.parquet')
+            for directory in (self._partition_dir(bucket) for bucket in self._fingerprints)
+        )
+        tables = {
+            'analytics_data': ds.dataset(partitions, schema=self._schema(list(repository.STORAGE_COLUMNS)),
+                                         format='parquet'),
+        }
+        for table in rollups.ROLLUP_TABLES.values():
+            tables[table] = ds.dataset(os.path.join(self.path, f'{table}.parquet'), format='parquet')
+        self._tables = tables
+
+    def execute_query(self, sql: str, max_rows: Optional[int] = None,
+                      timeout: Optional[float] = None) -> Tuple[List[str], List[tuple]]:
+        """
+        Execute a read query on the mirror, syncing it first, and return column names and rows.
+
+        At most ``max_rows`` rows are fetched; a query running longer than
+        ``timeout`` seconds is interrupted with TimeoutError.
+        """
+        import duckdb
+        self.sync()
+        cursor = self._con.cursor()
+        # Registrations are per cursor
+        for name, dataset in self._tables.items():
+            cursor.register(name, dataset)
+        timer = threading.Timer(timeout, cursor.interrupt) if timeout is not None else None
+        try:
+            if timer is not None:
+                timer.start()
+            cursor.execute(sql)
+            columns = [description[0] for description in cursor.description or []]
+            return columns, cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
+        except duckdb.InterruptException as e:
+            raise TimeoutError(f"the statement exceeded the {timeout:g} second timeout") from e
+        finally:
+            if timer is not None:
+                timer.cancel()
+            cursor.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "duckdb",
+            "path": self.path,
+            "months": len(self._fingerprints),
+            "synced_version": self._synced_version,
+            "exports": self.exports,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_query_backend():
+    """
+    Return the backend generated SQL runs on, per ANALYTICS_BACKEND.
+
+    Both repository (SQLite) and ColumnarStore expose ``SQL_DIALECT`` and
+    ``execute_query(sql, max_rows=None, timeout=None) -> (columns, rows)``.
+    """
+    global _store
+    if ANALYTICS_BACKEND == 'sqlite':
+        return repository
+    if ANALYTICS_BACKEND != 'duckdb':
+        raise ValueError(f"Unknown ANALYTICS_BACKEND '{ANALYTICS_BACKEND}'; expected sqlite or duckdb")
+    with _store_lock:
+        if _store is None:
+            _store = ColumnarStore()
+        return _store
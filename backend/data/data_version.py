@@ -0,0 +1,63 @@
+import sqlite3
+import uuid
+from typing import Optional
+
+
+def ensure_data_version_table(cursor: sqlite3.Cursor):
+    """Create the single-row table holding the analytics_data version counter."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+
+
+def bump_data_version(cursor: sqlite3.Cursor):
+    """
+    Mark analytics_data as changed.
+
+    Every writer to analytics_data must call this inside the same transaction
+    as its writes so that caches keyed on the version never serve stale results.
+    """
+    ensure_data_version_table(cursor)
+    cursor.execute('''
+        INSERT INTO data_version (id, version) VALUES (1, 1)
+        ON CONFLICT(id) DO UPDATE SET version = version + 1
+    ''')
+
+
+def ensure_database_id(cursor: sqlite3.Cursor):
+    """
+    Give the database a random id, once.
+
+    The data version and SQLite's schema cookie restart when the database
+    file is recreated, so caches shared between workers key on this id too.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS database_id (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            token TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO database_id (id, token) VALUES (1, ?)', (uuid.uuid4().hex,))
+
+
+def get_database_id(cursor: sqlite3.Cursor) -> Optional[str]:
+    """Return the database's random id, None if it was never given one."""
+    try:
+        cursor.execute('SELECT token FROM database_id WHERE id = 1')
+    except sqlite3.OperationalError:
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_data_version(cursor: sqlite3.Cursor) -> int:
+    """Return the current analytics_data version, 0 if the data was never written."""
+    try:
+        cursor.execute('SELECT version FROM data_version WHERE id = 1')
+    except sqlite3.OperationalError:
+        return 0
+    row = cursor.fetchone()
+    return row[0] if row else 0
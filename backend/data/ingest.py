@@ -0,0 +1,233 @@
+"""
+Bulk loading of analytics data from CSV, NDJSON or Parquet.
+
+Input is read in ``batch_rows`` chunks, validated and converted with
+vectorized pandas operations, and written through
+repository.write_chunks(upsert=True): one transaction per chunk, and a row
+whose timestamp already exists is updated rather than duplicated. Memory is
+bounded by the chunk size however large the input is.
+"""
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data import repository
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'application/vnd.apache.parquet': 'parquet',
+}
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet',
+}
+
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "100000"))
+
+# Accepted range per metric; rows outside it are rejected
+METRIC_RANGES = {
+    'page_views': (0, None),
+    'unique_visitors': (0, None),
+    'session_duration': (0, None),
+    'bounce_rate': (0, 1),
+    'conversion_rate': (0, 1),
+}
+
+# Rejected rows described individually in the result
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestError(ValueError):
+    """Raised when the input as a whole cannot be ingested (format, columns, corrupt file)."""
+
+
+class IngestResult:
+    """Counts and timing of one ingestion."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_rejected = 0
+        self.errors: List[str] = []
+        self.seconds = 0.0
+
+    def reject(self, rows: np.ndarray, reason: str):
+        """Record rows (1-based positions in the input) rejected for ``reason``."""
+        self.rows_rejected += len(rows)
+        for row in rows[:MAX_REPORTED_ERRORS - len(self.errors)]:
+            self.errors.append(f"row {row}: {reason}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_rejected": self.rows_rejected,
+            "errors": self.errors,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_written / self.seconds) if self.seconds else None,
+        }
+
+
+def detect_format(format: Optional[str] = None, content_type: Optional[str] = None,
+                  filename: Optional[str] = None) -> str:
+    """Pick the input format from an explicit name, a Content-Type or a file extension."""
+    if format:
+        fmt = format.lower()
+    elif content_type and content_type.split(';')[0].strip().lower() in CONTENT_TYPES:
+        fmt = CONTENT_TYPES[content_type.split(';')[0].strip().lower()]
+    elif filename and os.path.splitext(filename)[1].lower() in EXTENSIONS:
+        fmt = EXTENSIONS[os.path.splitext(filename)[1].lower()]
+    else:
+        raise IngestError(f"Cannot determine the input format; specify one of {', '.join(FORMATS)}")
+    if fmt not in FORMATS:
+        raise IngestError(f"Unsupported format '{fmt}'; expected one of {', '.join(FORMATS)}")
+    return fmt
+
+
+def read_frames(stream: BinaryIO, fmt: str, batch_rows: int = INGEST_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield the input as DataFrames of at most ``batch_rows`` rows."""
+    try:
+        if fmt == 'csv':
+            yield from pd.read_csv(stream, chunksize=batch_rows)
+        elif fmt == 'ndjson':
+            yield from pd.read_json(stream, lines=True, chunksize=batch_rows, dtype=False, convert_dates=False)
+        else:
+            yield from _read_parquet(stream, batch_rows)
+    except IngestError:
+        raise
+    except (ValueError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise IngestError(f"Could not parse {fmt} input: {str(e)}")
+    except OSError as e:
+        # E.g. an upload cut off by a client disconnect; the chunk being read is not written
+        raise IngestError(f"Could not read {fmt} input: {str(e)}")
+
+
+def _read_parquet(stream: BinaryIO, batch_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise IngestError("Parquet ingestion requires pyarrow (pip install pyarrow)")
+    # The Parquet footer is at the end of the file, so a non-seekable
+    # stream is spooled to a temporary file (on disk, not in memory) first
+    seekable = getattr(stream, 'seekable', lambda: False)()
+    source = stream if seekable else tempfile.TemporaryFile()
+    try:
+        if not seekable:
+            shutil.copyfileobj(stream, source, 1 << 20)
+            source.seek(0)
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+    finally:
+        if source is not stream:
+            source.close()
+
+
+def _timestamps(frame: pd.DataFrame) -> pd.Series:
+    """The ``ts`` value of each row as float seconds, NaN where missing or unparseable."""
+    if 'ts' in frame.columns:
+        return pd.to_numeric(frame['ts'], errors='coerce')
+    dates = pd.to_datetime(frame['date'], errors='coerce', format='ISO8601')
+    if dates.dt.tz is not None:
+        # Stored timestamps are naive; aware input is normalized to UTC
+        dates = dates.dt.tz_convert('UTC').dt.tz_localize(None)
+    seconds = dates.to_numpy(dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+    return pd.Series(np.where(dates.isna().to_numpy(), np.nan, seconds), index=frame.index)
+
+
+def to_row_chunk(frame: pd.DataFrame, first_row: int, result: IngestResult) -> Optional[repository.RowChunk]:
+    """
+    Validate one frame and convert it to a RowChunk sorted by timestamp.
+
+    ``first_row`` is the 1-based input position of the frame's first row,
+    used in error messages. Invalid rows are dropped and recorded in
+    ``result``; a missing timestamp column or a frame with no metric columns
+    raises IngestError. For duplicate timestamps within the frame the last
+    row wins, as it would across frames.
+    """
+    if 'ts' not in frame.columns and 'date' not in frame.columns:
+        raise IngestError("Input needs a 'date' or 'ts' column")
+    present = [c for c in repository.METRIC_COLUMNS if c in frame.columns]
+    if not present:
+        raise IngestError(f"Input has none of the metric columns {', '.join(repository.METRIC_COLUMNS)}")
+
+    positions = np.arange(first_row, first_row + len(frame))
+    valid = np.ones(len(frame), dtype=bool)
+
+    ts = _timestamps(frame).to_numpy()
+    bad = np.isnan(ts)
+    result.reject(positions[bad], "missing or unparseable timestamp")
+    valid &= ~bad
+
+    metrics = {}
+    for column in repository.METRIC_COLUMNS:
+        if column not in frame.columns:
+            metrics[column] = np.full(len(frame), np.nan)
+            continue
+        raw = frame[column]
+        values = pd.to_numeric(raw, errors='coerce').to_numpy(dtype=np.float64)
+        bad = valid & np.isnan(values) & raw.notna().to_numpy()
+        result.reject(positions[bad], f"{column} is not a number")
+        valid &= ~bad
+        low, high = METRIC_RANGES[column]
+        with np.errstate(invalid='ignore'):
+            out_of_range = (values < low) if high is None else ((values < low) | (values > high))
+        bad = valid & out_of_range
+        result.reject(positions[bad], f"{column} is outside the allowed range")
+        valid &= ~bad
+        metrics[column] = values
+
+    if not valid.any():
+        return None
+    ts = ts[valid].astype(np.int64)
+    order = np.argsort(ts, kind='stable')
+    ts = ts[order]
+    # Keep the last occurrence of each timestamp (stable sort preserves input order)
+    keep = np.append(ts[1:] != ts[:-1], True)
+    ts = ts[keep]
+    columns = [ts.tolist()]
+    for column in repository.METRIC_COLUMNS:
+        values = metrics[column][valid][order][keep]
+        # NaN binds as NULL, which the upsert treats as "no new value"
+        columns.append([None if v != v else v for v in values.tolist()] if np.isnan(values).any() else values.tolist())
+    return repository.RowChunk(zip(*columns), int(ts[0]), int(ts[-1]))
+
+
+def ingest(stream: BinaryIO, fmt: str, batch_rows: int = INGEST_BATCH_ROWS) -> IngestResult:
+    """Stream ``stream`` in ``fmt`` into analytics_data and return what happened."""
+    result = IngestResult()
+    start = time.perf_counter()
+
+    # Input rows whose chunk has been committed; the next frame is only read
+    # after write_chunks has committed the previous chunk
+    done = 0
+
+    def chunks():
+        nonlocal done
+        for frame in read_frames(stream, fmt, batch_rows):
+            done = result.rows_read
+            result.rows_read += len(frame)
+            chunk = to_row_chunk(frame, done + 1, result)
+            if chunk is not None:
+                yield chunk
+            done = result.rows_read
+
+    try:
+        result.rows_written = repository.write_chunks(chunks(), upsert=True)
+    except IngestError as e:
+        if done:
+            raise IngestError(f"{str(e)} (input rows 1-{done} were already ingested)")
+        raise
+    result.seconds = time.perf_counter() - start
+    return result
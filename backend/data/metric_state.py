@@ -0,0 +1,90 @@
+"""
+Persisted online statistics for every metric of analytics_data.
+
+One row per metric holds a JSON-serialized analysis.online_stats.MetricState
+(running mean/variance, EWMA, rolling window, regression slope and recent
+anomalies). refresh() is called by data.repository inside every write
+transaction: rows appended after the newest row already folded in are
+applied incrementally, anything else (backfills, overwrites) rebuilds the
+state from scratch.
+"""
+import json
+import sqlite3
+from typing import Dict, Optional
+
+import numpy as np
+
+from analysis.online_stats import MetricState
+from data.rollups import METRICS
+
+STATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS metric_state (
+        metric TEXT PRIMARY KEY,
+        state TEXT NOT NULL
+    )
+'''
+
+# Rows read from analytics_data per vectorized update
+BATCH_ROWS = 100_000
+
+
+def create_table(cursor: sqlite3.Cursor):
+    cursor.execute(STATE_TABLE_SQL)
+
+
+def load(cursor: sqlite3.Cursor) -> Dict[str, MetricState]:
+    cursor.execute("SELECT metric, state FROM metric_state")
+    return {metric: MetricState.from_dict(json.loads(state)) for metric, state in cursor.fetchall()}
+
+
+def _save(cursor: sqlite3.Cursor, states: Dict[str, MetricState]):
+    cursor.executemany(
+        "INSERT OR REPLACE INTO metric_state (metric, state) VALUES (?, ?)",
+        [(metric, json.dumps(state.to_dict())) for metric, state in states.items()]
+    )
+
+
+def _apply(cursor: sqlite3.Cursor, states: Dict[str, MetricState], after_ts: Optional[int]):
+    """Fold rows with ``ts > after_ts`` (all rows when None) into ``states``, in time order."""
+    where, params = ('WHERE ts > ?', (after_ts,)) if after_ts is not None else ('', ())
+    cursor.execute(f"SELECT ts, {', '.join(METRICS)} FROM analytics_data {where} ORDER BY ts", params)
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        # NULLs become NaN, which MetricState.update skips
+        matrix = np.array(rows, dtype=np.float64)
+        timestamps = matrix[:, 0].astype(np.int64)
+        for i, metric in enumerate(METRICS):
+            states[metric].update(timestamps, matrix[:, i + 1])
+
+
+def rebuild(cursor: sqlite3.Cursor):
+    """Recompute every metric's state from all rows."""
+    states = {metric: MetricState.new() for metric in METRICS}
+    _apply(cursor, states, None)
+    cursor.execute("DELETE FROM metric_state")
+    _save(cursor, states)
+
+
+def refresh(cursor: sqlite3.Cursor, min_ts: int, rebuild_if_needed: bool = True) -> bool:
+    """
+    Bring the state up to date after rows with ``ts >= min_ts`` were written.
+
+    Returns False, leaving the state stale, when the write was not a pure
+    append and ``rebuild_if_needed`` is off; the caller must then rebuild().
+    """
+    states = load(cursor)
+    last_ts = max((s.last_ts for s in states.values() if s.last_ts is not None), default=None)
+    if len(states) < len(METRICS) or (last_ts is not None and min_ts <= last_ts):
+        if not rebuild_if_needed:
+            return False
+        rebuild(cursor)
+        return True
+    _apply(cursor, states, last_ts)
+    _save(cursor, states)
+    return True
+
+
+def clear(cursor: sqlite3.Cursor):
+    cursor.execute("DELETE FROM metric_state")
@@ -1,110 +1,93 @@
-import sqlite3
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, Optional
+from data import repository
 
-def generate_mock_analytics_data(days: int = 30, format: str = "json"):
-    """Generate mock analytics data for the specified number of days."""
-    conn = sqlite3.connect('business_intelligence.db')
-    cursor = conn.cursor()
+# Base values with some randomness
+BASE_PAGE_VIEWS = 5000
+BASE_UNIQUE_VISITORS = 3000
+BASE_SESSION_DURATION = 3.5  # minutes
+BASE_BOUNCE_RATE = 0.35  # 35%
+BASE_CONVERSION_RATE = 0.02  # 2%
 
-    # Clear existing data
-    cursor.execute('DELETE FROM analytics_data')
+def iter_mock_analytics_chunks(days: float = 30, seed: Optional[int] = None,
+                               interval_seconds: int = 3600, chunk_rows: int = 100_000,
+                               end_date: Optional[datetime] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Generate mock analytics data as chunks of NumPy column arrays.
 
-    # Generate data for the last N days
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    data = []
-    current_date = start_date
+    Rows run from ``end_date - days`` to ``end_date`` (default: now) every
+    ``interval_seconds``. Each chunk maps ``ts`` and every metric column to an
+    array of at most ``chunk_rows`` values, so memory stays bounded however
+    many rows are generated. The same ``seed`` and arguments reproduce the
+    same data.
+    """
+    rng = np.random.default_rng(seed)
+    end_ts = repository.to_timestamp(end_date or datetime.now())
+    start_ts = end_ts - int(days * 86400)
+    total = (end_ts - start_ts) // interval_seconds + 1
     
-    # Base values with some randomness
-    base_page_views = 5000
-    base_unique_visitors = 3000
-    base_session_duration = 3.5  # minutes
-    base_bounce_rate = 0.35  # 35%
-    base_conversion_rate = 0.02  # 2%
-    
-    while current_date <= end_date:
-        # Generate realistic variations
-        # Weekdays have more traffic
-        is_weekday = current_date.weekday() < 5
-        weekday_multiplier = 1.2 if is_weekday else 0.8
-        
-        # Morning/afternoon variations
-        hour = current_date.hour
-        if 9 <= hour <= 17:  # Business hours
-            time_multiplier = 1.3
-        else:
-            time_multiplier = 0.7
-            
-        # Generate data with realistic patterns
-        page_views = int(base_page_views * weekday_multiplier * time_multiplier * random.uniform(0.9, 1.1))
-        unique_visitors = int(base_unique_visitors * weekday_multiplier * time_multiplier * random.uniform(0.9, 1.1))
-        session_duration = base_session_duration * random.uniform(0.8, 1.2)
-        bounce_rate = base_bounce_rate * random.uniform(0.9, 1.1)
-        conversion_rate = base_conversion_rate * random.uniform(0.9, 1.1)
+    for offset in range(0, total, chunk_rows):
+        n = min(chunk_rows, total - offset)
+        ts = start_ts + (np.arange(offset, offset + n, dtype=np.int64) * interval_seconds)
         
-        # Ensure values are within realistic bounds
-        bounce_rate = min(max(bounce_rate, 0.1), 0.8)  # Between 10% and 80%
-        conversion_rate = min(max(conversion_rate, 0.005), 0.1)  # Between 0.5% and 10%
-        session_duration = min(max(session_duration, 1), 10)  # Between 1 and 10 minutes
+        # Weekdays have more traffic (1970-01-01 was a Thursday, so Monday is 0)
+        is_weekday = (ts // 86400 + 3) % 7 < 5
+        weekday_multiplier = np.where(is_weekday, 1.2, 0.8)
         
-        # Insert data into database
-        cursor.execute('''
-            INSERT INTO analytics_data 
-            (date, page_views, unique_visitors, session_duration, bounce_rate, conversion_rate)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            current_date.strftime('%Y-%m-%d %H:%M:%S'),
-            page_views,
-            unique_visitors,
-            session_duration,
-            bounce_rate,
-            conversion_rate
-        ))
+        # Business hours (9 AM - 5 PM) have more traffic
+        hour = ts % 86400 // 3600
+        time_multiplier = np.where((hour >= 9) & (hour <= 17), 1.3, 0.7)
+        traffic = weekday_multiplier * time_multiplier
         
-        data.append({
-            'date': current_date.strftime('%Y-%m-%d %H:%M:%S'),
-            'page_views': page_views,
-            'unique_visitors': unique_visitors,
-            'session_duration': session_duration,
-            'bounce_rate': bounce_rate,
-            'conversion_rate': conversion_rate
-        })
-        
-        current_date += timedelta(hours=1)  # Generate hourly data
+        # Generate data with realistic patterns, within realistic bounds
+        yield {
+            'ts': ts,
+            'page_views': (BASE_PAGE_VIEWS * traffic * rng.uniform(0.9, 1.1, n)).astype(np.int64),
+            'unique_visitors': (BASE_UNIQUE_VISITORS * traffic * rng.uniform(0.9, 1.1, n)).astype(np.int64),
+            # Between 1 and 10 minutes
+            'session_duration': np.clip(BASE_SESSION_DURATION * rng.uniform(0.8, 1.2, n), 1, 10),
+            # Between 10% and 80%
+            'bounce_rate': np.clip(BASE_BOUNCE_RATE * rng.uniform(0.9, 1.1, n), 0.1, 0.8),
+            # Between 0.5% and 10%
+            'conversion_rate': np.clip(BASE_CONVERSION_RATE * rng.uniform(0.9, 1.1, n), 0.005, 0.1),
+        }
+
+def _to_row_chunk(chunk: Dict[str, np.ndarray]) -> repository.RowChunk:
+    ts = chunk['ts']
+    columns = [ts.tolist()] + [chunk[c].tolist() for c in repository.METRIC_COLUMNS]
+    return repository.RowChunk(zip(*columns), int(ts[0]), int(ts[-1]))
+
+def populate_mock_analytics(days: float = 30, seed: Optional[int] = None,
+                            interval_seconds: int = 3600, chunk_rows: int = 100_000) -> int:
+    """
+    Replace analytics_data with generated rows without materializing them.
+
+    Chunks are written as they are generated, each in its own transaction.
+    Returns the number of rows written.
+    """
+    chunks = iter_mock_analytics_chunks(days, seed, interval_seconds, chunk_rows)
+    return repository.write_chunks((_to_row_chunk(chunk) for chunk in chunks), replace=True)
+
+def generate_mock_analytics_data(days: int = 30, format: str = "json", seed: Optional[int] = None):
+    """Generate mock analytics data for the specified number of days."""
+    if format not in ("json", "dataframe"):
+        raise ValueError("Format must be either 'json' or 'dataframe'")
+    
+    chunks = list(iter_mock_analytics_chunks(days, seed))
+    repository.write_chunks((_to_row_chunk(chunk) for chunk in chunks), replace=True)
     
-    conn.commit()
-    conn.close()
+    df = pd.concat([pd.DataFrame(chunk) for chunk in chunks], ignore_index=True)
+    df.insert(0, 'date', pd.to_datetime(df.pop('ts'), unit='s').dt.strftime('%Y-%m-%d %H:%M:%S'))
     
     if format == "json":
-        return data
-    elif format == "dataframe":
-        return pd.DataFrame(data)
-    else:
-        raise ValueError("Format must be either 'json' or 'dataframe'")
+        return df.to_dict('records')
+    return df
 
 def get_analytics_summary():
     """Get summary statistics from the analytics data."""
-    conn = sqlite3.connect('business_intelligence.db')
-    cursor = conn.cursor()
-    
-    # Get summary statistics
-    cursor.execute('''
-        SELECT 
-            AVG(page_views) as avg_page_views,
-            AVG(unique_visitors) as avg_unique_visitors,
-            AVG(session_duration) as avg_session_duration,
-            AVG(bounce_rate) as avg_bounce_rate,
-            AVG(conversion_rate) as avg_conversion_rate,
-            MAX(date) as last_update
-        FROM analytics_data
-    ''')
-    
-    summary = cursor.fetchone()
-    conn.close()
+    summary = repository.fetch_summary()
     
     return {
         'average_page_views': summary[0],
@@ -0,0 +1,58 @@
+"""
+Exclusive lock shared by every process that opens the same lock file.
+
+Used to funnel SQLite writes from several server workers through one writer
+at a time (see repository.transaction) instead of having them race on
+busy_timeout. Threads of one process queue on an in-process lock first, so
+only one thread per process ever waits on the file lock. Re-entering the
+lock from the thread that holds it is allowed. A forked child reopens the
+lock file, since flock locks are shared by every copy of a descriptor.
+
+Where ``fcntl`` is unavailable (Windows) only the in-process lock is taken.
+"""
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ProcessLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+        self._pid = os.getpid()
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            self._reset()
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except Exception:
+                self._lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+    def __enter__(self) -> "ProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,619 @@
+"""
+Single data-access layer for the business intelligence database.
+
+All reads and writes of analytics_data go through this module. Connections
+come from a small process-wide pool and are configured once with WAL
+journaling and tuned pragmas, and LangChain's SQLDatabase is built on an
+engine that draws identically configured connections.
+"""
+import calendar
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from data import metric_state, rollups
+from data.process_lock import ProcessLock
+from data.data_version import (
+    bump_data_version, ensure_data_version_table, ensure_database_id, get_data_version, get_database_id,
+)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./business_intelligence.db")
+
+# Dialect of execute_query, for prompts that generate SQL (see data.columnar)
+SQL_DIALECT = "SQLite"
+
+ANALYTICS_COLUMNS = (
+    'date', 'page_views', 'unique_visitors', 'session_duration', 'bounce_rate', 'conversion_rate'
+)
+METRIC_COLUMNS = ANALYTICS_COLUMNS[1:]
+# Physical column order of analytics_data
+STORAGE_COLUMNS = ('ts',) + ANALYTICS_COLUMNS
+
+EPOCH = datetime(1970, 1, 1)
+
+# Applied to every new connection
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))}",
+    f"PRAGMA cache_size={-int(os.getenv('SQLITE_CACHE_KB', '65536'))}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+def database_path(url: str = DATABASE_URL) -> str:
+    """Return the filesystem path of a sqlite:/// database URL."""
+    if not url.startswith("sqlite:///"):
+        raise ValueError(f"Only sqlite:/// database URLs are supported, got {url!r}")
+    return url[len("sqlite:///"):]
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """Open a new connection with the standard pragmas applied."""
+    conn = sqlite3.connect(
+        path or database_path(),
+        check_same_thread=False,
+        cached_statements=int(os.getenv("SQLITE_STATEMENT_CACHE", "256")),
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of SQLite connections shared across threads.
+
+    Connections are opened lazily up to ``size``; further callers block until
+    one is returned. A connection is only ever used by one thread at a time.
+    """
+
+    def __init__(self, path: str, size: int = 8):
+        self.path = path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return connect(self.path)
+                except Exception:
+                    self._opened -= 1
+                    raise
+        return self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._opened = 0
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_writer_lock: Optional[ProcessLock] = None
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(database_path(), size=int(os.getenv("SQLITE_POOL_SIZE", "8")))
+    return _pool
+
+
+def get_writer_lock() -> ProcessLock:
+    """Lock held by every write transaction, shared by all processes using the database."""
+    global _writer_lock
+    if _writer_lock is None:
+        with _pool_lock:
+            if _writer_lock is None:
+                _writer_lock = ProcessLock(f"{database_path()}.writer.lock")
+    return _writer_lock
+
+
+@contextmanager
+def connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled connection for reads."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Cursor]:
+    """
+    Borrow a pooled connection and run the block in one transaction.
+
+    The write lock is taken up front (BEGIN IMMEDIATE) so schema changes are
+    atomic too and concurrent writers wait on busy_timeout instead of failing
+    with a deadlock when upgrading a read lock. Writers first queue on the
+    writer lock, so with several server workers (or an ingest CLI next to
+    the server) only one of them holds a write transaction at a time and
+    none gives up after busy_timeout.
+    """
+    with get_writer_lock(), get_pool().connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def create_engine():
+    """SQLAlchemy engine for LangChain's SQLDatabase, drawing connections configured like the pool's."""
+    from sqlalchemy import create_engine as sqlalchemy_create_engine
+
+    path = database_path()
+    return sqlalchemy_create_engine(
+        f"sqlite:///{path}",
+        creator=lambda: connect(path),
+        pool_size=int(os.getenv("SQLITE_POOL_SIZE", "8")),
+    )
+
+
+SCHEMA_VERSION = 3
+
+ANALYTICS_TABLE_SQL = '''
+    CREATE TABLE {name} (
+        ts INTEGER PRIMARY KEY,
+        date TEXT NOT NULL,
+        page_views INTEGER,
+        unique_visitors INTEGER,
+        session_duration REAL,
+        bounce_rate REAL,
+        conversion_rate REAL
+    )
+'''
+
+
+def to_timestamp(value: Any) -> int:
+    """
+    Convert a datetime or 'YYYY-MM-DD[ HH:MM:SS]' string to the ``ts`` column value.
+
+    Timestamps are naive wall-clock times encoded as seconds since 1970-01-01
+    00:00:00, so ``datetime(ts, 'unixepoch')`` in SQL gives back the same text.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return calendar.timegm(value.timetuple())
+
+
+def format_timestamp(ts: int) -> str:
+    """Inverse of to_timestamp, in the canonical 'YYYY-MM-DD HH:MM:SS' form stored in ``date``."""
+    return (EPOCH + timedelta(seconds=ts)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _table_exists(cursor: sqlite3.Cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def _migrate_to_time_index(cursor: sqlite3.Cursor):
+    """
+    Schema v1: rebuild analytics_data clustered on an integer timestamp.
+
+    The legacy table kept ``date`` as unindexed TEXT in two formats behind an
+    AUTOINCREMENT id, so every time range or ORDER BY date scanned and sorted
+    the whole table. ``ts INTEGER PRIMARY KEY`` makes the timestamp the rowid,
+    so rows are stored in time order and range queries are B-tree seeks.
+    Rows with unparseable dates are dropped; for duplicate timestamps the
+    most recently inserted row wins.
+    """
+    cursor.execute(ANALYTICS_TABLE_SQL.format(name='analytics_data_v1'))
+    cursor.execute(f'''
+        INSERT OR REPLACE INTO analytics_data_v1 (ts, {', '.join(ANALYTICS_COLUMNS)})
+        SELECT CAST(strftime('%s', date) AS INTEGER), datetime(date),
+               page_views, unique_visitors, session_duration, bounce_rate, conversion_rate
+        FROM analytics_data
+        WHERE strftime('%s', date) IS NOT NULL
+        ORDER BY id
+    ''')
+    cursor.execute('DROP TABLE analytics_data')
+    cursor.execute('ALTER TABLE analytics_data_v1 RENAME TO analytics_data')
+    bump_data_version(cursor)
+
+
+def _add_rollups(cursor: sqlite3.Cursor):
+    """Schema v2: daily/weekly/monthly rollup tables, populated from existing rows."""
+    rollups.create_tables(cursor)
+    rollups.rebuild_all(cursor)
+
+
+def _add_metric_state(cursor: sqlite3.Cursor):
+    """Schema v3: persisted online statistics per metric, built from existing rows."""
+    metric_state.create_table(cursor)
+    metric_state.rebuild(cursor)
+
+
+MIGRATIONS = {
+    1: _migrate_to_time_index,
+    2: _add_rollups,
+    3: _add_metric_state,
+}
+
+
+def initialize_database(seed_sample_data: bool = True):
+    """Create or migrate the schema and, for an empty table, insert 30 days of sample data."""
+    with transaction() as cursor:
+        ensure_data_version_table(cursor)
+        ensure_database_id(cursor)
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+        if not _table_exists(cursor, 'analytics_data'):
+            cursor.execute(ANALYTICS_TABLE_SQL.format(name='analytics_data'))
+            rollups.create_tables(cursor)
+            metric_state.create_table(cursor)
+        else:
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                print(f"Migrating analytics_data to schema version {target}")
+                MIGRATIONS[target](cursor)
+        if version != SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+        cursor.execute("SELECT COUNT(*) FROM analytics_data")
+        if cursor.fetchone()[0] == 0 and seed_sample_data:
+            # Insert sample data for the last 30 days
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            _insert_rows(cursor, [
+                (
+                    today - timedelta(days=i),
+                    random.randint(800, 1200),  # page_views
+                    random.randint(400, 600),   # unique_visitors
+                    round(random.uniform(2.0, 5.0), 1),  # session_duration
+                    round(random.uniform(0.2, 0.4), 2),  # bounce_rate
+                    round(random.uniform(0.01, 0.03), 2)  # conversion_rate
+                )
+                for i in range(30)
+            ])
+            bump_data_version(cursor)
+
+
+def _insert_rows(cursor: sqlite3.Cursor, rows: Iterable[Sequence[Any]]):
+    """Insert rows in ANALYTICS_COLUMNS order; ``date`` may be a datetime or string."""
+    _insert_storage_rows(cursor, (
+        (ts, format_timestamp(ts)) + tuple(row[1:])
+        for row in rows
+        for ts in (to_timestamp(row[0]),)
+    ))
+
+
+def _insert_storage_rows(cursor: sqlite3.Cursor, rows: Iterable[Sequence[Any]]):
+    """Insert rows already in STORAGE_COLUMNS order and refresh the rollups and metric state."""
+    bounds = [None, None]
+
+    def tracked():
+        for row in rows:
+            ts = row[0]
+            if bounds[0] is None or ts < bounds[0]:
+                bounds[0] = ts
+            if bounds[1] is None or ts > bounds[1]:
+                bounds[1] = ts
+            yield row
+
+    cursor.executemany(f'''
+        INSERT INTO analytics_data ({', '.join(STORAGE_COLUMNS)})
+        VALUES ({', '.join('?' for _ in STORAGE_COLUMNS)})
+    ''', tracked())
+    if bounds[0] is not None:
+        rollups.refresh(cursor, bounds[0], bounds[1])
+        metric_state.refresh(cursor, bounds[0])
+
+
+class RowChunk(NamedTuple):
+    """A batch of (ts, *METRIC_COLUMNS) rows together with its timestamp bounds."""
+    rows: Iterable[Sequence[Any]]
+    min_ts: int
+    max_ts: int
+
+
+# On a timestamp collision keep the row but take every non-NULL incoming metric
+UPSERT_SQL = 'ON CONFLICT(ts) DO UPDATE SET ' + ', '.join(
+    f'{column} = COALESCE(excluded.{column}, {column})' for column in METRIC_COLUMNS
+)
+
+
+def _insert_chunk(cursor: sqlite3.Cursor, chunk: RowChunk, upsert: bool = False) -> int:
+    """Insert a chunk, deriving ``date`` from ``ts`` inside SQLite, and refresh its rollups."""
+    cursor.executemany(f'''
+        INSERT INTO analytics_data ({', '.join(STORAGE_COLUMNS)})
+        VALUES (?1, datetime(?1, 'unixepoch'), {', '.join(f'?{i + 2}' for i in range(len(METRIC_COLUMNS)))})
+        {UPSERT_SQL if upsert else ''}
+    ''', chunk.rows)
+    written = cursor.rowcount
+    rollups.refresh(cursor, chunk.min_ts, chunk.max_ts)
+    return written
+
+
+def write_chunks(chunks: Iterable[RowChunk], replace: bool = False, upsert: bool = False) -> int:
+    """
+    Write chunks of rows, one transaction per chunk, and return the row count.
+
+    Chunks are consumed lazily, so arbitrarily large data sets stream through
+    with memory bounded by the chunk size. With ``replace`` all existing rows
+    are deleted first; with ``upsert`` rows whose timestamp already exists are
+    updated instead of failing the chunk.
+
+    Appended chunks update the metric state incrementally. The first chunk
+    that is not a pure append makes it stale, and it is rebuilt once after
+    the last chunk rather than once per chunk.
+    """
+    if replace:
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM analytics_data')
+            rollups.clear(cursor)
+            metric_state.clear(cursor)
+            bump_data_version(cursor)
+    written = 0
+    stale = False
+    try:
+        for chunk in chunks:
+            with transaction() as cursor:
+                written += _insert_chunk(cursor, chunk, upsert)
+                if not stale:
+                    stale = not metric_state.refresh(cursor, chunk.min_ts, rebuild_if_needed=False)
+                bump_data_version(cursor)
+    finally:
+        # Also after a failure, so the chunks already committed are reflected
+        if stale:
+            with transaction() as cursor:
+                metric_state.rebuild(cursor)
+    return written
+
+
+def fetch_rows_after(after_ts: Optional[int], limit: int) -> List[tuple]:
+    """Return up to ``limit`` (ts, *METRIC_COLUMNS) rows with ``ts > after_ts``, oldest first."""
+    where, params = ('WHERE ts > ?', (after_ts, limit)) if after_ts is not None else ('', (limit,))
+    with connection() as conn:
+        return conn.execute(f'''
+            SELECT ts, {', '.join(METRIC_COLUMNS)}
+            FROM analytics_data
+            {where}
+            ORDER BY ts
+            LIMIT ?
+        ''', params).fetchall()
+
+
+# Approximate bucket widths, used to count buckets when choosing a granularity
+GRANULARITY_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400,
+}
+
+def choose_granularity(start_ts: int, end_ts: int, max_points: int,
+                       granularity: Optional[str] = None) -> str:
+    """
+    Return the finest granularity, no finer than the requested one, whose
+    bucket count over [start_ts, end_ts) fits in ``max_points``.
+    """
+    names = list(GRANULARITY_SECONDS)
+    first = names.index(granularity) if granularity else 0
+    for name in names[first:]:
+        if (end_ts - start_ts) / GRANULARITY_SECONDS[name] <= max_points:
+            return name
+    return names[-1]
+
+
+def latest_timestamp() -> Optional[int]:
+    """Return the ts of the newest row, or None for an empty table."""
+    with connection() as conn:
+        return conn.execute("SELECT MAX(ts) FROM analytics_data").fetchone()[0]
+
+
+def fetch_series_rows(start_ts: int, end_ts: int, granularity: str) -> Tuple[List[str], List[tuple]]:
+    """
+    Aggregate rows in [start_ts, end_ts) into time buckets, oldest first.
+
+    Counts (page views, visitors) are summed per bucket; durations and rates
+    are averaged. ``date`` is the start of each bucket. Daily and coarser
+    series are read from the rollup tables and cover every bucket starting
+    in the range, so the first and last buckets are always whole.
+    """
+    if granularity in rollups.ROLLUP_TABLES:
+        start_ts = rollups.bucket_start(granularity, start_ts)
+        sql = f'''
+            SELECT
+                date,
+                page_views_sum as page_views,
+                unique_visitors_sum as unique_visitors,
+                session_duration_sum / row_count as session_duration,
+                bounce_rate_sum / row_count as bounce_rate,
+                conversion_rate_sum / row_count as conversion_rate
+            FROM {rollups.ROLLUP_TABLES[granularity]}
+            WHERE bucket_ts >= ? AND bucket_ts < ?
+            ORDER BY bucket_ts
+        '''
+    else:
+        bucket = rollups.BUCKET_SQL[granularity].format(ts='ts')
+        sql = f'''
+            SELECT
+                datetime({bucket}, 'unixepoch') as date,
+                SUM(page_views) as page_views,
+                SUM(unique_visitors) as unique_visitors,
+                AVG(session_duration) as session_duration,
+                AVG(bounce_rate) as bounce_rate,
+                AVG(conversion_rate) as conversion_rate
+            FROM analytics_data
+            WHERE ts >= ? AND ts < ?
+            GROUP BY {bucket}
+            ORDER BY {bucket}
+        '''
+    with connection() as conn:
+        cursor = conn.execute(sql, (start_ts, end_ts))
+        columns = [description[0] for description in cursor.description]
+        return columns, cursor.fetchall()
+
+
+def fetch_metric_stats(start_ts: Optional[int] = None, end_ts: Optional[int] = None,
+                       granularity: str = 'month') -> Dict[str, Dict[str, Any]]:
+    """
+    Return count, mean, standard deviation, min and max per metric.
+
+    Computed from the rollup sums and sums of squares, so the cost depends on
+    the number of buckets in the range rather than the number of raw rows.
+    Without bounds, all data is covered.
+    """
+    table = rollups.ROLLUP_TABLES[granularity]
+    where, params = '', ()
+    if start_ts is not None and end_ts is not None:
+        where, params = 'WHERE bucket_ts >= ? AND bucket_ts < ?', (rollups.bucket_start(granularity, start_ts), end_ts)
+    aggregates = ', '.join(
+        f"SUM({m}_sum), SUM({m}_sumsq), MIN({m}_min), MAX({m}_max)" for m in rollups.METRICS
+    )
+    with connection() as conn:
+        row = conn.execute(f"SELECT SUM(row_count), {aggregates} FROM {table} {where}", params).fetchone()
+
+    count = row[0] or 0
+    stats = {}
+    for i, metric in enumerate(rollups.METRICS):
+        total, total_sq, low, high = row[1 + 4 * i: 5 + 4 * i]
+        mean = total / count if count else None
+        std = None
+        if count > 1:
+            std = max(total_sq - total * total / count, 0.0) / (count - 1)
+            std = std ** 0.5
+        stats[metric] = {"count": count, "mean": mean, "std": std, "min": low, "max": high}
+    return stats
+
+
+def fetch_summary() -> Tuple:
+    """Return per-metric averages and the latest date, read from the monthly rollups."""
+    stats = fetch_metric_stats()
+    with connection() as conn:
+        last_update = conn.execute(
+            "SELECT date FROM analytics_data ORDER BY ts DESC LIMIT 1"
+        ).fetchone()
+    return tuple(stats[m]["mean"] for m in rollups.METRICS) + (last_update[0] if last_update else None,)
+
+
+def fetch_metric_states() -> Dict[str, metric_state.MetricState]:
+    """Return the persisted online statistics (analysis.online_stats.MetricState) per metric."""
+    with connection() as conn:
+        return metric_state.load(conn.cursor())
+
+
+# Actions a read query may perform; anything else is denied when the statement is prepared
+READ_ACTIONS = frozenset((sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE))
+
+# SQLite virtual machine instructions between checks of a statement's deadline
+PROGRESS_INTERVAL = 10_000
+
+
+def _read_only_authorizer(action: int, arg1: Optional[str], arg2: Optional[str], *_) -> int:
+    if action not in READ_ACTIONS or (action == sqlite3.SQLITE_FUNCTION and arg2 == 'load_extension'):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+
+@contextmanager
+def _read_only(conn: sqlite3.Connection, timeout: Optional[float] = None) -> Iterator[None]:
+    """Deny anything but reads on ``conn`` and interrupt statements running past ``timeout`` seconds."""
+    conn.set_authorizer(_read_only_authorizer)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    if deadline is not None:
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_INTERVAL)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if deadline is not None and str(e) == 'interrupted' and time.monotonic() > deadline:
+            raise TimeoutError(f"the statement exceeded the {timeout:g} second timeout") from e
+        raise
+    finally:
+        conn.set_authorizer(None)
+        conn.set_progress_handler(None, 0)
+
+
+def execute_query(sql: str, max_rows: Optional[int] = None,
+                  timeout: Optional[float] = None) -> Tuple[List[str], List[tuple]]:
+    """
+    Execute an arbitrary read query and return its column names and rows.
+
+    Statements that would write, attach databases or change pragmas are
+    refused by an authorizer when they are prepared. At most ``max_rows``
+    rows are fetched; a statement running longer than ``timeout`` seconds
+    is interrupted with TimeoutError.
+    """
+    with connection() as conn, _read_only(conn, timeout):
+        cursor = conn.execute(sql)
+        columns = [description[0] for description in cursor.description or []]
+        rows = cursor.fetchall() if max_rows is None else cursor.fetchmany(max_rows)
+        cursor.close()
+        return columns, rows
+
+
+def explain_query_plan(sql: str) -> List[str]:
+    """Return the detail lines of SQLite's EXPLAIN QUERY PLAN for a read query."""
+    with connection() as conn, _read_only(conn):
+        return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def table_row_counts() -> Dict[str, int]:
+    """
+    Return the number of rows of every table.
+
+    analytics_data is counted from its monthly rollup, so this stays cheap
+    however large the table grows.
+    """
+    with connection() as conn:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+        counts = {}
+        for table in tables:
+            if table == 'analytics_data':
+                sql = f"SELECT COALESCE(SUM(row_count), 0) FROM {rollups.ROLLUP_TABLES['month']}"
+            else:
+                sql = f'SELECT COUNT(*) FROM "{table}"'
+            counts[table] = conn.execute(sql).fetchone()[0]
+        return counts
+
+
+def data_version() -> int:
+    """Return the analytics_data version token, bumped by every writer."""
+    with connection() as conn:
+        return get_data_version(conn.cursor())
+
+
+def database_id() -> Optional[str]:
+    """Return the random id given to this database file when it was created."""
+    with connection() as conn:
+        return get_database_id(conn.cursor())
+
+
+def schema_version() -> int:
+    """Return SQLite's schema cookie, which changes whenever any table or index is altered."""
+    with connection() as conn:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
@@ -0,0 +1,132 @@
+"""
+Pre-aggregated daily, weekly and monthly rollups of analytics_data.
+
+Each rollup row holds, per metric, the sum, min, max and sum of squares of
+the raw rows in one bucket, plus the row count. That is enough to derive
+totals, means, standard deviations and z-scores for any range of whole
+buckets without touching the raw hourly rows. Rollups are maintained by
+refresh(), which data.repository calls inside every write transaction with
+the range of timestamps it touched.
+"""
+import calendar
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Tuple
+
+METRICS = ('page_views', 'unique_visitors', 'session_duration', 'bounce_rate', 'conversion_rate')
+
+ROLLUP_TABLES = {
+    'day': 'analytics_daily',
+    'week': 'analytics_weekly',
+    'month': 'analytics_monthly',
+}
+
+DAY = 86400
+
+# SQL expression giving the start (as ts) of the bucket containing {ts}.
+# 1970-01-01 was a Thursday, so (days + 3) % 7 counts days since Monday.
+BUCKET_SQL = {
+    'hour': "{ts} - {ts} % 3600",
+    'day': "{ts} - {ts} % 86400",
+    'week': "({ts} / 86400 - ({ts} / 86400 + 3) % 7) * 86400",
+    'month': "CAST(strftime('%s', {ts}, 'unixepoch', 'start of month') AS INTEGER)",
+}
+
+_STAT_COLUMNS = [f"{m}_{stat}" for m in METRICS for stat in ('sum', 'min', 'max', 'sumsq')]
+
+
+def create_tables(cursor: sqlite3.Cursor):
+    metric_columns = ',\n'.join(
+        f"{m}_sum NUMERIC, {m}_min NUMERIC, {m}_max NUMERIC, {m}_sumsq REAL" for m in METRICS
+    )
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket_ts INTEGER PRIMARY KEY,
+                date TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                {metric_columns}
+            )
+        ''')
+
+
+def bucket_bounds(granularity: str, ts: int) -> Tuple[int, int]:
+    """Return [start, end) of the day, week or month bucket containing ts."""
+    if granularity == 'day':
+        start = ts - ts % DAY
+        return start, start + DAY
+    if granularity == 'week':
+        days = ts // DAY
+        start = (days - (days + 3) % 7) * DAY
+        return start, start + 7 * DAY
+    moment = datetime(1970, 1, 1) + timedelta(seconds=ts)
+    start = datetime(moment.year, moment.month, 1)
+    end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+    return calendar.timegm(start.timetuple()), calendar.timegm(end.timetuple())
+
+
+def _rebuild(cursor: sqlite3.Cursor, granularity: str, source: str, start_ts: int, end_ts: int):
+    """Recompute the buckets of one rollup whose start lies in [start_ts, end_ts)."""
+    table = ROLLUP_TABLES[granularity]
+    if source == 'analytics_data':
+        bucket = BUCKET_SQL[granularity].format(ts='ts')
+        time_column = 'ts'
+        aggregates = ', '.join(
+            f"SUM({m}), MIN({m}), MAX({m}), SUM({m} * {m})" for m in METRICS
+        )
+        counts = "COUNT(*), MAX(ts)"
+    else:
+        bucket = BUCKET_SQL[granularity].format(ts='bucket_ts')
+        time_column = 'bucket_ts'
+        aggregates = ', '.join(
+            f"SUM({m}_sum), MIN({m}_min), MAX({m}_max), SUM({m}_sumsq)" for m in METRICS
+        )
+        counts = "SUM(row_count), MAX(last_ts)"
+
+    cursor.execute(f"DELETE FROM {table} WHERE bucket_ts >= ? AND bucket_ts < ?", (start_ts, end_ts))
+    cursor.execute(f'''
+        INSERT INTO {table} (bucket_ts, date, row_count, last_ts, {', '.join(_STAT_COLUMNS)})
+        SELECT {bucket}, datetime({bucket}, 'unixepoch'), {counts}, {aggregates}
+        FROM {source}
+        WHERE {time_column} >= ? AND {time_column} < ?
+        GROUP BY 1
+    ''', (start_ts, end_ts))
+
+
+def refresh(cursor: sqlite3.Cursor, min_ts: int, max_ts: int):
+    """
+    Bring the rollups up to date after rows in [min_ts, max_ts] were written.
+
+    Only the buckets containing that range are recomputed: days from the raw
+    rows, then weeks and months from the refreshed days. Cost is proportional
+    to the rows in the affected buckets, not to the table size, and the result
+    is exact for inserts, upserts and deletes alike.
+    """
+    day_start = min_ts - min_ts % DAY
+    day_end = max_ts - max_ts % DAY + DAY
+    _rebuild(cursor, 'day', 'analytics_data', day_start, day_end)
+
+    for granularity in ('week', 'month'):
+        start, _ = bucket_bounds(granularity, day_start)
+        _, end = bucket_bounds(granularity, day_end - DAY)
+        _rebuild(cursor, granularity, ROLLUP_TABLES['day'], start, end)
+
+
+def clear(cursor: sqlite3.Cursor):
+    for table in ROLLUP_TABLES.values():
+        cursor.execute(f"DELETE FROM {table}")
+
+
+def rebuild_all(cursor: sqlite3.Cursor):
+    """Recompute every rollup from scratch."""
+    clear(cursor)
+    cursor.execute("SELECT MIN(ts), MAX(ts) FROM analytics_data")
+    min_ts, max_ts = cursor.fetchone()
+    if min_ts is not None:
+        refresh(cursor, min_ts, max_ts)
+
+
+def bucket_start(granularity: str, ts: int) -> int:
+    """Return the start of the rollup bucket containing ts."""
+    return bucket_bounds(granularity, ts)[0]
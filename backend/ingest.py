@@ -0,0 +1,48 @@
+"""
+Load analytics data from a CSV, NDJSON or Parquet file into the database.
+
+Usage (from the backend directory):
+    python ingest.py data.csv
+    python ingest.py export.jsonl --batch-rows 50000
+    cat data.csv | python ingest.py - --format csv
+"""
+import argparse
+import sys
+
+from dotenv import load_dotenv
+
+from data import ingest, repository
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="input file, or - for standard input")
+    parser.add_argument("--format", choices=ingest.FORMATS, help="input format (default: from the file extension)")
+    parser.add_argument("--batch-rows", type=int, default=ingest.INGEST_BATCH_ROWS,
+                        help="rows per transaction")
+    args = parser.parse_args()
+
+    load_dotenv()
+    repository.initialize_database(seed_sample_data=False)
+
+    try:
+        fmt = ingest.detect_format(args.format, filename=args.path)
+        if args.path == "-":
+            result = ingest.ingest(sys.stdin.buffer, fmt, args.batch_rows)
+        else:
+            with open(args.path, "rb") as f:
+                result = ingest.ingest(f, fmt, args.batch_rows)
+    except ingest.IngestError as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+    print(f"Read {result.rows_read} rows, wrote {result.rows_written}, rejected {result.rows_rejected} "
+          f"in {result.seconds:.2f}s ({result.to_dict()['rows_per_second'] or 0} rows/sec)")
+    for error in result.errors:
+        print(f"  {error}")
+    if result.rows_rejected > len(result.errors):
+        print(f"  ... and {result.rows_rejected - len(result.errors)} more")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from agents.business_intelligence_agent import BusinessIntelligenceAgent
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_community.utilities.sql_database import SQLDatabase
 from data.mock_analytics import generate_mock_analytics_data, get_analytics_summary
+from data import repository
 import os
 from dotenv import load_dotenv
 
@@ -10,8 +11,7 @@ def init_database():
     load_dotenv()
     
     # Initialize the database
-    db_path = "sqlite:///./business_intelligence.db"
-    db = SQLDatabase.from_uri(db_path)
+    db = SQLDatabase(repository.create_engine())
     
     # Initialize the LLM (dummy instance for database initialization)
     model = ChatGoogleGenerativeAI(
@@ -1,29 +1,95 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
 import os
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-from langchain_community.agent_toolkits import SQLDatabaseToolkit
-from langchain_community.utilities.sql_database import SQLDatabase
-from langchain.agents.agent_types import AgentType
-from langchain.agents import create_sql_agent
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from data.mock_analytics import generate_mock_analytics_data, get_analytics_summary
-from agents.business_intelligence_agent import BusinessIntelligenceAgent
-import sqlite3
+from data import repository
+from services.query_limiter import QueryLimiter, QueueFullError
+from services.anomaly_notifier import AnomalyNotifier
+from services.dashboard import DashboardSnapshots
+from services.streaming_body import StreamingBody
+from services import serialization, tracing
+from cache.figure_cache import FigureCache
+import asyncio
+import json
+
+# LangChain, google.generativeai, pandas and Plotly take seconds to import, so
+# they are only imported by the code paths that need them (see get_bi_agent).
+# A worker can then answer /analytics well before the agent is ready.
 
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Build the agent in the background at startup instead of on the first /query
+PRELOAD_AGENT = os.getenv("PRELOAD_AGENT", "true").lower() in ("1", "true", "yes")
+
+# Questions accepted by one /query/batch request
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "20"))
+
+def create_llm():
+    """Build the Gemini chat model used by the agent."""
+    import google.generativeai as genai
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-pro",
+        temperature=float(os.getenv("TEMPERATURE", "0.7")),
+        max_tokens=None,
+        timeout=30,
+        max_retries=3,
+        convert_system_message_to_human=True,
+        safety_settings={
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+        }
+    )
+
+_bi_agent = None
+_bi_agent_lock = threading.Lock()
 
-app = FastAPI()
+def get_bi_agent():
+    """Return the business intelligence agent, building it on first use."""
+    global _bi_agent
+    if _bi_agent is None:
+        with _bi_agent_lock:
+            if _bi_agent is None:
+                from langchain_community.utilities.sql_database import SQLDatabase
+                from agents.business_intelligence_agent import BusinessIntelligenceAgent
+
+                # LangChain shares the repository's connection settings
+                db = SQLDatabase(repository.create_engine())
+                _bi_agent = BusinessIntelligenceAgent(llm=create_llm(), db=db)
+    return _bi_agent
+
+def preload_agent():
+    try:
+        get_bi_agent()
+    except Exception as e:
+        # The first /query retries, and reports the error to its caller
+        print(f"Error preloading agent: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tracing.configure_opentelemetry()
+    await asyncio.to_thread(repository.initialize_database)
+    anomaly_notifier.start()
+    dashboard_snapshots.start()
+    if PRELOAD_AGENT:
+        app.state.agent_preload = asyncio.create_task(asyncio.to_thread(preload_agent))
+    yield
+    await anomaly_notifier.stop()
+    await dashboard_snapshots.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -32,81 +98,66 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
-# Initialize the LLM with Gemini
-model = ChatGoogleGenerativeAI(
-    model="gemini-1.5-pro",
-    temperature=float(os.getenv("TEMPERATURE", "0.7")),
-    max_tokens=None,
-    timeout=30,
-    max_retries=3,
-    convert_system_message_to_human=True,
-    safety_settings={
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-    }
-)
+# Outermost, so request durations include the CORS handling
+app.add_middleware(tracing.TracingMiddleware)
 
-# Initialize SQLite database
-db_path = "sqlite:///./business_intelligence.db"
-db = SQLDatabase.from_uri(db_path)
-
-# Initialize the business intelligence agent
-bi_agent = BusinessIntelligenceAgent(llm=model, db=db)
-
-# Create custom prompt template with improved instructions
-CUSTOM_PROMPT = PromptTemplate(
-    input_variables=["input", "table_info", "top_k"],
-    template="""
-    You are a helpful business intelligence assistant. Your task is to help users understand their business data.
-    
-    Available tables and their schemas:
-    {table_info}
-    
-    Use the following format:
-    
-    Question: the input question
-    Thought: you should always think about what to do
-    Action: sql_db_query
-    Action Input: the SQL query to execute
-    Observation: the result of the action
-    Thought: I now know the final answer
-    Final Answer: the final answer to the original input question
-    
-    Begin!
-    
-    Question: {input}
-    Thought: Let me analyze the business data to answer this question.
-    Action: sql_db_query
-    Action Input: SELECT AVG(session_duration) FROM analytics_data
-    Observation: {table_info}
-    Thought: I now have the data to answer the question.
-    Final Answer: Based on the data, the average session duration is [result] minutes.
-    """
-)
+# Bound concurrent /query pipelines so a burst of questions cannot exhaust the server
+query_limiter = QueryLimiter.from_env()
 
-# Create SQL agent with custom prompt and improved error handling
-agent = create_sql_agent(
-    llm=model,
-    toolkit=SQLDatabaseToolkit(db=db, llm=model),
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-    verbose=True,
-    handle_parsing_errors=True,
-    prompt=CUSTOM_PROMPT,
-    max_iterations=3
-)
+# Pushes anomalies in newly written rows to /ws/anomalies subscribers
+anomaly_notifier = AnomalyNotifier.from_env()
+
+# Serialized /charts figures, reused until analytics_data changes
+figure_cache = FigureCache.from_env()
+
+# The /dashboard snapshot, rebuilt in the background when analytics_data changes
+dashboard_snapshots = DashboardSnapshots.from_env()
 
 class Query(BaseModel):
     text: str
     language: Optional[str] = "en"
 
+class BatchQuery(BaseModel):
+    questions: List[str]
+
 class AnalyticsQuery(BaseModel):
-    days: Optional[int] = 30
-    format: Optional[str] = "json"
+    days: int = 30
+    start: Optional[str] = None
+    end: Optional[str] = None
+    granularity: Optional[str] = None
+    max_points: int = 500
+    format: str = "json"
+
+def resolve_range(query: AnalyticsQuery) -> tuple:
+    """Validate the range of an AnalyticsQuery and return (start_ts, end_ts, granularity)."""
+    if query.granularity is not None and query.granularity not in repository.GRANULARITY_SECONDS:
+        raise ValueError(f"granularity must be one of {', '.join(repository.GRANULARITY_SECONDS)}")
+    if query.max_points < 1:
+        raise ValueError("max_points must be positive")
+
+    if query.end is not None:
+        end_ts = repository.to_timestamp(query.end)
+    else:
+        latest = repository.latest_timestamp()
+        end_ts = latest + 1 if latest is not None else 0
+    start_ts = repository.to_timestamp(query.start) if query.start is not None else end_ts - query.days * 86400
+
+    return start_ts, end_ts, repository.choose_granularity(start_ts, end_ts, query.max_points, query.granularity)
+
+def analytics_query(
+    days: int = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: Optional[str] = None,
+    max_points: int = 500,
+    format: str = "json"
+) -> AnalyticsQuery:
+    """Read AnalyticsQuery from the /analytics query string."""
+    return AnalyticsQuery(days=days, start=start, end=end, granularity=granularity,
+                          max_points=max_points, format=format)
 
 class QueryResponse(BaseModel):
     success: bool
@@ -118,8 +169,15 @@ class QueryResponse(BaseModel):
 async def process_query(query: Query):
     """Process a natural language query and return insights."""
     try:
-        response = bi_agent.process_query(query.text)
+        response = await query_limiter.run(get_bi_agent().aprocess_query(query.text))
         return {"response": response}
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Query did not complete within {query_limiter.timeout:g} seconds"
+        )
     except Exception as e:
         print(f"Error in /query endpoint: {str(e)}")
         raise HTTPException(
@@ -127,30 +185,100 @@ async def process_query(query: Query):
             detail=f"Error processing query: {str(e)}"
         )
 
+@app.post("/query/batch")
+async def process_query_batch(batch: BatchQuery):
+    """
+    Answer several questions with one SQL generation and one narration LLM call.
+
+    Returns a result per question, in order, each with its ``sql`` and either
+    a ``response`` or an ``error``; one question failing does not fail the rest.
+    """
+    if not batch.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(batch.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    try:
+        results = await query_limiter.run(get_bi_agent().abatch_query(batch.questions))
+        return {"results": results}
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Batch did not complete within {query_limiter.timeout:g} seconds"
+        )
+    except Exception as e:
+        print(f"Error in /query/batch endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch: {str(e)}"
+        )
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def stream_query(query: Query):
+    """
+    Process a natural language query, streaming progress as Server-Sent Events.
+
+    Emits ``sql``, ``rows``, ``token`` (repeated) and ``done`` events, or an
+    ``error`` event. /query remains available as the buffered variant.
+    """
+    if query_limiter.saturated:
+        raise HTTPException(status_code=429, detail="Too many queries in progress", headers={"Retry-After": "1"})
+
+    async def event_stream():
+        try:
+            async for event in query_limiter.stream(get_bi_agent().astream_query(query.text)):
+                yield _sse(event["event"], event["data"])
+        except QueueFullError as e:
+            yield _sse("error", {"error": str(e)})
+        except asyncio.TimeoutError:
+            yield _sse("error", {"error": f"Query did not complete within {query_limiter.timeout:g} seconds"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/analytics")
-async def get_analytics(days: int = 30):
-    """Get analytics data for the specified number of days."""
+async def get_analytics(
+    query: AnalyticsQuery = Depends(analytics_query),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Get analytics data for a time range, aggregated into at most ``max_points`` buckets.
+
+    The range is [start, end); by default it covers the ``days`` days up to the
+    newest row. ``granularity`` (hour, day, week or month) sets the finest
+    bucket size; when omitted, or when it would exceed ``max_points``, the
+    finest granularity that fits is used.
+
+    ``format`` selects the layout of ``data``: ``json`` (one object per
+    bucket), ``columnar`` (one array per column) or ``arrow`` (an Arrow IPC
+    stream with granularity/start/end in the schema metadata). Bodies are
+    gzip or brotli compressed when the client accepts it.
+    """
+    def build() -> Response:
+        start_ts, end_ts, chosen = resolve_range(query)
+        columns, rows = repository.fetch_series_rows(start_ts, end_ts, chosen)
+
+        with tracing.span("serialization", format=query.format, rows=len(rows)):
+            body, media_type = serialization.encode_table(columns, rows, query.format, {
+                "granularity": chosen,
+                "start": repository.format_timestamp(start_ts),
+                "end": repository.format_timestamp(end_ts)
+            })
+            return serialization.compressed_response(body, media_type, accept_encoding)
+
     try:
-        # Connect to SQLite database
-        conn = sqlite3.connect('business_intelligence.db')
-        cursor = conn.cursor()
-        
-        # Get data for the last N days
-        cursor.execute('''
-            SELECT date, page_views, unique_visitors, session_duration, bounce_rate, conversion_rate
-            FROM analytics_data
-            ORDER BY date DESC
-            LIMIT ?
-        ''', (days,))
-        
-        columns = [description[0] for description in cursor.description]
-        data = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        return {
-            "success": True,
-            "data": data,
-            "error": None
-        }
+        if query.format not in serialization.FORMATS:
+            raise ValueError(f"format must be one of {', '.join(serialization.FORMATS)}")
+        # The query, serialization and compression block; keep them off the event loop
+        return await asyncio.to_thread(build)
     except Exception as e:
         print(f"Error in /analytics endpoint: {str(e)}")
         return {
@@ -158,13 +286,12 @@ async def get_analytics(days: int = 30):
             "data": None,
             "error": str(e)
         }
-    finally:
-        conn.close()
 
 @app.get("/analytics/summary")
 async def get_analytics_summary():
     try:
-        summary = get_analytics_summary()
+        from data import mock_analytics
+        summary = await asyncio.to_thread(mock_analytics.get_analytics_summary)
         return {
             "success": True,
             "summary": summary,
@@ -177,6 +304,241 @@ async def get_analytics_summary():
             "error": str(e)
         }
 
+@app.get("/dashboard")
+async def get_dashboard(
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Everything the dashboard shows in one precomputed snapshot: the last
+    DASHBOARD_DAYS days of /analytics, the /analytics/summary averages, and
+    each metric's trend direction and anomaly markers.
+
+    The snapshot is rebuilt in the background only when analytics_data
+    changes. Responses carry an ETag; a request whose If-None-Match names
+    the current snapshot is answered 304 without a body.
+    """
+    try:
+        snapshot = await dashboard_snapshots.current()
+    except Exception as e:
+        print(f"Error in /dashboard endpoint: {str(e)}")
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+    headers = {"ETag": snapshot.etag, "Cache-Control": dashboard_snapshots.cache_control, "Vary": "Accept-Encoding"}
+    if snapshot.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    body, encoding = snapshot.body_for(accept_encoding)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/charts/{chart}")
+async def get_chart(
+    chart: str,
+    metrics: Optional[str] = None,
+    query: AnalyticsQuery = Depends(analytics_query),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """
+    Get a Plotly figure for analytics data, bucketed as in /analytics.
+
+    ``chart`` is one of plotly_charts.CHART_TYPES and ``metrics`` a comma-separated list of
+    analytics_data columns (all of them by default); time_series and
+    distribution plot the first one. Figures are served from figure_cache
+    while the data version and range are unchanged.
+    """
+    try:
+        from visualization import plotly_charts
+
+        if chart not in plotly_charts.CHART_TYPES:
+            raise ValueError(f"chart must be one of {', '.join(plotly_charts.CHART_TYPES)}")
+        chosen_metrics = [m.strip() for m in metrics.split(',') if m.strip()] if metrics else list(repository.METRIC_COLUMNS)
+        unknown = [m for m in chosen_metrics if m not in repository.METRIC_COLUMNS]
+        if unknown or not chosen_metrics:
+            raise ValueError(f"metrics must be among {', '.join(repository.METRIC_COLUMNS)}")
+        if chart in ('time_series', 'distribution'):
+            chosen_metrics = chosen_metrics[:1]
+
+        def build() -> Response:
+            range_key = resolve_range(query)
+
+            def serialize() -> bytes:
+                import pandas as pd
+                columns, rows = repository.fetch_series_rows(*range_key)
+                frame = pd.DataFrame.from_records(rows, columns=columns)
+                with tracing.span("figure_build", chart=chart, rows=len(rows)):
+                    return plotly_charts.figure_to_json(plotly_charts.build_chart(chart, frame, chosen_metrics))
+
+            # The database id keeps a shared cache from serving figures of a recreated database
+            data_version = (repository.database_id(), repository.data_version())
+            figure = figure_cache.get_or_build(chart, chosen_metrics, data_version, range_key, serialize)
+            with tracing.span("serialization"):
+                body = b'{"success":true,"figure":' + figure + b',"error":null}'
+                return serialization.compressed_response(body, "application/json", accept_encoding)
+
+        # Reads, figure building and compression block; keep them off the event loop
+        return await asyncio.to_thread(build)
+    except Exception as e:
+        print(f"Error in /charts endpoint: {str(e)}")
+        return {
+            "success": False,
+            "figure": None,
+            "error": str(e)
+        }
+
+@app.post("/ingest")
+async def ingest_data(request: Request, format: Optional[str] = None, filename: Optional[str] = None):
+    """
+    Load analytics rows from the raw request body as CSV, NDJSON or Parquet.
+
+    The format comes from ``format``, the Content-Type header or the extension
+    of ``filename``. The body is parsed while it uploads and written in
+    batched transactions; rows whose timestamp already exists are updated.
+    """
+    from data import ingest
+
+    try:
+        fmt = ingest.detect_format(format, request.headers.get("content-type"), filename)
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    body = StreamingBody()
+
+    def run():
+        try:
+            return ingest.ingest(body, fmt)
+        finally:
+            body.abandon()
+
+    worker = asyncio.create_task(asyncio.to_thread(run))
+    await body.pump(request.stream())
+    try:
+        result = await worker
+    except ingest.IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Error in /ingest endpoint: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error ingesting data: {str(e)}")
+    finally:
+        anomaly_notifier.wake()
+        dashboard_snapshots.wake()
+
+    return {"success": True, **result.to_dict(), "error": None}
+
+@app.websocket("/ws/anomalies")
+async def anomaly_feed(websocket: WebSocket, metrics: Optional[str] = None):
+    """
+    Push an alert for every newly written row whose rolling z-score exceeds the threshold.
+
+    ``metrics`` optionally limits the feed to a comma-separated list of metric
+    columns. Each message is a JSON object with ``metric``, ``ts``, ``date``,
+    ``value``, ``zscore`` and ``threshold``.
+    """
+    await websocket.accept()
+    queue = anomaly_notifier.subscribe(metrics.split(",") if metrics else None)
+
+    async def drain():
+        # Only here to notice the client disconnecting
+        while True:
+            await websocket.receive_text()
+
+    receiver = asyncio.create_task(drain())
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                getter.cancel()
+                break
+            await websocket.send_text(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        anomaly_notifier.unsubscribe(queue)
+
+def collect_service_metrics() -> list:
+    """Cache and limiter statistics for /metrics; the agent's caches are reported once it is built."""
+    caches = {"figures": figure_cache.stats()}
+    if _bi_agent is not None:
+        caches["queries"] = _bi_agent.query_cache.stats()
+        caches["answers"] = _bi_agent.answer_cache.stats()
+    limiter = query_limiter.stats()
+    return [
+        ("bi_cache_hits_total", "counter", "Cache hits in this process.",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("bi_cache_misses_total", "counter", "Cache misses in this process.",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("bi_cache_hit_ratio", "gauge", "Hits over lookups since the process started.",
+         [({"cache": name}, stats["hit_rate"]) for name, stats in caches.items()]),
+        ("bi_cache_entries", "gauge", "Entries held by each cache.",
+         [({"cache": name}, stats["size"]) for name, stats in caches.items()]),
+        ("bi_queries_running", "gauge", "/query pipelines currently running.", [({}, limiter["running"])]),
+        ("bi_queries_waiting", "gauge", "/query pipelines waiting for a slot.", [({}, limiter["waiting"])]),
+        ("bi_queries_rejected_total", "counter", "/query requests rejected because the queue was full.",
+         [({}, limiter["rejected"])]),
+        ("bi_queries_timed_out_total", "counter", "/query pipelines that exceeded the limiter timeout.",
+         [({}, limiter["timed_out"])]),
+    ]
+
+tracing.REGISTRY.collector(collect_service_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker: request and span latencies, LLM tokens, SQL rows and cache hit rates."""
+    return Response(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Report hit/miss statistics for the question-to-SQL and answer caches."""
+    def collect() -> Dict[str, Any]:
+        # The first call builds the agent, and shared caches count their entries in SQLite
+        agent = get_bi_agent()
+        return {
+            "success": True,
+            "query_cache": agent.query_cache.stats(),
+            "answer_cache": agent.answer_cache.stats(),
+            "figure_cache": figure_cache.stats(),
+            "query_limiter": query_limiter.stats(),
+            "sql_guard": agent.sql_guard.stats(),
+            "anomaly_notifier": anomaly_notifier.stats(),
+            "dashboard": dashboard_snapshots.stats(),
+            "error": None
+        }
+
+    return await asyncio.to_thread(collect)
+
+def run_workers(host: str, port: int, workers: int):
+    """
+    Serve main:app from ``workers`` processes sharing one listening socket.
+
+    Equivalent to uvicorn.run(..., workers=workers), except that the socket
+    is created with proto=IPPROTO_TCP: asyncio only enables TCP_NODELAY on
+    connections accepted from such a socket, and without it every response
+    stalls for ~40 ms on delayed ACKs.
+    """
+    import socket
+    from uvicorn import Config, Server
+    from uvicorn.supervisors import Multiprocess
+
+    # Worker processes share the caches through SQLite instead of each keeping its own
+    os.environ.setdefault("CACHE_BACKEND", "sqlite")
+    config = Config("main:app", host=host, port=port, workers=workers)
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    Multiprocess(config, target=Server(config).run, sockets=[sock]).run()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", "8000"))
+    workers = int(os.getenv("WORKERS", "1"))
+    if workers > 1:
+        run_workers(host, port, workers)
+    else:
+        uvicorn.run(app, host=host, port=port) 
\ No newline at end of file
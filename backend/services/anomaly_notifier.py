@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from analysis.online_stats import ANOMALY_THRESHOLD, RollingWindow
+from data import repository
+
+# Rows evaluated per vectorized batch when catching up after a bulk write
+BATCH_ROWS = 100_000
+
+
+class AnomalyNotifier:
+    """
+    Pushes anomalies in newly written analytics_data rows to subscribers.
+
+    A background task polls the data version every ``poll_interval`` seconds
+    (or immediately after wake()). When it changes, rows appended since the
+    last check are scored against the rolling window of the rows before them
+    (analysis.online_stats.RollingWindow, primed from the persisted metric
+    state) and every row beyond ``threshold`` standard deviations is published.
+
+    Each subscriber is just a bounded queue of serialized alerts, so thousands
+    of idle WebSocket connections cost a queue each and no polling of their
+    own. A subscriber that falls behind loses its oldest alerts rather than
+    slowing the others down.
+    """
+
+    def __init__(self, poll_interval: float = 0.25, threshold: float = ANOMALY_THRESHOLD,
+                 queue_size: int = 100):
+        self.poll_interval = poll_interval
+        self.threshold = threshold
+        self.queue_size = queue_size
+        self._subscribers: Dict[asyncio.Queue, Optional[set]] = {}
+        self._windows: Optional[Dict[str, RollingWindow]] = None
+        self._last_ts: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "AnomalyNotifier":
+        """Build a notifier configured through ANOMALY_* environment variables."""
+        return cls(
+            poll_interval=float(os.getenv("ANOMALY_POLL_INTERVAL", "0.25")),
+            threshold=float(os.getenv("ANOMALY_THRESHOLD", str(ANOMALY_THRESHOLD))),
+            queue_size=int(os.getenv("ANOMALY_SUBSCRIBER_QUEUE", "100")),
+        )
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Check for new rows now instead of at the next poll, e.g. right after a write."""
+        self._wake.set()
+
+    def subscribe(self, metrics: Optional[Iterable[str]] = None) -> asyncio.Queue:
+        """Register a subscriber, optionally limited to ``metrics``, and return its alert queue."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = set(metrics) if metrics else None
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.pop(queue, None)
+
+    def publish(self, alert: Dict[str, Any]):
+        """Serialize ``alert`` once and queue it for every interested subscriber."""
+        message = json.dumps(alert)
+        for queue, metrics in self._subscribers.items():
+            if metrics is not None and alert["metric"] not in metrics:
+                continue
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(message)
+        self.published += 1
+
+    def _prime(self):
+        """Start from the persisted rolling windows, which cover every row up to their last_ts."""
+        states = repository.fetch_metric_states()
+        self._windows = {
+            metric: RollingWindow(state.window.size, state.window.values.tolist())
+            for metric, state in states.items()
+        }
+        self._last_ts = max((s.last_ts for s in states.values() if s.last_ts is not None), default=None)
+
+    def _evaluate(self, matrix: np.ndarray) -> List[Dict[str, Any]]:
+        alerts = []
+        for i, metric in enumerate(repository.METRIC_COLUMNS):
+            window = self._windows.get(metric)
+            if window is None:
+                continue
+            values = matrix[:, i + 1]
+            present = ~np.isnan(values)
+            timestamps, values = matrix[present, 0], values[present]
+            zscores = window.zscores(values)
+            for j in np.flatnonzero(np.abs(zscores) > self.threshold):
+                ts = int(timestamps[j])
+                alerts.append({
+                    "metric": metric,
+                    "ts": ts,
+                    "date": repository.format_timestamp(ts),
+                    "value": float(values[j]),
+                    "zscore": round(float(zscores[j]), 3),
+                    "threshold": self.threshold,
+                })
+            window.update(values)
+        return alerts
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """Score rows written since the last call and return the anomalies, oldest first."""
+        version = repository.data_version()
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        latest = repository.latest_timestamp()
+        if self._windows is None or latest is None or (self._last_ts is not None and latest < self._last_ts):
+            # First run, or rows were deleted: nothing new to score
+            self._prime()
+            return []
+
+        alerts = []
+        while True:
+            rows = repository.fetch_rows_after(self._last_ts, BATCH_ROWS)
+            if not rows:
+                break
+            matrix = np.array(rows, dtype=np.float64)
+            alerts.extend(self._evaluate(matrix))
+            self._last_ts = rows[-1][0]
+            if len(rows) < BATCH_ROWS:
+                break
+        alerts.sort(key=lambda alert: alert["ts"])
+        return alerts
+
+    async def _run(self):
+        while True:
+            try:
+                alerts = await asyncio.to_thread(self.poll)
+                # Subscribers keep at most queue_size alerts, so older ones would be dropped anyway
+                for alert in alerts[-self.queue_size:]:
+                    self.publish(alert)
+            except Exception as e:
+                print(f"Error in anomaly notifier: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "last_ts": self._last_ts,
+            "poll_interval": self.poll_interval,
+            "threshold": self.threshold,
+        }
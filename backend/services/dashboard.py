@@ -0,0 +1,194 @@
+"""
+Precomputed snapshot served by /dashboard.
+
+The dashboard used to request /analytics?days=30 and /analytics/summary on
+every mount, each a SQLite query. DashboardSnapshots builds one JSON body
+holding both, plus every metric's trend direction and anomaly markers from
+the persisted online statistics (what BusinessIntelligenceAgent's
+analyze_trends and detect_anomalies report), and rebuilds it in a
+background task only when the data version changes.
+
+Each snapshot is serialized and compressed once, with a weak ETag derived
+from its content, so a view costs a lookup of the negotiated encoding and a
+client revalidating with If-None-Match gets a bodyless 304. Snapshots depend
+only on the data, so every worker builds the same ETag for the same data.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from data import repository, rollups
+from services import serialization, tracing
+
+
+class Snapshot(NamedTuple):
+    data_version: int
+    etag: str
+    # Content-Encoding (None for identity) -> body
+    bodies: Dict[Optional[str], bytes]
+
+    def body_for(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """Return the body in the best encoding the client accepts, and that encoding."""
+        encoding = serialization.negotiate_encoding(accept_encoding)
+        if encoding not in self.bodies:
+            encoding = None
+        return self.bodies[encoding], encoding
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Whether an If-None-Match header names this snapshot (weak comparison)."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or self.etag[2:] in (tag[2:] if tag.startswith('W/') else tag for tag in tags)
+
+
+class DashboardSnapshots:
+    """
+    Keeps the /dashboard snapshot current.
+
+    A background task checks the data version every ``poll_interval``
+    seconds (or immediately after wake()) and rebuilds the snapshot when it
+    changed. The series covers the ``days`` days up to the newest row in at
+    most ``max_points`` buckets, as /analytics does by default. Responses
+    may be reused by clients for ``max_age`` seconds before revalidating.
+    """
+
+    def __init__(self, days: int = 30, max_points: int = 500, poll_interval: float = 1.0, max_age: int = 5):
+        self.days = days
+        self.max_points = max_points
+        self.poll_interval = poll_interval
+        self.max_age = max_age
+        self._snapshot: Optional[Snapshot] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # The refresher and a request arriving before the first snapshot must not both build it
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    @classmethod
+    def from_env(cls) -> "DashboardSnapshots":
+        """Build a refresher configured through DASHBOARD_* environment variables."""
+        return cls(
+            days=int(os.getenv("DASHBOARD_DAYS", "30")),
+            max_points=int(os.getenv("DASHBOARD_MAX_POINTS", "500")),
+            poll_interval=float(os.getenv("DASHBOARD_POLL_INTERVAL", "1.0")),
+            max_age=int(os.getenv("DASHBOARD_MAX_AGE", "5")),
+        )
+
+    @property
+    def cache_control(self) -> str:
+        return f"max-age={self.max_age}, must-revalidate" if self.max_age > 0 else "no-cache"
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Check the data version now instead of at the next poll, e.g. right after a write."""
+        self._wake.set()
+
+    def build(self) -> Dict[str, Any]:
+        """Read the series, summary, trends and anomalies that make up a snapshot."""
+        latest = repository.latest_timestamp()
+        end_ts = latest + 1 if latest is not None else 0
+        start_ts = end_ts - self.days * 86400
+        granularity = repository.choose_granularity(start_ts, end_ts, self.max_points)
+        columns, rows = repository.fetch_series_rows(start_ts, end_ts, granularity)
+        series = [dict(zip(columns, row)) for row in rows]
+
+        summary = repository.fetch_summary()
+        states = repository.fetch_metric_states()
+
+        # Anomalies are per raw row; markers place them on the series bucket containing them
+        dates = [point["date"] for point in series]
+        start_date, end_date = repository.format_timestamp(start_ts), repository.format_timestamp(end_ts)
+        anomalies = {}
+        for metric, state in states.items():
+            markers = []
+            for ts, value, zscore in state.anomalies:
+                date = repository.format_timestamp(ts)
+                bucket = bisect_right(dates, date) - 1
+                if start_date <= date < end_date and bucket >= 0:
+                    markers.append({"ts": ts, "date": date, "bucket": dates[bucket],
+                                    "value": value, "zscore": round(zscore, 3)})
+            anomalies[metric] = markers
+
+        return {
+            "success": True,
+            "series": {"granularity": granularity, "start": start_date, "end": end_date, "data": series},
+            "summary": {
+                **{f"average_{metric}": mean for metric, mean in zip(rollups.METRICS, summary)},
+                "last_update": summary[-1],
+            },
+            "trends": {
+                metric: {"direction": state.trend_direction, "slope": state.regression.slope}
+                for metric, state in states.items()
+            },
+            "anomalies": anomalies,
+            "error": None,
+        }
+
+    def refresh(self) -> Snapshot:
+        """Rebuild the snapshot if the data changed since the last build, and return it."""
+        with self._lock:
+            # Read before building: a write during the build leaves the snapshot
+            # marked with the older version, so the next check rebuilds it
+            version = repository.data_version()
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.data_version == version:
+                return snapshot
+
+            with tracing.span("dashboard_build", data_version=version) as span:
+                body = serialization.encode_json(self.build())
+                bodies = {None: body}
+                if len(body) >= serialization.COMPRESSION_MIN_BYTES:
+                    for encoding in serialization.available_encodings():
+                        bodies[encoding] = serialization.compress(body, encoding)
+                span["bytes"] = len(body)
+            snapshot = self._snapshot = Snapshot(
+                version, f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"', bodies
+            )
+            self.builds += 1
+            return snapshot
+
+    async def current(self) -> Snapshot:
+        """The latest snapshot, built now if none exists yet."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = await asyncio.to_thread(self.refresh)
+        return snapshot
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Error refreshing dashboard snapshot: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        stats = {"builds": self.builds, "poll_interval": self.poll_interval, "max_age": self.max_age}
+        if snapshot is not None:
+            stats.update(
+                data_version=snapshot.data_version,
+                etag=snapshot.etag,
+                bytes={encoding or "identity": len(body) for encoding, body in snapshot.bodies.items()},
+            )
+        return stats
@@ -0,0 +1,107 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Dict
+
+
+class QueueFullError(Exception):
+    """Raised when too many queries are already running or waiting."""
+
+
+class QueryLimiter:
+    """
+    Bounds how many /query pipelines run at once.
+
+    At most ``max_concurrency`` queries execute concurrently and at most
+    ``max_queue`` more wait for a slot; anything beyond that is rejected
+    immediately with QueueFullError so the caller can answer 429 instead of
+    piling up work. Each query is cancelled after ``timeout`` seconds.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32, timeout: float = 60):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls) -> "QueryLimiter":
+        """Build a limiter configured through QUERY_* environment variables."""
+        return cls(
+            max_concurrency=int(os.getenv("QUERY_MAX_CONCURRENCY", "8")),
+            max_queue=int(os.getenv("QUERY_MAX_QUEUE", "32")),
+            timeout=float(os.getenv("QUERY_TIMEOUT", "60")),
+        )
+
+    @property
+    def saturated(self) -> bool:
+        """True when a new query would be rejected."""
+        return self._semaphore.locked() and self.waiting >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot for the duration of the block."""
+        if self.saturated:
+            self.rejected += 1
+            raise QueueFullError(
+                f"Too many queries in progress ({self.running} running, {self.waiting} waiting)"
+            )
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine inside a slot; the timeout covers queueing and execution."""
+        async def guarded():
+            async with self.slot():
+                return await coro
+
+        try:
+            return await asyncio.wait_for(guarded(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            # No-op if the coroutine ran; avoids a never-awaited warning if it was rejected.
+            coro.close()
+
+    async def stream(self, agen: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Iterate an async generator inside a slot; the timeout covers the whole stream."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            async with self.slot():
+                while True:
+                    try:
+                        item = await asyncio.wait_for(agen.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        return
+                    yield item
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            await agen.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "running": self.running,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
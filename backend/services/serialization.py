@@ -0,0 +1,116 @@
+"""
+Response encodings for large tabular payloads.
+
+Rows fetched from SQLite are encoded straight to bytes, skipping FastAPI's
+per-value jsonable_encoder pass, in one of three layouts:
+
+- ``json``: a list of objects, one per row (the original /analytics shape)
+- ``columnar``: one array per column, so keys are not repeated per row
+- ``arrow``: an Apache Arrow IPC stream, for clients that can read it
+  directly into typed columns
+
+Bodies above COMPRESSION_MIN_BYTES are compressed with brotli or gzip,
+negotiated from the client's Accept-Encoding.
+"""
+import gzip
+import io
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATS = ('json', 'columnar', 'arrow')
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = available_encodings()
+    wildcard = accepted.get('*', 0.0)
+    best = max(candidates, key=lambda name: accepted.get(name, wildcard), default=None)
+    return best if best and accepted.get(best, wildcard) > 0 else None
+
+
+def available_encodings() -> List[str]:
+    """Content encodings compress() supports in this environment."""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress ``body`` with ``br`` or ``gzip``."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+def compressed_response(body: bytes, media_type: str, accept_encoding: Optional[str] = None,
+                        headers: Optional[Dict[str, str]] = None) -> Response:
+    """Build a Response, compressing ``body`` if it is large enough and the client accepts it."""
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept-Encoding"
+    encoding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESSION_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def encode_json(payload: Dict[str, Any]) -> bytes:
+    return json.dumps(payload, separators=(',', ':'), default=str).encode()
+
+
+def columns_of(columns: Sequence[str], rows: List[tuple]) -> Dict[str, list]:
+    """Transpose rows into one list per column."""
+    if not rows:
+        return {column: [] for column in columns}
+    return {column: list(values) for column, values in zip(columns, zip(*rows))}
+
+
+def encode_arrow(columns: Sequence[str], rows: List[tuple], metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """Encode rows as an Arrow IPC stream; ``metadata`` goes into the schema metadata."""
+    import pyarrow as pa
+    table = pa.table({column: pa.array(values) for column, values in columns_of(columns, rows).items()})
+    if metadata:
+        table = table.replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def encode_table(columns: Sequence[str], rows: List[tuple], fmt: str,
+                 metadata: Dict[str, Any]) -> tuple:
+    """
+    Encode a result table in ``fmt`` and return (body, media_type).
+
+    For the JSON layouts ``metadata`` is merged into the response object next
+    to ``data``; for Arrow it is stored in the schema metadata.
+    """
+    if fmt == 'arrow':
+        return encode_arrow(columns, rows, metadata), ARROW_MEDIA_TYPE
+    if fmt == 'columnar':
+        data = columns_of(columns, rows)
+    else:
+        data = [dict(zip(columns, row)) for row in rows]
+    return encode_json({"success": True, "data": data, **metadata, "error": None}), "application/json"
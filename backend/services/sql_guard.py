@@ -0,0 +1,311 @@
+"""
+Checks LLM-generated SQL before and while it runs.
+
+Generated SQL is untrusted: a write, an unbounded ``SELECT *`` or a cross
+join over a large analytics_data can damage data, pin a worker or return
+megabytes that would then be pasted into the narration prompt. SQLGuard
+runs every generated statement through these stages:
+
+1. a lexical check accepting exactly one SELECT (or WITH ... SELECT)
+   statement: no write, DDL or PRAGMA/ATTACH verb where a statement can
+   start (a column may still be called ``set``), no file-reading function,
+   and tables referenced only by the names of the analytics tables or of
+   the statement's own CTEs, so neither sqlite_master, pragma_* functions
+   nor files (DuckDB reads ``FROM 'data.csv'`` as the file) can be read
+2. a LIMIT appended when the statement has none at the top level
+3. on SQLite, EXPLAIN QUERY PLAN, refusing plans that scan every row of a
+   table larger than ``max_scan_rows``
+4. execution with a statement timeout (SQLite progress handler, DuckDB
+   interrupt) and at most ``max_rows`` rows fetched
+
+SQLite additionally denies anything but reads through an authorizer (see
+repository.execute_query), and DuckDB runs with external access disabled
+(see columnar.ColumnarStore), so the lexical check is not the only barrier.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from data import rollups
+from services import tracing
+
+# Keywords that only appear in statements that change data, schema or settings
+WRITE_KEYWORDS = frozenset('''
+    INSERT UPDATE DELETE REPLACE UPSERT MERGE DROP ALTER CREATE ATTACH DETACH PRAGMA VACUUM REINDEX
+    ANALYZE TRUNCATE COPY EXPORT IMPORT INSTALL LOAD SET RESET CALL GRANT REVOKE BEGIN COMMIT ROLLBACK
+    SAVEPOINT RELEASE CHECKPOINT
+'''.split())
+
+# The tables generated SQL may read, as described in the agent's schema prompt
+QUERY_TABLES = frozenset(('analytics_data',) + tuple(rollups.ROLLUP_TABLES.values()))
+
+# Functions reading or writing files or loading code (DuckDB table functions, SQLite extensions)
+FILE_FUNCTIONS = re.compile(r'^(read_\w+|\w+_scan|glob|sniff_csv|parquet_\w+|load_extension|readfile|writefile)$', re.I)
+
+# Words ending the table list of a FROM clause
+CLAUSE_KEYWORDS = frozenset('''
+    WHERE GROUP HAVING ORDER LIMIT OFFSET UNION INTERSECT EXCEPT WINDOW ON USING JOIN INNER LEFT RIGHT
+    FULL CROSS OUTER NATURAL AS SELECT FROM QUALIFY
+'''.split())
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<symbol>.)
+''', re.S | re.X)
+
+
+class QueryRefusedError(Exception):
+    """Raised for generated SQL that must not run, or that ran past the statement timeout."""
+
+
+class GuardedResult(NamedTuple):
+    columns: List[str]
+    rows: List[tuple]
+    # True when the query returned more than max_rows rows and only those were kept
+    truncated: bool
+
+
+def _tokens(sql: str) -> List[Tuple[str, str, int]]:
+    """Split SQL into (kind, text, end offset) tokens, dropping whitespace and comments."""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind, text = match.lastgroup, match.group()
+        if kind in ('space', 'comment'):
+            continue
+        if kind == 'symbol' and (text in ('\'', '"', '`', '[') or sql.startswith('/*', match.start())):
+            raise ValueError("unterminated string, identifier or comment")
+        tokens.append((kind, text, match.end()))
+    return tokens
+
+
+def _is_name(token: Tuple[str, str, int]) -> bool:
+    return token[0] == 'quoted' or (token[0] == 'word' and token[1].upper() not in CLAUSE_KEYWORDS)
+
+
+def _identifier(token: Tuple[str, str, int]) -> str:
+    kind, text, _ = token
+    return text[1:-1] if kind == 'quoted' else text
+
+
+def _is_file_reference(token: Tuple[str, str, int]) -> bool:
+    """A table reference DuckDB would resolve to a file: a string literal, or a quoted path."""
+    kind, text, _ = token
+    return kind == 'string' or (kind == 'quoted' and any(c in text[1:-1] for c in './\\:'))
+
+
+def _cte_names(tokens: List[Tuple[str, str, int]]) -> frozenset:
+    """Lowercased names defined by ``name [(columns)] AS [[NOT] MATERIALIZED] (`` in a WITH clause."""
+    names = set()
+    for i, token in enumerate(tokens):
+        if not _is_name(token):
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j][1] == '(':
+            while j < len(tokens) and tokens[j][1] != ')':
+                j += 1
+            j += 1
+        if j >= len(tokens) or tokens[j][1].upper() != 'AS':
+            continue
+        j += 1
+        while j < len(tokens) and tokens[j][1].upper() in ('NOT', 'MATERIALIZED'):
+            j += 1
+        if j < len(tokens) and tokens[j][1] == '(':
+            names.add(_identifier(token).lower())
+    return frozenset(names)
+
+
+def _table_reference(tokens: List[Tuple[str, str, int]], i: int, tables: Dict[str, str]):
+    """Record the table named at tokens[i], and its alias, in ``tables``."""
+    if i >= len(tokens) or not _is_name(tokens[i]):
+        return
+    table = _identifier(tokens[i])
+    alias = i + 1
+    if alias < len(tokens) and tokens[alias][1].upper() == 'AS':
+        alias += 1
+    tables[_identifier(tokens[alias]) if alias < len(tokens) and _is_name(tokens[alias]) else table] = table
+
+
+class SQLGuard:
+    def __init__(self, max_rows: int = 1000, max_scan_rows: int = 1_000_000, timeout: Optional[float] = 10,
+                 tables: frozenset = QUERY_TABLES):
+        self.max_rows = max_rows
+        self.max_scan_rows = max_scan_rows
+        self.timeout = timeout
+        self.tables = tables
+        self.refused: Dict[str, int] = {}
+        self._row_counts: Optional[Tuple[Any, Dict[str, int]]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SQLGuard":
+        """Build a guard configured through SQL_* environment variables; 0 disables a limit."""
+        timeout = float(os.getenv("SQL_TIMEOUT", "10"))
+        return cls(
+            max_rows=int(os.getenv("SQL_MAX_ROWS", "1000")),
+            max_scan_rows=int(os.getenv("SQL_MAX_SCAN_ROWS", "1000000")),
+            timeout=timeout or None,
+        )
+
+    def _refuse(self, reason: str, message: str, prefix: str = "Query refused") -> QueryRefusedError:
+        with self._lock:
+            self.refused[reason] = self.refused.get(reason, 0) + 1
+        tracing.SQL_REFUSED.inc(reason=reason)
+        return QueryRefusedError(f"{prefix}: {message}")
+
+    def check(self, sql: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Validate one generated statement and return it with a LIMIT added if it
+        had none, plus the tables it references by name or alias.
+
+        Raises QueryRefusedError for anything but a single read statement.
+        """
+        try:
+            tokens = _tokens(sql)
+        except ValueError as e:
+            raise self._refuse("syntax", str(e))
+        while tokens and tokens[-1][1] == ';':
+            tokens.pop()
+        if not tokens:
+            raise self._refuse("empty", "the statement is empty")
+        if any(text == ';' for _, text, _ in tokens):
+            raise self._refuse("multiple_statements", "only one statement may be executed")
+        if tokens[0][0] != 'word' or tokens[0][1].upper() not in ('SELECT', 'WITH'):
+            raise self._refuse("write", "only SELECT queries are allowed")
+
+        depth = 0
+        has_limit = False
+        ctes = _cte_names(tokens)
+        # Per parenthesis level: whether it holds a query (rather than function
+        # arguments such as EXTRACT(YEAR FROM date)), whether it is the body of
+        # a CTE and whether a FROM clause's table list is being read there
+        query, cte_body, in_from = [True], [False], [False]
+        # Index of the token where a statement may start, e.g. after WITH x AS (...)
+        statement_start = 0
+        tables: Dict[str, str] = {}
+        for i, (kind, text, _) in enumerate(tokens):
+            call = i + 1 < len(tokens) and tokens[i + 1][1] == '('
+            if kind == 'symbol':
+                if text == '(':
+                    depth += 1
+                    following = tokens[i + 1][1].upper() if i + 1 < len(tokens) else ''
+                    query.append(following in ('SELECT', 'WITH', '('))
+                    cte_body.append(i > 0 and tokens[i - 1][1].upper() in ('AS', 'MATERIALIZED'))
+                    in_from.append(False)
+                elif text == ')' and depth > 0:
+                    depth -= 1
+                    query.pop()
+                    in_from.pop()
+                    if cte_body.pop():
+                        statement_start = i + 1
+                elif text == ',' and in_from[-1]:
+                    self._check_table(tokens, i + 1, ctes, tables)
+                continue
+            if kind != 'word':
+                continue
+            word = text.upper()
+            # Only where a statement starts: a column or alias may be called "set" or "replace"
+            if word in WRITE_KEYWORDS and not call and (i == statement_start or tokens[i - 1][1] == '('):
+                raise self._refuse("write", f"{word} statements are not allowed")
+            if call and FILE_FUNCTIONS.match(text):
+                raise self._refuse("file_access", f"{text}() is not allowed")
+            if word == 'LIMIT' and depth == 0:
+                has_limit = True
+            # Table references: FROM a [AS] x, b y ... JOIN c z
+            if word in ('FROM', 'JOIN') and query[-1]:
+                in_from[-1] = True
+                self._check_table(tokens, i + 1, ctes, tables)
+            elif word in CLAUSE_KEYWORDS and word != 'AS':
+                in_from[-1] = False
+
+        sql = sql[:tokens[-1][2]]
+        if not has_limit and self.max_rows:
+            sql = f"{sql}\nLIMIT {self.max_rows + 1}"
+        return sql, tables
+
+    def _check_table(self, tokens: List[Tuple[str, str, int]], i: int, ctes: frozenset, tables: Dict[str, str]):
+        """Refuse the table reference at tokens[i] unless it names an analytics table or a CTE, and record it."""
+        if i >= len(tokens):
+            return
+        if _is_file_reference(tokens[i]):
+            raise self._refuse("file_access", f"{tokens[i][1]} is not a table")
+        if not _is_name(tokens[i]):
+            return  # a subquery
+        # main.analytics_data names the same table; other schemas are attached databases or catalogs
+        while i + 2 < len(tokens) and tokens[i + 1][1] == '.' and _identifier(tokens[i]).lower() == 'main':
+            i += 2
+        name = _identifier(tokens[i])
+        following = tokens[i + 1][1] if i + 1 < len(tokens) else ''
+        if following == '(':
+            if FILE_FUNCTIONS.match(name):
+                raise self._refuse("file_access", f"{name}() is not allowed")
+            name += '()'
+        elif following == '.':
+            name += '.' + (tokens[i + 2][1] if i + 2 < len(tokens) else '')
+        if name.lower() not in self.tables and name.lower() not in ctes:
+            raise self._refuse("table", f"{name} is not one of the tables {', '.join(sorted(self.tables))}")
+        _table_reference(tokens, i, tables)
+
+    def _table_row_counts(self, backend: Any) -> Dict[str, int]:
+        """Row counts per table, recounted whenever the data version changes."""
+        version = backend.data_version()
+        cached = self._row_counts
+        if cached is None or cached[0] != version:
+            cached = self._row_counts = (version, backend.table_row_counts())
+        return cached[1]
+
+    def check_plan(self, backend: Any, sql: str, tables: Dict[str, str]):
+        """Refuse SQLite plans that scan every row of a table larger than max_scan_rows."""
+        if not self.max_scan_rows or backend.SQL_DIALECT != "SQLite":
+            return
+        counts = self._table_row_counts(backend)
+        for detail in backend.explain_query_plan(sql):
+            parts = detail.split()
+            # "SCAN t" and "SCAN t USING COVERING INDEX i" read the whole table;
+            # "SEARCH t USING ..." reads a range of it
+            if len(parts) < 2 or parts[0] != 'SCAN':
+                continue
+            name = parts[2] if parts[1] == 'TABLE' and len(parts) > 2 else parts[1]
+            table = tables.get(name, name)
+            rows = counts.get(table, 0)
+            if rows > self.max_scan_rows:
+                raise self._refuse(
+                    "full_scan",
+                    f"it would read all {rows:,} rows of {table}. Ask about a time range (ts) or use "
+                    f"the daily, weekly or monthly rollup tables."
+                )
+
+    def execute(self, backend: Any, sql: str, trusted: bool = False) -> GuardedResult:
+        """
+        Run ``sql`` on ``backend`` within the guard's limits.
+
+        ``trusted`` SQL, such as the query planner's templates, skips the
+        statement check; the plan check, timeout and row limit still apply.
+        """
+        tables: Dict[str, str] = {}
+        if not trusted:
+            sql, tables = self.check(sql)
+        self.check_plan(backend, sql, tables)
+        try:
+            columns, rows = backend.execute_query(
+                sql,
+                max_rows=self.max_rows + 1 if self.max_rows else None,
+                timeout=self.timeout
+            )
+        except TimeoutError as e:
+            raise self._refuse("timeout", str(e), prefix="Query stopped") from e
+        truncated = bool(self.max_rows) and len(rows) > self.max_rows
+        return GuardedResult(columns, rows[:self.max_rows] if truncated else rows, truncated)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_rows": self.max_rows,
+            "max_scan_rows": self.max_scan_rows,
+            "timeout_seconds": self.timeout,
+            "refused": dict(self.refused),
+        }
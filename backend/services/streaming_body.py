@@ -0,0 +1,84 @@
+import asyncio
+import io
+import queue
+from typing import AsyncIterator, Optional, Union
+
+
+class IncompleteBodyError(IOError):
+    """Raised to the reader when the body stopped before its end, e.g. because the client disconnected."""
+
+
+class StreamingBody(io.RawIOBase):
+    """
+    Blocking, file-like view of an async request body.
+
+    The event loop feeds body chunks with ``await pump(...)`` while a worker
+    thread reads them as an ordinary binary stream (e.g. pandas.read_csv), so
+    an upload is parsed as it arrives and never held in memory as a whole.
+    At most ``max_chunks`` chunks are buffered; beyond that the upload is
+    back-pressured until the reader catches up.
+
+    A body that fails part way is never passed off as complete: the reader
+    gets IncompleteBodyError where it would otherwise see end of input.
+    """
+
+    def __init__(self, max_chunks: int = 16):
+        super().__init__()
+        self._queue: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._error: Optional[IncompleteBodyError] = None
+        self._abandoned = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, IncompleteBodyError):
+                self._eof = True
+                self._error = chunk
+            else:
+                self._buffer = memoryview(chunk)
+        if self._error is not None and not self._buffer:
+            raise self._error
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def abandon(self):
+        """Called by the reader when it stops early, so pump() stops waiting for it."""
+        self._abandoned = True
+
+    def _put(self, chunk: Union[bytes, IncompleteBodyError, None]):
+        while not self._abandoned:
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    async def pump(self, chunks: AsyncIterator[bytes]):
+        """
+        Feed ``chunks`` to the reader, then signal end of input.
+
+        If ``chunks`` raises, e.g. ClientDisconnect when the client goes away
+        mid-upload, the reader gets IncompleteBodyError instead and pump
+        returns normally; the reader's failure is what reports it.
+        """
+        end: Optional[IncompleteBodyError] = IncompleteBodyError("the upload was cancelled")
+        try:
+            async for chunk in chunks:
+                if self._abandoned:
+                    break
+                if chunk:
+                    await asyncio.to_thread(self._put, chunk)
+            end = None
+        except Exception as e:
+            end = IncompleteBodyError(f"the upload ended early: {str(e) or type(e).__name__}")
+        finally:
+            await asyncio.to_thread(self._put, end)
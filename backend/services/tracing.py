@@ -0,0 +1,307 @@
+"""
+Request tracing and Prometheus metrics.
+
+Code marks the stages of a request with ``span(name)``. Each span:
+
+- observes its duration in the ``bi_span_duration_seconds`` histogram
+- is added to the trace of the current request, which TracingMiddleware
+  returns in a ``Server-Timing`` header and, with TRACE_LOG=true, prints
+  as one JSON line per request
+- becomes an OpenTelemetry span when OTEL_EXPORTER_OTLP_ENDPOINT is set and
+  the opentelemetry SDK and OTLP exporter are installed
+
+``render_metrics`` produces the Prometheus text format served on /metrics.
+Metrics are kept per process; with several workers, each reports its own.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+TRACE_LOG = os.getenv("TRACE_LOG", "false").lower() in ("1", "true", "yes")
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+# (labels, value) pairs of one metric, as returned by collectors
+Samples = List[Tuple[Dict[str, str], float]]
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in self._values.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), state):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': le})} {_format_value(cumulative)}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(state[-1])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+        return lines
+
+
+class Registry:
+    """Metrics owned by this module plus collectors that report values kept elsewhere."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, Samples]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, collect: Callable[[], List[Tuple[str, str, str, Samples]]]):
+        """Register ``collect``, called on every scrape and returning (name, type, help, samples) tuples."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "bi_http_request_duration_seconds", "Time to the end of the response body, by endpoint.",
+    ["handler", "method", "status"]
+)
+SPAN_SECONDS = REGISTRY.histogram(
+    "bi_span_duration_seconds", "Duration of request stages (LLM calls, SQL execution, serialization).",
+    ["span"]
+)
+LLM_CALLS = REGISTRY.counter("bi_llm_calls_total", "LLM calls, by pipeline stage.", ["call"])
+LLM_TOKENS = REGISTRY.counter(
+    "bi_llm_tokens_total",
+    "LLM tokens by stage and kind; source is 'reported' by the provider or 'estimated' from characters.",
+    ["call", "kind", "source"]
+)
+SQL_ROWS = REGISTRY.histogram("bi_sql_rows", "Rows returned by generated SQL.", ["backend"], ROW_BUCKETS)
+SQL_REFUSED = REGISTRY.counter(
+    "bi_sql_refused_total", "Generated SQL refused by the SQL guard or stopped by its timeout, by reason.", ["reason"]
+)
+PLANNED_QUERIES = REGISTRY.counter(
+    "bi_planned_queries_total",
+    "Questions by query planner intent; 'fallback' questions went to the LLM.",
+    ["intent"]
+)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+class Trace:
+    """Spans of one request, in completion order, with offsets from the request start."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, attributes: Dict[str, Any]):
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "offset_ms": round((start - self.start) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                **attributes,
+            })
+
+    def server_timing(self) -> str:
+        with self._lock:
+            return ', '.join(f"{s['name']};dur={s['duration_ms']}" for s in self.spans)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+_otel_tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time the block as span ``name``.
+
+    Yields the span's attribute dict, so the block can record results such
+    as row counts. Works in worker threads started with asyncio.to_thread,
+    which copy the request's context.
+    """
+    trace = _current_trace.get()
+    with _otel_span(name) as otel_span:
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            SPAN_SECONDS.observe(duration, span=name)
+            if trace is not None:
+                trace.add(name, start, duration, attributes)
+            if otel_span is not None:
+                for key, value in attributes.items():
+                    otel_span.set_attribute(key, value if isinstance(value, (bool, int, float, str)) else str(value))
+
+
+def _otel_span(name: str):
+    return _otel_tracer.start_as_current_span(name) if _otel_tracer is not None else nullcontext()
+
+
+def record_tokens(call: str, prompt_tokens: int, completion_tokens: int, source: str):
+    LLM_CALLS.inc(call=call)
+    LLM_TOKENS.inc(prompt_tokens, call=call, kind="prompt", source=source)
+    LLM_TOKENS.inc(completion_tokens, call=call, kind="completion", source=source)
+
+
+def configure_opentelemetry() -> bool:
+    """Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set; returns whether export is on."""
+    global _otel_tracer
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OpenTelemetry export disabled: install opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "bi-backend")}))
+    # The exporter reads its endpoint and headers from the standard OTEL_* variables
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _otel_tracer = trace.get_tracer("bi-backend")
+    return True
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware giving every HTTP request a Trace.
+
+    Adds a Server-Timing header with the spans finished before the response
+    starts, and records the request duration (through the last body chunk,
+    so streamed responses are timed in full) by endpoint name.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = trace.server_timing()
+                if timing:
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            with _otel_span(f"{scope['method']} {scope['path']}"):
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - trace.start
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            REQUEST_SECONDS.observe(duration, handler=handler, method=scope["method"], status=status)
+            if TRACE_LOG:
+                print(json.dumps({
+                    "trace": {
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "handler": handler,
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 3),
+                        "spans": trace.spans,
+                    }
+                }, default=str))
+            _current_trace.reset(token)
@@ -0,0 +1,43 @@
+"""
+Shared fixtures. The backend reads its configuration from the environment
+when modules are imported, so the database, shared cache and API key are
+pointed at a scratch directory before anything from the backend is imported.
+"""
+import os
+import sys
+import tempfile
+
+SCRATCH = tempfile.mkdtemp(prefix="bi-tests-")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH, 'analytics.db')}"
+os.environ["SHARED_CACHE_PATH"] = os.path.join(SCRATCH, "shared_cache.db")
+os.environ["COLUMNAR_PATH"] = os.path.join(SCRATCH, "analytics_parquet")
+os.environ["PRELOAD_AGENT"] = "false"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from data import repository
+
+# Hourly rows from 2024-01-01 up to NOW, every metric constant, so that equal
+# spans of time hold equal totals. NOW is a Wednesday noon, 60 hours into
+# its week and 13.5 days into its month.
+START = repository.to_timestamp("2024-01-01")
+NOW = repository.to_timestamp("2024-02-14 12:00:00")
+ROW = (100, 50, 3.0, 0.3, 0.02)
+
+
+@pytest.fixture(scope="session")
+def analytics_db():
+    """The test database, holding the hourly rows between START and NOW."""
+    repository.initialize_database(seed_sample_data=False)
+    rows = [(ts,) + ROW for ts in range(START, NOW, 3600)]
+    repository.write_chunks([repository.RowChunk(rows, rows[0][0], rows[-1][0])], replace=True)
+    return repository
+
+
+@pytest.fixture
+def now() -> int:
+    """The time the test data ends at."""
+    return NOW
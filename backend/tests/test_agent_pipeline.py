@@ -0,0 +1,175 @@
+"""
+The query pipeline shared by the agent's entry points, with a stub LLM in
+place of Gemini (see benchmarks/stubs.py).
+"""
+import asyncio
+from typing import List, Optional
+
+import pytest
+from langchain_community.utilities.sql_database import SQLDatabase
+from langchain_core.messages import BaseMessage
+
+from agents.business_intelligence_agent import BusinessIntelligenceAgent
+from agents.query_planner import NO_DATA, QueryPlanner
+from benchmarks.stubs import StubChatModel
+from cache.answer_cache import AnswerCache
+from cache.query_cache import SemanticQueryCache
+from services.sql_guard import SQLGuard
+
+DAILY_SQL = "SELECT date, page_views_sum FROM analytics_daily ORDER BY bucket_ts LIMIT 3"
+
+
+class ScriptedChatModel(StubChatModel):
+    """StubChatModel that can fail, or reply to batch prompts with fixed text."""
+
+    error: Optional[str] = None
+    batch_sql: Optional[str] = None
+    batch_narration: Optional[str] = None
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        if self.error is not None:
+            raise RuntimeError(self.error)
+        prompt = messages[-1].content
+        scripted = self.batch_sql if "SQL expert" in prompt else self.batch_narration
+        if "for each question" in prompt.lower() and scripted is not None:
+            self.calls += 1
+            return scripted
+        return super()._reply(messages)
+
+
+def make_agent(analytics_db, planner: bool = False, **llm) -> BusinessIntelligenceAgent:
+    return BusinessIntelligenceAgent(
+        llm=ScriptedChatModel(**llm),
+        db=SQLDatabase.from_uri(f"sqlite:///{analytics_db.database_path()}"),
+        query_cache=SemanticQueryCache(embedding_model=None),
+        answer_cache=AnswerCache(),
+        query_backend=analytics_db,
+        planner=QueryPlanner(enabled=planner),
+        sql_guard=SQLGuard(),
+    )
+
+
+def stream(agent: BusinessIntelligenceAgent, question: str) -> List[dict]:
+    async def collect():
+        return [event async for event in agent.astream_query(question)]
+    return asyncio.run(collect())
+
+
+def kinds(events: List[dict]) -> List[str]:
+    return [event["event"] for event in events]
+
+
+def test_stream_yields_sql_rows_tokens_then_done(analytics_db):
+    agent = make_agent(analytics_db, sql=DAILY_SQL, narration="Page views held steady at 2,400 a day.")
+    events = stream(agent, "Daily page views")
+    assert kinds(events)[:2] == ["sql", "rows"] and kinds(events)[-1] == "done"
+    assert set(kinds(events)[2:-1]) == {"token"}
+    assert events[0]["data"] == {"sql": DAILY_SQL, "cached": False, "planned": False}
+    assert events[1]["data"] == {
+        "columns": ["date", "page_views_sum"],
+        "rows": [[f"2024-01-0{day} 00:00:00", 2400] for day in (1, 2, 3)],
+    }
+    text = "".join(event["data"]["text"] for event in events if event["event"] == "token")
+    assert text == events[-1]["data"]["response"] == "Page views held steady at 2,400 a day."
+    assert agent.llm.calls == 2
+
+    # Cached SQL over unchanged data: no LLM call, and the cached answer in one token
+    events = stream(agent, "daily page views?")
+    assert kinds(events) == ["sql", "token", "done"]
+    assert events[0]["data"]["cached"] is True
+    assert events[-1]["data"]["response"] == "Page views held steady at 2,400 a day."
+    assert agent.llm.calls == 2
+
+
+def test_stream_of_a_planned_question(analytics_db):
+    agent = make_agent(analytics_db, planner=True)
+    events = stream(agent, "Total page views this week")
+    assert kinds(events) == ["sql", "rows", "token", "done"]
+    assert events[0]["data"]["planned"] is True
+    assert events[2]["data"]["text"] == events[3]["data"]["response"]
+    assert agent.llm.calls == 0
+
+
+def test_stream_of_an_empty_result(analytics_db):
+    agent = make_agent(analytics_db, sql="SELECT date FROM analytics_daily WHERE bucket_ts < 0")
+    events = stream(agent, "Page views before 1970")
+    assert kinds(events) == ["sql", "rows", "token", "done"]
+    assert events[-1]["data"]["response"] == NO_DATA
+    assert agent.llm.calls == 1
+
+
+def test_stream_reports_refused_sql_as_one_error_event(analytics_db):
+    agent = make_agent(analytics_db, sql="DELETE FROM analytics_data")
+    events = stream(agent, "Delete everything")
+    assert kinds(events) == ["sql", "error"]
+    assert events[1]["data"]["error"] == "Error executing query: Query refused: only SELECT queries are allowed"
+    # SQL that failed is not cached
+    assert stream(agent, "Delete everything")[0]["data"]["cached"] is False
+
+
+def test_stream_reports_llm_failures_as_one_error_event(analytics_db):
+    events = stream(make_agent(analytics_db, error="quota exceeded"), "Daily page views")
+    assert kinds(events) == ["error"]
+    assert events[0]["data"]["error"] == "Error processing query: quota exceeded"
+
+
+@pytest.mark.parametrize("content, count, sections", [
+    ("-- Question 1\nSELECT 1\n-- Question 2\nSELECT 2", 2, {1: "SELECT 1", 2: "SELECT 2"}),
+    # Markdown headings, bold and colons around the marker
+    ("## Answer 1:\nFirst.\n\n**Answer 2**\nSecond.", 2, {1: "First.", 2: "Second."}),
+    ("### **Answer 1:**\nFirst.", 1, {1: "First."}),
+    # Out of range, repeated and empty sections are dropped
+    ("## Answer 3\nThird.\n## Answer 1\nFirst.\n## Answer 1\nAgain.\n## Answer 2\n", 2, {1: "First."}),
+    # A marker inside a line is not a marker
+    ("## Answer 1\nSee Answer 2 below.\n## Answer 2\nSecond.", 2, {1: "See Answer 2 below.", 2: "Second."}),
+    # Without markers, only a single question can be matched
+    ("Page views rose.", 1, {1: "Page views rose."}),
+    ("Page views rose. Bounce rate fell.", 2, {}),
+    ("Answer one: page views rose.\nAnswer two: bounce rate fell.", 2, {}),
+    # A malformed marker ends the section before it, and its own section is dropped
+    ("-- Question 1\nSELECT 1\n-- Question two\nSELECT 2", 2, {1: "SELECT 1"}),
+    ("## Answer 1\nFirst.\n## Answer II\nSecond.\n## Answer 3\nThird.", 3, {1: "First.", 3: "Third."}),
+    ("", 1, {}),
+])
+def test_split_sections(content, count, sections):
+    label = "Question" if content.startswith("--") else "Answer"
+    assert BusinessIntelligenceAgent._split_sections(content, label, count) == sections
+
+
+def test_batch_questions_without_a_section_fail_alone(analytics_db):
+    agent = make_agent(
+        analytics_db,
+        batch_sql="```sql\n-- Question 1\n" + DAILY_SQL + "\n-- Question three\nSELECT 3\n```",
+        batch_narration="## Answer 1\nPage views held steady.",
+    )
+    results = asyncio.run(agent.abatch_query(["Daily page views", "Daily bounce rate"]))
+    assert results == [
+        {"question": "Daily page views", "sql": DAILY_SQL, "response": "Page views held steady.", "error": None},
+        {"question": "Daily bounce rate", "sql": None, "response": None,
+         "error": "Error processing query: no SQL was generated for this question"},
+    ]
+    assert agent.llm.calls == 2
+
+
+def test_batch_narration_without_markers_fails_every_question(analytics_db):
+    agent = make_agent(analytics_db, batch_narration="Page views held steady and so did the bounce rate.")
+    agent.llm.sql = DAILY_SQL
+    results = asyncio.run(agent.abatch_query(["Daily page views", "Daily page views again"]))
+    assert [result["sql"] for result in results] == [DAILY_SQL, DAILY_SQL]
+    assert [result["error"] for result in results] == \
+        ["Error processing query: no answer was generated for this question"] * 2
+    # Nothing was cached for the answers that were lost
+    assert len(agent.answer_cache._cache) == 0
+
+
+def test_batch_mixes_planned_cached_and_failed_questions(analytics_db):
+    agent = make_agent(analytics_db, planner=True, sql=DAILY_SQL, narration="Steady.")
+    stream(agent, "Daily page views")
+    calls = agent.llm.calls
+    agent.llm.sql = "DELETE FROM analytics_data"
+    results = asyncio.run(agent.abatch_query(["Total page views this week", "daily page views", "Drop it"]))
+    assert results[0]["error"] is None and results[0]["sql"].startswith("SELECT")
+    assert results[1] == {"question": "daily page views", "sql": DAILY_SQL, "response": "Steady.", "error": None}
+    assert results[2]["error"] == "Error executing query: Query refused: only SELECT queries are allowed"
+    # Only the failing question needed SQL, and nothing needed narrating
+    assert agent.llm.calls == calls + 1
@@ -0,0 +1,41 @@
+import pytest
+
+from cache import answer_cache
+from cache.answer_cache import AnswerCache, normalize_sql
+
+
+def test_normalizes_sql_outside_string_literals():
+    assert normalize_sql("SELECT  *\n FROM analytics_data WHERE date > 'A  B';") == \
+        "select * from analytics_data where date > 'A  B'"
+    cache = AnswerCache()
+    cache.set("SELECT 1", ("database", 1), "answer")
+    assert cache.get(" select 1 ;", ("database", 1)) == "answer"
+    assert cache.get("SELECT 1", ("database", 2)) is None
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM analytics_data WHERE date >= date('now', '-7 days')",
+    "SELECT COUNT(*) FROM analytics_data WHERE date >= CURRENT_DATE",
+    "SELECT COUNT(*) FROM analytics_data WHERE ts >= epoch(now() - INTERVAL 7 DAY)",
+    "SELECT COUNT(*) FROM analytics_data WHERE ts >= epoch(NOW () - INTERVAL 7 DAY)",
+    "SELECT COUNT(*) FROM analytics_data WHERE CAST(date AS DATE) = today()",
+    "SELECT COUNT(*) FROM analytics_data WHERE CAST(date AS TIMESTAMP) > get_current_timestamp() - INTERVAL 1 DAY",
+    "SELECT COUNT(*) FROM analytics_data WHERE CAST(date AS TIMESTAMP) > localtimestamp - INTERVAL 1 DAY",
+    "SELECT COUNT(*) FROM analytics_data WHERE CAST(date AS TIMESTAMP) > transaction_timestamp() - INTERVAL 1 DAY",
+])
+def test_sql_reading_the_clock_expires_with_the_minute(sql, monkeypatch):
+    cache = AnswerCache()
+    monkeypatch.setattr(answer_cache.time, "strftime", lambda fmt: "2024-02-14 12:00")
+    cache.set(sql, ("database", 1), "answer")
+    assert cache.get(sql, ("database", 1)) == "answer"
+    monkeypatch.setattr(answer_cache.time, "strftime", lambda fmt: "2024-02-14 12:01")
+    assert cache.get(sql, ("database", 1)) is None
+
+
+def test_sql_without_the_clock_is_kept_across_minutes(monkeypatch):
+    sql = "SELECT now_playing, today_views FROM analytics_daily WHERE date >= '2024-02-01'"
+    cache = AnswerCache()
+    monkeypatch.setattr(answer_cache.time, "strftime", lambda fmt: "2024-02-14 12:00")
+    cache.set(sql, ("database", 1), "answer")
+    monkeypatch.setattr(answer_cache.time, "strftime", lambda fmt: "2024-02-14 12:01")
+    assert cache.get(sql, ("database", 1)) == "answer"
@@ -0,0 +1,129 @@
+"""
+Multi-worker mode: one writer at a time and caches shared between workers.
+
+The workers here are separate interpreters started with the ``spawn``
+method, like server workers, so nothing is inherited but the environment.
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from cache import store
+from cache.answer_cache import AnswerCache
+from cache.query_cache import SemanticQueryCache
+from data.process_lock import ProcessLock
+
+spawn = multiprocessing.get_context("spawn")
+
+
+@pytest.fixture
+def shared_caches(monkeypatch, tmp_path):
+    """Make create_cache return SQLite stores in a fresh file, as CACHE_BACKEND=sqlite does."""
+    path = str(tmp_path / "shared_cache.db")
+    monkeypatch.setattr(store, "CACHE_BACKEND", "sqlite")
+    monkeypatch.setattr(store, "SHARED_CACHE_PATH", path)
+    monkeypatch.setenv("CACHE_BACKEND", "sqlite")
+    # Workers read the configuration from their environment
+    monkeypatch.setenv("SHARED_CACHE_PATH", path)
+    return path
+
+
+def _increment(path: str, counter: str, times: int):
+    lock = ProcessLock(path)
+    for _ in range(times):
+        with lock:
+            with open(counter) as f:
+                value = int(f.read())
+            time.sleep(0.001)
+            with open(counter, "w") as f:
+                f.write(str(value + 1))
+
+
+def _acquire(path: str, acquired):
+    with ProcessLock(path):
+        acquired.set()
+
+
+def test_writer_lock_admits_one_process_at_a_time(tmp_path):
+    path, counter = str(tmp_path / "writer.lock"), str(tmp_path / "counter")
+    with open(counter, "w") as f:
+        f.write("0")
+    workers = [spawn.Process(target=_increment, args=(path, counter, 25)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    # Read-modify-write cycles that overlapped would lose increments
+    with open(counter) as f:
+        assert int(f.read()) == 100
+
+
+def test_writer_lock_blocks_other_processes_until_released(tmp_path):
+    path = str(tmp_path / "writer.lock")
+    lock = ProcessLock(path)
+    acquired = spawn.Event()
+    with lock:
+        # Re-entering from the holding thread is allowed
+        with lock:
+            pass
+        worker = spawn.Process(target=_acquire, args=(path, acquired))
+        worker.start()
+        assert not acquired.wait(1.0)
+    assert acquired.wait(30)
+    worker.join(30)
+    assert worker.exitcode == 0
+
+
+def test_sqlite_cache_round_trips_keys(tmp_path):
+    cache = store.SQLiteCache("test", max_size=2, path=str(tmp_path / "cache.db"))
+    first, second, third = (("database", 7), "page views"), ("sql", None, 1.5), "plain"
+    cache.set(first, {"sql": "SELECT 1"})
+    cache.set(second, b"bytes")
+    assert sorted(map(repr, cache.keys())) == sorted(map(repr, [first, second]))
+    assert cache.get(first) == {"sql": "SELECT 1"}
+    assert cache.get(second) == b"bytes"
+    # The least recently stored entry makes room, and is returned as the key it was stored under
+    assert cache.set(third, "value") == first
+    assert cache.get(first) is None
+
+
+def test_query_cache_keys_on_schema_version(shared_caches):
+    cache = SemanticQueryCache(embedding_model=None)
+    cache.set("Average views?", "SELECT 1", ("database", 1))
+    assert cache.get("average views", ("database", 1)) == "SELECT 1"
+    # Another schema, or the same schema cookie in a recreated database
+    assert cache.get("average views", ("database", 2)) is None
+    assert cache.get("average views", ("recreated", 1)) is None
+    # Moving to a new schema version leaves the entries of the old one in place
+    assert SemanticQueryCache(embedding_model=None).get("average views", ("database", 1)) == "SELECT 1"
+
+
+def test_answer_cache_keys_on_database_id(shared_caches):
+    cache = AnswerCache()
+    cache.set("SELECT 1", ("database", 3), "answer")
+    assert cache.get("select 1;", ("database", 3)) == "answer"
+    assert cache.get("SELECT 1", ("recreated", 3)) is None
+    assert cache.get("SELECT 1", ("database", 4)) is None
+
+
+def _lookup(question: str, schema_version, results):
+    from cache.query_cache import SemanticQueryCache
+    from data import repository
+    results.put((SemanticQueryCache(embedding_model=None).get(question, schema_version), repository.database_id()))
+
+
+def test_second_worker_sees_the_first_workers_entry(analytics_db, shared_caches):
+    schema_version = (analytics_db.database_id(), analytics_db.schema_version())
+    SemanticQueryCache(embedding_model=None).set("Total page views this week?", "SELECT 42", schema_version)
+
+    results = spawn.Queue()
+    worker = spawn.Process(target=_lookup, args=("total page views this week", schema_version, results))
+    worker.start()
+    sql, database_id = results.get(timeout=60)
+    worker.join(30)
+    assert sql == "SELECT 42"
+    # Both workers see the same database, hence the same id
+    assert database_id == schema_version[0]
@@ -0,0 +1,43 @@
+from agents.query_planner import QueryPlanner
+from data import repository
+
+
+def answer(question: str, now: int) -> str:
+    plan = QueryPlanner().plan(question, now_ts=now)
+    assert plan is not None, question
+    _, rows = repository.execute_query(plan.sql)
+    return plan.format(rows)
+
+
+def test_running_period_is_compared_with_the_same_elapsed_span(analytics_db, now):
+    # Every hour holds 100 page views, so equal spans hold equal totals
+    assert answer("Compare page views this week vs last week", now) == (
+        "The total page views were 6,000 this week, unchanged from 6,000 last week up to the same point."
+    )
+    assert answer("Compare page views this month vs last month", now) == (
+        "The total page views were 32,400 this month, unchanged from 32,400 last month up to the same point."
+    )
+    assert answer("Compare page views today vs yesterday", now) == (
+        "The total page views were 1,200 today, unchanged from 1,200 yesterday up to the same point."
+    )
+
+
+def test_finished_period_is_compared_whole(analytics_db, now):
+    assert answer("Compare page views yesterday vs the previous day", now) == (
+        "The total page views were 2,400 yesterday, unchanged from 2,400 the day before."
+    )
+    assert answer("Compare page views in the last 7 days vs the previous 7 days", now) == (
+        "The total page views were 16,800 in the last 7 days, unchanged from 16,800 in the previous 7 days."
+    )
+
+
+def test_rate_change_matches_the_displayed_rates(now):
+    plan = QueryPlanner().plan("Compare conversion rate this week vs last week", now_ts=now)
+    assert plan.format([(0.02, 0.0201)]) == (
+        "The average conversion rate was 2% this week, down 0.01 percentage points "
+        "from 2.01% last week up to the same point."
+    )
+    # A difference below the displayed precision is no change at all
+    assert plan.format([(0.02, 0.020001)]) == (
+        "The average conversion rate was 2% this week, unchanged from 2% last week up to the same point."
+    )
@@ -0,0 +1,147 @@
+import pytest
+
+from data import repository
+from services.sql_guard import QueryRefusedError, SQLGuard
+
+# Runs until stopped
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT MAX(x) FROM c"
+
+
+def refusal(sql: str, guard: SQLGuard = None) -> str:
+    with pytest.raises(QueryRefusedError) as raised:
+        (guard or SQLGuard()).check(sql)
+    return str(raised.value)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM analytics_data",
+    "UPDATE analytics_data SET page_views = 0",
+    "DROP TABLE analytics_data",
+    "PRAGMA writable_schema = 1",
+    "ATTACH 'other.db' AS other",
+    "WITH x AS (SELECT 1) DELETE FROM analytics_data",
+    "WITH x AS (DELETE FROM analytics_data RETURNING *) SELECT * FROM x",
+    "SELECT * FROM (INSERT INTO analytics_data (ts) VALUES (1) RETURNING ts)",
+])
+def test_refuses_writes(sql):
+    guard = SQLGuard()
+    assert "allowed" in refusal(sql, guard)
+    assert guard.refused == {"write": 1}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; DROP TABLE analytics_data",
+    "SELECT 1; SELECT 2",
+    "SELECT 1 /* ; */; SELECT 2 -- ;",
+])
+def test_refuses_multiple_statements(sql):
+    assert refusal(sql) == "Query refused: only one statement may be executed"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT page_views AS set FROM analytics_data",
+    "SELECT REPLACE(date, '-', '/') AS replace FROM analytics_daily",
+    "SELECT 'DROP TABLE analytics_data; --' AS text FROM analytics_data",
+    "SELECT EXTRACT(YEAR FROM date) AS year FROM analytics_data",
+    "WITH recent(day) AS (SELECT date FROM analytics_daily) SELECT day FROM recent",
+    "SELECT * FROM main.analytics_data d JOIN analytics_daily AS a ON a.bucket_ts = d.ts",
+    "SELECT 1;  ",
+])
+def test_accepts_reads(sql):
+    SQLGuard().check(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM sqlite_master",
+    "SELECT name FROM main.sqlite_schema",
+    "SELECT * FROM pragma_table_info('analytics_data')",
+    "SELECT * FROM analytics_data WHERE ts IN (SELECT rootpage FROM sqlite_master)",
+    "SELECT * FROM analytics_data UNION ALL SELECT * FROM temp.analytics_data",
+])
+def test_refuses_tables_outside_the_analytics_tables(sql):
+    assert "is not one of the tables" in refusal(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_csv_auto('/etc/passwd')",
+    "SELECT * FROM parquet_scan('data.parquet')",
+    "SELECT * FROM analytics_data, glob('*')",
+    "SELECT load_extension('x')",
+    "SELECT * FROM '/etc/passwd'",
+    "SELECT * FROM analytics_data JOIN 'other.csv' ON true",
+    "SELECT * FROM (SELECT 1), 'data.parquet'",
+    'SELECT * FROM "data/analytics.csv"',
+])
+def test_refuses_file_access(sql):
+    guard = SQLGuard()
+    assert "is not" in refusal(sql, guard)
+    assert guard.refused == {"file_access": 1}
+
+
+def test_limit_is_added_when_missing():
+    guard = SQLGuard(max_rows=10)
+    assert guard.check("SELECT date FROM analytics_daily; -- done")[0] == "SELECT date FROM analytics_daily\nLIMIT 11"
+    assert guard.check("SELECT date FROM analytics_daily LIMIT 3")[0] == "SELECT date FROM analytics_daily LIMIT 3"
+    # A LIMIT inside a subquery does not bound the result
+    sql = "SELECT * FROM (SELECT date FROM analytics_daily LIMIT 3)"
+    assert guard.check(sql)[0] == sql + "\nLIMIT 11"
+
+
+def test_rows_beyond_the_limit_are_dropped(analytics_db):
+    result = SQLGuard(max_rows=10).execute(analytics_db, "SELECT ts FROM analytics_data")
+    assert len(result.rows) == 10 and result.truncated
+    result = SQLGuard(max_rows=10).execute(analytics_db, "SELECT ts FROM analytics_data LIMIT 5")
+    assert len(result.rows) == 5 and not result.truncated
+
+
+def test_plan_check_refuses_full_scans(analytics_db):
+    guard = SQLGuard(max_scan_rows=100)
+    with pytest.raises(QueryRefusedError, match="it would read all 1,068 rows of analytics_data"):
+        guard.execute(analytics_db, "SELECT AVG(page_views) FROM analytics_data a WHERE page_views > 0")
+    # A ts range is a search of the primary key, and the rollups are small
+    start = repository.to_timestamp("2024-02-01")
+    guard.execute(analytics_db, f"SELECT AVG(page_views) FROM analytics_data WHERE ts >= {start}")
+    guard.execute(analytics_db, "SELECT SUM(page_views_sum) FROM analytics_daily")
+    assert guard.refused == {"full_scan": 1}
+
+
+def test_plan_check_applies_to_trusted_sql(analytics_db):
+    with pytest.raises(QueryRefusedError):
+        SQLGuard(max_scan_rows=100).execute(analytics_db, "SELECT COUNT(*) FROM analytics_data", trusted=True)
+
+
+def test_statements_past_the_timeout_are_stopped(analytics_db):
+    guard = SQLGuard(timeout=0.2)
+    with pytest.raises(QueryRefusedError, match="^Query stopped: the statement exceeded the 0.2 second timeout$"):
+        guard.execute(analytics_db, ENDLESS)
+    assert guard.refused == {"timeout": 1}
+
+
+@pytest.fixture
+def duckdb_store(analytics_db, tmp_path):
+    pytest.importorskip("duckdb")
+    pytest.importorskip("pyarrow")
+    from data.columnar import ColumnarStore
+    return ColumnarStore(path=str(tmp_path / "analytics_parquet"))
+
+
+def test_duckdb_runs_guarded_reads(duckdb_store):
+    result = SQLGuard().execute(duckdb_store, "SELECT COUNT(*), SUM(page_views_sum) FROM analytics_monthly")
+    assert result.rows == [(2, 106_800)]
+
+
+def test_duckdb_cannot_read_files_even_unguarded(duckdb_store, tmp_path):
+    path = tmp_path / "secret.csv"
+    path.write_text("a\n1\n")
+    for sql in (f"SELECT * FROM '{path}'", f"SELECT * FROM read_csv_auto('{path}')"):
+        with pytest.raises(QueryRefusedError):
+            SQLGuard().check(sql)
+        # External access is disabled on the connection itself
+        with pytest.raises(Exception, match="(?i)disabled|permission"):
+            duckdb_store.execute_query(sql)
+
+
+def test_duckdb_statements_past_the_timeout_are_stopped(duckdb_store):
+    sql = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) SELECT MAX(x) FROM c"
+    with pytest.raises(QueryRefusedError, match="^Query stopped"):
+        SQLGuard(timeout=0.2).execute(duckdb_store, sql)
@@ -1,132 +1,188 @@
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+import json
+import os
+from functools import lru_cache
+import numpy as np
 import pandas as pd
+import plotly.io as pio
+from plotly.colors import get_colorscale
 from typing import Dict, Any
 
+# Figures are emitted as plain Plotly figure dicts built from NumPy arrays.
+# Going through graph_objects validates every property on every call, which
+# dominates chart time for large frames; the dicts below are what
+# ``go.Figure(...).to_dict()`` produces for the same charts.
+
+# Traces with more points than this are drawn with WebGL (scattergl)
+SCATTERGL_THRESHOLD = int(os.getenv("SCATTERGL_THRESHOLD", "5000"))
+
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
+
+CHART_TYPES = ('time_series', 'comparison', 'distribution', 'correlation')
+
+@lru_cache(maxsize=None)
+def _template(name: str = 'plotly_white') -> Dict[str, Any]:
+    """The expanded layout template; shared between figures, so treat it as read-only."""
+    return pio.templates[name].to_plotly_json()
+
+def _scatter_type(points: int) -> str:
+    return 'scattergl' if points > SCATTERGL_THRESHOLD else 'scatter'
+
+def _layout(title: str, **layout: Any) -> Dict[str, Any]:
+    return {'title': {'text': title}, **layout, 'template': _template()}
+
+def _axis_title(text: str) -> Dict[str, Any]:
+    return {'title': {'text': text}}
+
 def create_time_series_chart(df: pd.DataFrame, metric: str, title: str) -> Dict[str, Any]:
     """
     Create a time series chart for a specific metric.
-    
+
     Args:
         df: DataFrame containing the data
         metric: Name of the metric to plot
         title: Chart title
-        
+
     Returns:
         Dictionary containing the Plotly figure
     """
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatter(
-        x=df['date'],
-        y=df[metric],
-        mode='lines+markers',
-        name=metric,
-        line=dict(color='#1f77b4')
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title='Date',
-        yaxis_title=metric,
-        template='plotly_white',
-        hovermode='x unified'
-    )
-    
-    return fig.to_dict()
+    x = df['date'].to_numpy()
+    return {
+        'data': [{
+            'line': {'color': COLORS[0]},
+            'mode': 'lines+markers',
+            'name': metric,
+            'x': x,
+            'y': df[metric].to_numpy(),
+            'type': _scatter_type(len(x))
+        }],
+        'layout': _layout(
+            title,
+            xaxis=_axis_title('Date'),
+            yaxis=_axis_title(metric),
+            hovermode='x unified'
+        )
+    }
 
 def create_metric_comparison_chart(df: pd.DataFrame, metrics: list, title: str) -> Dict[str, Any]:
     """
     Create a chart comparing multiple metrics over time.
-    
+
+    The first metric uses the left y-axis and the others share a secondary
+    axis on the right.
+
     Args:
         df: DataFrame containing the data
         metrics: List of metrics to compare
         title: Chart title
-        
+
     Returns:
         Dictionary containing the Plotly figure
     """
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728']
-    
-    for i, metric in enumerate(metrics):
-        fig.add_trace(
-            go.Scatter(
-                x=df['date'],
-                y=df[metric],
-                name=metric,
-                line=dict(color=colors[i % len(colors)])
-            ),
-            secondary_y=(i > 0)
+    x = df['date'].to_numpy()
+    trace_type = _scatter_type(len(x))
+    data = [
+        {
+            'line': {'color': COLORS[i % len(COLORS)]},
+            'name': metric,
+            'x': x,
+            'y': df[metric].to_numpy(),
+            'type': trace_type,
+            'xaxis': 'x',
+            'yaxis': 'y2' if i > 0 else 'y'
+        }
+        for i, metric in enumerate(metrics)
+    ]
+    return {
+        'data': data,
+        'layout': _layout(
+            title,
+            xaxis={'anchor': 'y', 'domain': [0.0, 0.94], 'title': {'text': 'Date'}},
+            yaxis={'anchor': 'x', 'domain': [0.0, 1.0]},
+            yaxis2={'anchor': 'x', 'overlaying': 'y', 'side': 'right'},
+            hovermode='x unified'
         )
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title='Date',
-        template='plotly_white',
-        hovermode='x unified'
-    )
-    
-    return fig.to_dict()
+    }
 
 def create_metric_distribution_chart(df: pd.DataFrame, metric: str, title: str) -> Dict[str, Any]:
     """
     Create a distribution chart for a specific metric.
-    
+
     Args:
         df: DataFrame containing the data
         metric: Name of the metric to plot
         title: Chart title
-        
+
     Returns:
         Dictionary containing the Plotly figure
     """
-    fig = go.Figure()
-    
-    fig.add_trace(go.Histogram(
-        x=df[metric],
-        nbinsx=30,
-        name=metric,
-        marker_color='#1f77b4'
-    ))
-    
-    fig.update_layout(
-        title=title,
-        xaxis_title=metric,
-        yaxis_title='Count',
-        template='plotly_white'
-    )
-    
-    return fig.to_dict()
+    return {
+        'data': [{
+            'marker': {'color': COLORS[0]},
+            'name': metric,
+            'nbinsx': 30,
+            'x': df[metric].to_numpy(),
+            'type': 'histogram'
+        }],
+        'layout': _layout(
+            title,
+            xaxis=_axis_title(metric),
+            yaxis=_axis_title('Count')
+        )
+    }
 
 def create_correlation_heatmap(df: pd.DataFrame, metrics: list, title: str) -> Dict[str, Any]:
     """
     Create a correlation heatmap for selected metrics.
-    
+
     Args:
         df: DataFrame containing the data
         metrics: List of metrics to include in correlation
         title: Chart title
-        
+
     Returns:
         Dictionary containing the Plotly figure
     """
     corr_matrix = df[metrics].corr()
-    
-    fig = go.Figure(data=go.Heatmap(
-        z=corr_matrix,
-        x=metrics,
-        y=metrics,
-        colorscale='RdBu',
-        zmid=0
-    ))
-    
-    fig.update_layout(
-        title=title,
-        template='plotly_white'
-    )
-    
-    return fig.to_dict() 
\ No newline at end of file
+
+    return {
+        'data': [{
+            'colorscale': get_colorscale('RdBu'),
+            'x': list(metrics),
+            'y': list(metrics),
+            'z': corr_matrix.to_numpy(),
+            'zmid': 0,
+            'type': 'heatmap'
+        }],
+        'layout': _layout(title)
+    }
+
+def build_chart(chart: str, df: pd.DataFrame, metrics: list) -> Dict[str, Any]:
+    """Build one of CHART_TYPES for ``metrics``; single-metric charts plot the first one."""
+    if chart == 'time_series':
+        return create_time_series_chart(df, metrics[0], f"{metrics[0]} Over Time")
+    if chart == 'distribution':
+        return create_metric_distribution_chart(df, metrics[0], f"{metrics[0]} Distribution")
+    if chart == 'comparison':
+        return create_metric_comparison_chart(df, metrics, "Metric Comparison")
+    if chart == 'correlation':
+        return create_correlation_heatmap(df, metrics, "Metric Correlations")
+    raise ValueError(f"chart must be one of {', '.join(CHART_TYPES)}")
+
+def _encode_array(values: Any) -> Any:
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind == 'M':
+            return np.datetime_as_string(values, unit='s').tolist()
+        if values.dtype.kind == 'f' and np.isnan(values).any():
+            return np.where(np.isnan(values), None, values).tolist()
+        return values.tolist()
+    if isinstance(values, np.datetime64):
+        return str(np.datetime_as_string(values, unit='s'))
+    if isinstance(values, np.generic):
+        return values.item()
+    if hasattr(values, 'isoformat'):
+        return values.isoformat()
+    raise TypeError(f"Object of type {type(values).__name__} is not JSON serializable")
+
+def figure_to_json(figure: Dict[str, Any]) -> bytes:
+    """Serialize a figure dict to JSON bytes; dates become ISO strings and NaN becomes null."""
+    return json.dumps(figure, separators=(',', ':'), default=_encode_array).encode()
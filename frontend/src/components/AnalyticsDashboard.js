@@ -20,6 +20,7 @@ const AnalyticsDashboard = () => {
   const [analyticsData, setAnalyticsData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [anomalies, setAnomalies] = useState([]);
 
   useEffect(() => {
     const fetchAnalyticsData = async () => {
@@ -37,6 +38,31 @@ const AnalyticsDashboard = () => {
     fetchAnalyticsData();
   }, []);
 
+  // Anomalies in newly written rows are pushed by the backend as they arrive
+  useEffect(() => {
+    let socket;
+    let retry;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket('ws://localhost:8000/ws/anomalies');
+      socket.onmessage = (event) => {
+        const alert = JSON.parse(event.data);
+        setAnomalies(prev => [alert, ...prev].slice(0, 20));
+      };
+      socket.onclose = () => {
+        if (!closed) retry = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      socket.close();
+    };
+  }, []);
+
   if (loading) return <CircularProgress />;
   if (error) return <Typography color="error">{error}</Typography>;
   if (!analyticsData) return null;
@@ -96,6 +122,22 @@ const AnalyticsDashboard = () => {
         </Grid>
       </Grid>
 
+      {/* Live anomalies */}
+      <Card style={{ marginBottom: '20px' }}>
+        <CardContent>
+          <Typography variant="h6" gutterBottom>{t('dashboard.liveAnomalies')}</Typography>
+          {anomalies.length === 0 ? (
+            <Typography color="textSecondary">{t('dashboard.noAnomalies')}</Typography>
+          ) : (
+            anomalies.map((alert) => (
+              <Typography key={`${alert.metric}-${alert.ts}`} color="error">
+                {alert.date} · {alert.metric}: {alert.value.toLocaleString()} (z = {alert.zscore})
+              </Typography>
+            ))
+          )}
+        </CardContent>
+      </Card>
+
       {/* Charts */}
       <Grid container spacing={3}>
         <Grid item xs={12} md={6}>
@@ -25,6 +25,8 @@ ChartJS.register(
 const AnalyticsDashboard = () => {
   const [analyticsData, setAnalyticsData] = useState([]);
   const [summary, setSummary] = useState(null);
+  const [trends, setTrends] = useState({});
+  const [anomalies, setAnomalies] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -34,28 +36,24 @@ const AnalyticsDashboard = () => {
         setLoading(true);
         setError(null);
         
-        const [analyticsResponse, summaryResponse] = await Promise.all([
-          fetch('http://localhost:8000/analytics?days=30'),
-          fetch('http://localhost:8000/analytics/summary')
-        ]);
+        // One precomputed snapshot; the browser revalidates it with its ETag,
+        // so repeat loads are answered 304 without a body
+        const response = await fetch('http://localhost:8000/dashboard');
 
-        if (!analyticsResponse.ok || !summaryResponse.ok) {
+        if (!response.ok) {
           throw new Error('Failed to fetch data');
         }
 
-        const analytics = await analyticsResponse.json();
-        const summaryData = await summaryResponse.json();
+        const dashboard = await response.json();
 
-        if (analytics.error) {
-          throw new Error(analytics.error);
+        if (dashboard.error) {
+          throw new Error(dashboard.error);
         }
 
-        if (summaryData.error) {
-          throw new Error(summaryData.error);
-        }
-
-        setAnalyticsData(analytics.data || []);
-        setSummary(summaryData.summary || {});
+        setAnalyticsData(dashboard.series?.data || []);
+        setSummary(dashboard.summary || {});
+        setTrends(dashboard.trends || {});
+        setAnomalies(dashboard.anomalies || {});
       } catch (error) {
         console.error('Error fetching data:', error);
         setError(error.message);
@@ -91,6 +89,20 @@ const AnalyticsDashboard = () => {
     );
   }
 
+  // Highlight the buckets holding an anomaly of the plotted metric
+  const anomalyBuckets = (metric) => new Set((anomalies[metric] || []).map(marker => marker.bucket));
+  const pointRadius = (metric) => {
+    const buckets = anomalyBuckets(metric);
+    return analyticsData.map(item => (buckets.has(item.date) ? 6 : 3));
+  };
+
+  const trendArrow = (metric) => {
+    const direction = trends[metric]?.direction;
+    if (direction === 'increasing') return ' ▲';
+    if (direction === 'decreasing') return ' ▼';
+    return '';
+  };
+
   const chartData = {
     labels: analyticsData.map(item => item.date),
     datasets: [
@@ -98,17 +110,23 @@ const AnalyticsDashboard = () => {
         label: 'Page Views',
         data: analyticsData.map(item => item.page_views),
         borderColor: 'rgb(75, 192, 192)',
+        pointRadius: pointRadius('page_views'),
         tension: 0.1
       },
       {
         label: 'Unique Visitors',
         data: analyticsData.map(item => item.unique_visitors),
         borderColor: 'rgb(255, 99, 132)',
+        pointRadius: pointRadius('unique_visitors'),
         tension: 0.1
       }
     ]
   };
 
+  const anomalyList = Object.entries(anomalies)
+    .flatMap(([metric, markers]) => markers.map(marker => ({ metric, ...marker })))
+    .sort((a, b) => b.ts - a.ts);
+
   const options = {
     responsive: true,
     plugins: {
@@ -130,15 +148,15 @@ const AnalyticsDashboard = () => {
         <div className="grid grid-cols-1 md:grid-cols-3 gap-4 mb-8">
           <div className="bg-white p-4 rounded shadow">
             <h3 className="font-semibold">Average Page Views</h3>
-            <p className="text-2xl">{Math.round(summary.average_page_views || 0)}</p>
+            <p className="text-2xl">{Math.round(summary.average_page_views || 0)}{trendArrow('page_views')}</p>
           </div>
           <div className="bg-white p-4 rounded shadow">
             <h3 className="font-semibold">Average Unique Visitors</h3>
-            <p className="text-2xl">{Math.round(summary.average_unique_visitors || 0)}</p>
+            <p className="text-2xl">{Math.round(summary.average_unique_visitors || 0)}{trendArrow('unique_visitors')}</p>
           </div>
           <div className="bg-white p-4 rounded shadow">
             <h3 className="font-semibold">Average Session Duration</h3>
-            <p className="text-2xl">{(summary.average_session_duration || 0).toFixed(1)} min</p>
+            <p className="text-2xl">{(summary.average_session_duration || 0).toFixed(1)} min{trendArrow('session_duration')}</p>
           </div>
         </div>
       )}
@@ -150,13 +168,26 @@ const AnalyticsDashboard = () => {
       <div className="grid grid-cols-1 md:grid-cols-2 gap-4 mt-8">
         <div className="bg-white p-4 rounded shadow">
           <h3 className="font-semibold">Bounce Rate</h3>
-          <p className="text-2xl">{((summary.average_bounce_rate || 0) * 100).toFixed(1)}%</p>
+          <p className="text-2xl">{((summary.average_bounce_rate || 0) * 100).toFixed(1)}%{trendArrow('bounce_rate')}</p>
         </div>
         <div className="bg-white p-4 rounded shadow">
           <h3 className="font-semibold">Conversion Rate</h3>
-          <p className="text-2xl">{((summary.average_conversion_rate || 0) * 100).toFixed(1)}%</p>
+          <p className="text-2xl">{((summary.average_conversion_rate || 0) * 100).toFixed(1)}%{trendArrow('conversion_rate')}</p>
         </div>
       </div>
+
+      {anomalyList.length > 0 && (
+        <div className="bg-white p-4 rounded shadow mt-8">
+          <h3 className="font-semibold mb-2">Anomalies</h3>
+          <ul>
+            {anomalyList.map(marker => (
+              <li key={`${marker.metric}-${marker.ts}`}>
+                {marker.date}: {marker.metric} {marker.value} (z-score {marker.zscore})
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,7 +1,6 @@
 import React, { useState } from 'react';
 import { Box, TextField, Paper, Typography, List, ListItem, Button, Chip } from '@mui/material';
 import Plot from 'react-plotly.js';
-import axios from 'axios';
 
 const predefinedQuestions = {
   en: [
@@ -27,6 +26,32 @@ const predefinedQuestions = {
   ]
 };
 
+// Read a text/event-stream body, calling onEvent(name, data) for each event
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      raw.split('\n').forEach(line => {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
 const ChatInterface = () => {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState('');
@@ -41,24 +66,41 @@ const ChatInterface = () => {
     const userMessage = { text: input, sender: 'user' };
     setMessages(prev => [...prev, userMessage]);
 
+    // Add an empty bot message and fill it in as narration tokens arrive
+    setMessages(prev => [...prev, { text: '', sender: 'bot', charts: [] }]);
+    const updateBotMessage = (update) => {
+      setMessages(prev => {
+        const next = [...prev];
+        const last = next[next.length - 1];
+        next[next.length - 1] = { ...last, ...update(last) };
+        return next;
+      });
+    };
+
     try {
-      const response = await axios.post('http://localhost:8000/query', {
-        text: input,
-        language: language
+      const response = await fetch('http://localhost:8000/query/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ text: input, language: language })
       });
+      if (!response.ok) {
+        throw new Error(`Request failed with status ${response.status}`);
+      }
 
-      const botMessage = {
-        text: response.data.response,
-        sender: 'bot',
-        charts: response.data.charts || []
-      };
-      setMessages(prev => [...prev, botMessage]);
+      await readEventStream(response, (event, data) => {
+        if (event === 'token') {
+          updateBotMessage(message => ({ text: message.text + data.text }));
+        } else if (event === 'done') {
+          updateBotMessage(() => ({ text: data.response }));
+        } else if (event === 'error') {
+          throw new Error(data.error);
+        }
+      });
     } catch (error) {
       console.error('Error processing query:', error);
-      setMessages(prev => [...prev, {
-        text: 'Sorry, I encountered an error processing your query.',
-        sender: 'bot'
-      }]);
+      updateBotMessage(() => ({
+        text: 'Sorry, I encountered an error processing your query.'
+      }));
     } finally {
       setLoading(false);
       setInput('');
@@ -15,7 +15,9 @@ export const languages = {
         dailyUsers: 'Daily Users',
         dailyRevenue: 'Daily Revenue',
         dailyBounceRate: 'Daily Bounce Rate (%)',
-        avgSessionDuration: 'Average Session Duration (seconds)'
+        avgSessionDuration: 'Average Session Duration (seconds)',
+        liveAnomalies: 'Live Anomalies',
+        noAnomalies: 'No anomalies since the dashboard opened'
       },
       chat: {
         predefinedQuestions: 'Predefined Questions',
@@ -41,7 +43,9 @@ export const languages = {
         dailyUsers: '每日用户',
         dailyRevenue: '每日收入',
         dailyBounceRate: '每日跳出率 (%)',
-        avgSessionDuration: '平均会话时长 (秒)'
+        avgSessionDuration: '平均会话时长 (秒)',
+        liveAnomalies: '实时异常',
+        noAnomalies: '打开仪表板后未发现异常'
       },
       chat: {
         predefinedQuestions: '预设问题',
@@ -67,7 +71,9 @@ export const languages = {
         dailyUsers: '每日用戶',
         dailyRevenue: '每日收入',
         dailyBounceRate: '每日跳出率 (%)',
-        avgSessionDuration: '平均會話時長 (秒)'
+        avgSessionDuration: '平均會話時長 (秒)',
+        liveAnomalies: '實時異常',
+        noAnomalies: '打開儀表板之後未發現異常'
       },
       chat: {
         predefinedQuestions: '預設問題',